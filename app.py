@@ -1,19 +1,31 @@
-from flask import Flask, render_template, request, send_file, jsonify
+import argparse
+from flask import Flask, Response, render_template, request, send_file, jsonify
 from werkzeug.utils import secure_filename
 import os
 import shutil
-import pandas as pd
 from data_lake import DataLake
+from ingest_jobs import IngestQueue
+from master_export import EXPORT_FORMATS, export_chunks
+from master_query import parse_page_query
+from master_rollup import parse_aggregate_query
+from transaction_render import render_rows, render_table
+from write_ahead_log import validate_operation
 from pathlib import Path
 import json
+import tempfile
 import time
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Initialize Data Lake
-data_lake = DataLake("data_lake")
+# Initialize Data Lake; the staging watcher starts with the first request, not at import
+data_lake = DataLake("data_lake", watch=False)
+ingest_queue = IngestQueue(data_lake)
+
+@app.before_request
+def watch_staging():
+    data_lake.watch_staging()
 
 @app.route('/')
 def index():
@@ -29,20 +41,29 @@ def upload_file():
         return jsonify({'error': 'No selected file'}), 400
         
     filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    
-    # Save uploaded file temporarily
-    file.save(filepath)
+    # Each upload gets its own directory so same-named files never collide
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    upload_dir = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+    filepath = os.path.join(upload_dir, filename)
     
-    # Process file through data lake
+    # Save uploaded file temporarily, the ingest queue removes it
     try:
-        data_lake.copy_to_raw(filepath)
-        data_lake.process_raw_data()
-        data_lake.update_master_database()
-        os.remove(filepath)  # Clean up temp file
-        return jsonify({'message': 'File processed successfully'})
+        file.save(filepath)
+        job = ingest_queue.submit(filepath)
     except Exception as e:
+        shutil.rmtree(upload_dir, ignore_errors=True)
         return jsonify({'error': str(e)}), 500
+    if job is None:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return jsonify({'error': 'Too many uploads in progress, try again later'}), 503
+    return jsonify({'message': 'File queued for processing', 'job_id': job.id}), 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = ingest_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 @app.route('/view/<path:file_path>')
 def view_data(file_path):
@@ -147,20 +168,29 @@ def file_details(file_path):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def render_transactions(df, empty_message, output='html', **extra):
+    """Response body of a transaction listing, a rendered HTML table or compact rows.
+
+    output='rows' returns {'columns', 'rows'} for the frontend to render.
+    """
+    if output == 'rows':
+        return {**render_rows(df), **extra}
+    if df.empty:
+        return {'data': f'<p class="text-muted">{empty_message}</p>', **extra}
+    return {'data': render_table(df), **extra}
+
 @app.route('/transactions')
 def get_transactions():
     try:
-        # Initialize master database if it doesn't exist
-        if not os.path.exists('data_lake/master_database.json'):
-            with open('data_lake/master_database.json', 'w', encoding='utf-8') as f:
-                json.dump([], f)
-            print("Initialized master database")
-
+        query = parse_page_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
         # Get data with retry logic
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                df = data_lake.get_master_data()
+                df, total = data_lake.query_transactions(query)
                 break
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -168,41 +198,11 @@ def get_transactions():
                 time.sleep(0.5)
                 continue
 
-        # Handle empty DataFrame case
-        if df.empty:
-            return jsonify({'data': '<p class="text-muted">No transactions found.</p>'})
-
-        # Process the DataFrame
-        df = df.copy()  # Create a copy to avoid SettingWithCopyWarning
-        df = df.fillna('')
-
-        # Format columns
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-        if 'amount' in df.columns:
-            df['amount'] = df['amount'].apply(lambda x: f"{float(x):.2f}" if x != '' else '')
-        if 'source_file' in df.columns:
-            df['source_file'] = df['source_file'].apply(
-                lambda x: ' '.join([
-                    f'<a href="/file/{file.strip()}" class="btn btn-sm btn-outline-secondary">{Path(file.strip()).name}</a>' 
-                    for file in str(x).split(', ')
-                ])
-            )
-
-        # Ensure all required columns exist
-        for col in ['date', 'amount', 'description', 'payee', 'source_file']:
-            if col not in df.columns:
-                df[col] = ''
-
-        # Generate HTML table
-        table_html = df.to_html(
-            classes='table table-striped table-hover',
-            index=False,
-            table_id='transactionTable',
-            escape=False
-        )
-        
-        return jsonify({'data': table_html})
+        # Only the requested page is rendered
+        return jsonify(render_transactions(
+            df, 'No transactions found.', request.args.get('format', 'html'),
+            total=total, offset=query.offset, limit=query.limit
+        ))
 
     except Exception as e:
         print(f"Error in get_transactions: {str(e)}")  # Server-side logging
@@ -229,74 +229,20 @@ def search_transactions():
         if not search_query:
             return jsonify({'data': '<p class="text-muted">Please enter a search term.</p>'})
 
-        # Make sure master database exists
-        if not os.path.exists('data_lake/master_database.json'):
-            with open('data_lake/master_database.json', 'w', encoding='utf-8') as f:
-                json.dump([], f)
-
         # Perform search
-        results = data_lake.search_transactions(search_query, search_fields)
+        results = data_lake.search_transactions(search_query, search_fields, prefix=bool(data.get('prefix')))
         print(f"Search results: {len(results)} rows found")  # Debug print
-        
-        if results.empty:
-            return jsonify({'data': '<p class="text-muted">No results found.</p>'})
-
-        # Format results
-        results = results.copy()
-        results = results.fillna('')
 
-        # Format date with error handling
-        if 'date' in results.columns:
-            try:
-                results['date'] = pd.to_datetime(results['date'], unit='ms').dt.strftime('%Y-%m-%d')
-            except Exception as e:
-                print(f"Error formatting dates: {e}")
-                # Fallback date formatting if unit='ms' fails
-                results['date'] = pd.to_datetime(results['date']).dt.strftime('%Y-%m-%d')
-
-        # Format amount with error handling
-        if 'amount' in results.columns:
-            try:
-                results['amount'] = results['amount'].apply(lambda x: f"{float(x):.2f}" if x != '' else '')
-            except Exception as e:
-                print(f"Error formatting amounts: {e}")
-
-        # Format source files as buttons
-        if 'source_file' in results.columns:
-            try:
-                results['source_file'] = results['source_file'].apply(
-                    lambda x: ' '.join([
-                        f'<a href="/file/{file.strip()}" class="btn btn-sm btn-outline-secondary">{Path(file.strip()).name}</a>' 
-                        for file in str(x).split(', ')
-                    ])
-                )
-            except Exception as e:
-                print(f"Error formatting source files: {e}")
-
-        # Ensure all required columns exist
-        required_columns = ['date', 'amount', 'description', 'payee', 'source_file']
-        for col in required_columns:
-            if col not in results.columns:
-                results[col] = ''
-
-        # Generate table HTML
-        table_html = results.to_html(
-            classes='table table-striped table-hover',
-            index=False,
-            table_id='transactionTable',
-            escape=False
-        )
-        
-        return jsonify({'data': table_html})
+        return jsonify(render_transactions(results, 'No results found.', data.get('format', 'html')))
 
     except Exception as e:
         print(f"Search error: {str(e)}")  # Detailed error logging
         return jsonify({'error': str(e)}), 500
 
-@app.route('/entry/<int:timestamp>', methods=['GET'])
-def get_entry(timestamp):
+@app.route('/entry/<entry_id>', methods=['GET'])
+def get_entry(entry_id):
     try:
-        entry = data_lake.get_entry(timestamp)
+        entry = data_lake.get_entry(entry_id)
         if entry is not None:
             return jsonify(entry)
         return jsonify({'error': 'Entry not found'}), 404
@@ -307,28 +253,28 @@ def get_entry(timestamp):
 def add_entry():
     try:
         entry_data = request.json
-        success = data_lake.add_entry(entry_data)
-        if success:
-            return jsonify({'message': 'Entry added successfully'})
+        entry_id = data_lake.add_entry(entry_data)
+        if entry_id:
+            return jsonify({'message': 'Entry added successfully', 'id': entry_id})
         return jsonify({'error': 'Failed to add entry'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/entry/<int:timestamp>', methods=['PUT'])
-def update_entry(timestamp):
+@app.route('/entry/<entry_id>', methods=['PUT'])
+def update_entry(entry_id):
     try:
         entry_data = request.json
-        success = data_lake.update_entry(timestamp, entry_data)
+        success = data_lake.update_entry(entry_id, entry_data)
         if success:
             return jsonify({'message': 'Entry updated successfully'})
         return jsonify({'error': 'Failed to update entry'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/entry/<int:timestamp>', methods=['DELETE'])
-def delete_entry(timestamp):
+@app.route('/entry/<entry_id>', methods=['DELETE'])
+def delete_entry(entry_id):
     try:
-        success = data_lake.delete_entry(timestamp)
+        success = data_lake.delete_entry(entry_id)
         if success:
             return jsonify({'message': 'Entry deleted successfully'})
         return jsonify({'error': 'Failed to delete entry'}), 400
@@ -338,17 +284,14 @@ def delete_entry(timestamp):
 @app.route('/entries/delete-multiple', methods=['POST'])
 def delete_multiple_entries():
     try:
-        timestamps = request.json.get('timestamps', [])
-        if not timestamps:
+        entry_ids = request.json.get('ids', [])
+        if not entry_ids:
             return jsonify({'error': 'No entries selected'}), 400
 
-        success_count = 0
-        for timestamp in timestamps:
-            if data_lake.delete_entry(int(float(timestamp))):
-                success_count += 1
+        success_count = data_lake.delete_entries(entry_ids)
 
         return jsonify({
-            'message': f'Successfully deleted {success_count} out of {len(timestamps)} entries'
+            'message': f'Successfully deleted {success_count} out of {len(entry_ids)} entries'
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -356,16 +299,103 @@ def delete_multiple_entries():
 @app.route('/api/transactions', methods=['GET'])
 def api_get_transactions():
     try:
-        df = data_lake.get_master_data()
-        transactions = df.to_dict(orient='records')
-        return jsonify(transactions)
+        query = parse_page_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        df, total = data_lake.query_transactions(query)
+        next_offset = query.offset + query.limit
+        return jsonify({
+            'data': df.to_dict(orient='records'),
+            'total': total,
+            'offset': query.offset,
+            'limit': query.limit,
+            'next_offset': next_offset if next_offset < total else None
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/transaction/<int:timestamp>', methods=['GET'])
-def api_get_transaction(timestamp):
+def parse_operations(body: str) -> list:
+    """Operations from a JSON array or an NDJSON body, one operation per line"""
+    if body.lstrip().startswith('['):
+        return json.loads(body)
+    return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+@app.route('/api/transactions/bulk', methods=['POST'])
+def api_bulk_transactions():
+    try:
+        operations = parse_operations(request.get_data(as_text=True))
+    except json.JSONDecodeError as e:
+        return jsonify({'error': f'Invalid JSON: {e}'}), 400
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Expected a non-empty array of operations'}), 400
+
+    # Validate the whole batch first, nothing is applied if any operation is invalid
+    records, results = [], []
+    for index, operation in enumerate(operations):
+        try:
+            records.append(validate_operation(operation))
+            results.append({'index': index, 'status': 'ok', 'id': records[-1]['id']})
+        except ValueError as e:
+            results.append({'index': index, 'status': 'error', 'error': str(e)})
+    if len(records) < len(operations):
+        return jsonify({'applied': 0, 'results': results}), 400
+
+    try:
+        flags = data_lake.bulk_write(records)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if not all(flags):
+        for result, record, flag in zip(results, records, flags):
+            if not flag:
+                result.update(status='error', error='Entry already exists' if record['op'] == 'add' else 'Entry not found')
+            else:
+                result['status'] = 'skipped'
+        return jsonify({'applied': 0, 'results': results}), 409
+    return jsonify({'applied': len(records), 'results': results})
+
+@app.route('/api/transactions/export', methods=['GET'])
+def api_export_transactions():
+    export_format = request.args.get('format', 'ndjson')
+    try:
+        stream = export_chunks(data_lake.iter_master(), export_format)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Rows are encoded and sent chunk by chunk as the client reads them
+    return Response(stream, mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename=transactions.{export_format}'
+    })
+
+@app.route('/api/aggregate', methods=['GET'])
+def api_aggregate_transactions():
     try:
-        entry = data_lake.get_entry(timestamp)
+        query = parse_aggregate_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        df = data_lake.aggregate_transactions(query)
+        # A mean over a group without amounts is null
+        df = df.astype(object).where(df.notna(), None)
+        return jsonify({
+            'group_by': query.group_by,
+            'metric': query.metric,
+            'data': df.to_dict(orient='records')
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache', methods=['GET'])
+def api_cache_stats():
+    return jsonify(data_lake.cache_stats())
+
+@app.route('/api/watch', methods=['GET'])
+def api_watch_stats():
+    return jsonify(data_lake.watch_stats())
+
+@app.route('/api/transaction/<entry_id>', methods=['GET'])
+def api_get_transaction(entry_id):
+    try:
+        entry = data_lake.get_entry(entry_id)
         if entry is not None:
             return jsonify(entry)
         return jsonify({'error': 'Entry not found'}), 404
@@ -376,28 +406,28 @@ def api_get_transaction(timestamp):
 def api_add_transaction():
     try:
         entry_data = request.json
-        success = data_lake.add_entry(entry_data)
-        if success:
-            return jsonify({'message': 'Entry added successfully'})
+        entry_id = data_lake.add_entry(entry_data)
+        if entry_id:
+            return jsonify({'message': 'Entry added successfully', 'id': entry_id})
         return jsonify({'error': 'Failed to add entry'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/transaction/<int:timestamp>', methods=['PUT'])
-def api_update_transaction(timestamp):
+@app.route('/api/transaction/<entry_id>', methods=['PUT'])
+def api_update_transaction(entry_id):
     try:
         entry_data = request.json
-        success = data_lake.update_entry(timestamp, entry_data)
+        success = data_lake.update_entry(entry_id, entry_data)
         if success:
             return jsonify({'message': 'Entry updated successfully'})
         return jsonify({'error': 'Failed to update entry'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/transaction/<int:timestamp>', methods=['DELETE'])
-def api_delete_transaction(timestamp):
+@app.route('/api/transaction/<entry_id>', methods=['DELETE'])
+def api_delete_transaction(entry_id):
     try:
-        success = data_lake.delete_entry(timestamp)
+        success = data_lake.delete_entry(entry_id)
         if success:
             return jsonify({'message': 'Entry deleted successfully'})
         return jsonify({'error': 'Failed to delete entry'}), 400
@@ -405,5 +435,9 @@ def api_delete_transaction(timestamp):
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=data_lake.workers,
+                        help='processes parsing raw files, 0 to parse in the request thread')
+    data_lake.workers = parser.parse_args().workers
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""Benchmark: /api/aggregate totals from rollups versus a groupby over the master.
+
+The scan groups every master row per request, as a server-side version of
+pulling /api/transactions and summing on the client would. The rollups are
+built on the first query of a grouping and then follow entry writes and an
+incremental staging merge without being rebuilt. After every change each
+group_by and metric must match the scan of the current master.
+
+Usage: python benchmarks/bench_aggregate.py [master rows] [writes]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_lake import DataLake  # noqa: E402
+from master_merge import MANUAL_SOURCE, assign_ids  # noqa: E402
+from master_rollup import GROUP_BY, METRICS, AggregateQuery  # noqa: E402
+from write_ahead_log import validate_operation  # noqa: E402
+
+QUERIES = [AggregateQuery(group_by, metric) for group_by in GROUP_BY for metric in METRICS]
+STATEMENTS = 20
+
+
+def write_statement(path: Path, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    rows = [
+        {'date': str(d), 'amount': float(a), 'description': f'statement {seed % 5}', 'payee': f'payee {seed % 7}'}
+        for d, a in zip(np.datetime64('2018-01-01') + rng.integers(0, 365, 200),
+                        rng.integers(-500000, 500000, 200) / 100)
+    ]
+    path.write_text(json.dumps(rows), encoding='utf-8')
+
+
+def lake_with_master(directory: str, rows: int) -> DataLake:
+    lake = DataLake(directory, watch=False, workers=0)
+    lake.WAL_COMPACT_RECORDS = 10 ** 9  # Keep the whole run in the log
+    for i in range(STATEMENTS):
+        write_statement(lake.staging_zone / f'statement_{i}.json', i)
+    lake.update_master_database()
+
+    rng = np.random.default_rng(0)
+    manual = pd.DataFrame({
+        'date': np.datetime64('2015-01-01') + rng.integers(0, 3650, rows),
+        'amount': rng.integers(-500000, 500000, rows) / 100,
+        'description': np.char.add('card purchase ', rng.integers(0, 50000, rows).astype(str)),
+        'payee': np.char.add('payee ', rng.integers(0, 2000, rows).astype(str)),
+        'source_file': MANUAL_SOURCE,
+    })
+    with lake._master_db_lock():
+        lake._save_master(assign_ids(pd.concat([lake.get_master_data(), manual], ignore_index=True)))
+    return lake
+
+
+def scan(frame: pd.DataFrame, query: AggregateQuery) -> pd.Series:
+    if query.group_by == 'month':
+        keys = frame['date'].dt.strftime('%Y-%m')
+    else:
+        keys = frame[query.group_by].astype(str)
+    grouped = frame['amount'].groupby(keys)
+    return (grouped.size() if query.metric == 'count' else grouped.agg(query.metric)).sort_index()
+
+
+def check(lake: DataLake) -> None:
+    frame = lake.get_master_data()
+    for query in QUERIES:
+        expected = scan(frame, query)
+        totals = lake.aggregate_transactions(query)
+        assert totals[query.group_by].tolist() == expected.index.tolist(), f'{query}: groups differ'
+        assert np.allclose(totals[query.metric], expected, equal_nan=True), f'{query}: totals differ'
+
+
+def timed(func, repeat: int = 3) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        lake = lake_with_master(tmp, rows)
+        frame = lake.get_master_data()
+        print(f"{len(frame)} rows")
+        print(f"{'query':>18} {'scan ms':>9} {'build ms':>9} {'query ms':>9}")
+        for query in QUERIES:
+            scan_ms = timed(lambda: scan(frame, query))
+            build_ms = timed(lambda: lake.aggregate_transactions(query), repeat=1)
+            query_ms = timed(lambda: lake.aggregate_transactions(query), repeat=100)
+            print(f"{query.group_by + ' ' + query.metric:>18} {scan_ms:9.1f} {build_ms:9.1f} {query_ms:9.3f}")
+        check(lake)
+
+        # Entry writes: adds, some without an amount as older logs may hold, then updates and deletes of them
+        rng = np.random.default_rng(1)
+        inserts = [validate_operation({'op': 'insert', 'data': {
+            'date': f'2024-{i % 12 + 1:02d}-01', 'amount': float(rng.integers(-10000, 10000)),
+            'description': f'new {i % 10}', 'payee': f'new payee {i % 3}'
+        }}) for i in range(writes // 3)]
+        for record in inserts[::5]:
+            del record['data']['amount']
+        start = time.perf_counter()
+        for record in inserts:
+            assert lake.bulk_write([record]) == [True]
+        for record in inserts[::2]:
+            assert lake.bulk_write([{'op': 'update', 'id': record['id'], 'data': {'payee': 'moved', 'amount': 1.5}}])
+        for record in inserts[1::2]:
+            assert lake.bulk_write([{'op': 'delete', 'id': record['id']}]) == [True]
+        write_ms = (time.perf_counter() - start) * 1000 / (len(inserts) + len(inserts[::2]) + len(inserts[1::2]))
+        generation = lake.cache_stats()['generation']
+        assert lake._rollup_index.generation == generation, 'rollups did not follow the writes'
+        query_ms = timed(lambda: [lake.aggregate_transactions(query) for query in QUERIES]) / len(QUERIES)
+        check(lake)
+        print(f"after entry writes: {write_ms:.1f} ms per write, {query_ms:.2f} ms per query, no rebuild")
+
+        # Staging merge: change some statements, retracting their rows and merging new ones
+        for i in range(3):
+            write_statement(lake.staging_zone / f'statement_{i}.json', STATEMENTS + i)
+        lake.update_master_database()
+        assert lake._rollup_index.generation == lake.cache_stats()['generation'], 'rollups did not follow the merge'
+        check(lake)
+        print("after staging merge: totals match a scan, no rebuild")
@@ -0,0 +1,74 @@
+"""Benchmark: N single entry calls versus one bulk write of the same N operations.
+
+Both run against a lake whose master already holds a number of rows, which
+writes only look entries up in. The single calls are add_entry
+followed by update_entry for each added entry, as /api/transaction does; the
+bulk run validates the same operations with validate_operation and applies
+them with bulk_write in one atomic commit. The lake is reopened afterwards
+to check every operation is on disk.
+
+Usage: python benchmarks/bench_bulk.py [operations] [master rows]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_lake import DataLake  # noqa: E402
+from master_merge import assign_ids  # noqa: E402
+from write_ahead_log import validate_operation  # noqa: E402
+
+
+def lake_with_master(directory: str, rows: int) -> DataLake:
+    lake = DataLake(directory, watch=False, workers=0)
+    lake.WAL_COMPACT_RECORDS = 10 ** 9  # Keep the whole run in the log
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'date': np.datetime64('2018-01-01') + rng.integers(0, 2000, rows),
+        'amount': rng.permutation(rows) / 100,  # Unique (date, amount) keys, as after a merge
+        'description': [f'row {i}' for i in range(rows)],
+        'payee': 'seed',
+        'source_file': 'seed.json',
+    })
+    with lake._master_db_lock():
+        lake._save_master(assign_ids(df))
+    return lake
+
+
+def single(lake: DataLake, operations: int) -> list:
+    entry_ids = [lake.add_entry({'date': '2024-01-01', 'amount': i, 'description': f'single {i}'})
+                 for i in range(operations // 2)]
+    for entry_id in entry_ids:
+        lake.update_entry(entry_id, {'payee': 'adjusted'})
+    return entry_ids
+
+
+def bulk(lake: DataLake, operations: int) -> list:
+    inserts = [validate_operation({'op': 'insert', 'data': {'date': '2024-01-01', 'amount': i,
+                                                             'description': f'bulk {i}'}})
+               for i in range(operations // 2)]
+    updates = [validate_operation({'op': 'update', 'id': record['id'], 'data': {'payee': 'adjusted'}})
+               for record in inserts]
+    assert all(lake.bulk_write(inserts + updates))
+    return [record['id'] for record in inserts]
+
+
+if __name__ == '__main__':
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    print(f"{operations} operations against a {rows}-row master")
+    for name, run in [('single calls', single), ('bulk write', bulk)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            lake = lake_with_master(tmp, rows)
+            start = time.perf_counter()
+            entry_ids = run(lake, operations)
+            elapsed = time.perf_counter() - start
+            commits = lake.wal.commits
+
+            df = DataLake(tmp, watch=False, workers=0).get_master_data().set_index('id')
+            assert len(df) == rows + len(entry_ids) and (df.loc[entry_ids, 'payee'] == 'adjusted').all()
+            print(f"{name:>12}: {elapsed:7.2f}s  {operations / elapsed:9.0f} ops/s  {commits} fsyncs")
@@ -0,0 +1,72 @@
+"""Benchmark: peak memory and time of CSV ingestion versus file size.
+
+Each measurement runs in a fresh process so its peak RSS is its own.
+"streaming" is write_staging, which parses and writes the staging JSON
+chunk by chunk. "whole file" parses the full frame first and serializes it
+in one go, as ingestion used to. Peak memory of the streaming path should
+stay flat as the file grows.
+
+Usage: python benchmarks/bench_csv_streaming.py [size in MB ...]  (default 64 256 1024)
+"""
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from raw_ingest import ProcessorRegistry, parse_file, write_staging  # noqa: E402
+
+BLOCK_ROWS = 200_000
+
+
+def write_csv(path: Path, megabytes: int) -> None:
+    rng = np.random.default_rng(0)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write('date,amount,description,payee\n')
+        while file.tell() < megabytes * 1024 * 1024:
+            pd.DataFrame({
+                'date': (np.datetime64('2018-01-01') + rng.integers(0, 365, BLOCK_ROWS)).astype(str),
+                'amount': rng.integers(-500000, 500000, BLOCK_ROWS) / 100,
+                'description': rng.choice(['card purchase', 'transfer to savings', 'salary', 'café'], BLOCK_ROWS),
+                'payee': rng.choice(['ACME Corp', 'Landlord', 'Grocer', ''], BLOCK_ROWS)
+            }).to_csv(file, header=False, index=False)
+
+
+def child(mode: str, csv_path: str, json_path: str) -> None:
+    processors = ProcessorRegistry()
+    start = time.perf_counter()
+    if mode == 'streaming':
+        write_staging(Path(csv_path), processors, Path(json_path))
+    else:
+        parse_file(Path(csv_path), processors).to_json(json_path, orient='records', indent=4)
+    elapsed = time.perf_counter() - start
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def measure(mode: str, csv_path: Path, json_path: Path) -> tuple:
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode, str(csv_path), str(json_path)],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[-2]), int(output[-1]) / 1024  # ru_maxrss is in KiB on Linux
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(*sys.argv[2:5])
+        sys.exit()
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [64, 256, 1024]
+    print(f"{'size MB':>7} {'mode':>10} {'seconds':>8} {'MB/s':>6} {'peak RSS MB':>12}")
+    for megabytes in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / 'export.csv'
+            write_csv(csv_path, megabytes)
+            for mode in ['streaming', 'whole file']:
+                elapsed, peak = measure(mode, csv_path, Path(tmp) / 'export.json')
+                print(f"{megabytes:>7} {mode:>10} {elapsed:>8.1f} {megabytes / elapsed:>6.1f} {peak:>12.0f}")
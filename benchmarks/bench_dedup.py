@@ -0,0 +1,119 @@
+"""Correctness and performance of the fingerprint deduplication at up to a million staging rows.
+
+Statements from 500 accounts overlap their neighbours, so part of every
+file reappears in the next one with different capitalisation and spacing,
+and some transactions repeat within a single statement. The fingerprint
+policy is checked row for row against a plain Python reference:
+
+- rows match when date, amount, description and payee agree, ignoring
+  case and whitespace runs;
+- the n-th copy of a transaction in one file matches the n-th copy in
+  another, so repeats within a statement stay apart;
+- the first row supplies the values and source files are joined in
+  first-seen order.
+
+Timings compare aggregate under both policies with the groupby and lambda
+merge it replaced, at several sizes to show the cost grows linearly.
+
+Usage: python benchmarks/bench_dedup.py [rows ...]
+"""
+import re
+import sys
+from collections import Counter
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from master_merge import MERGE_POLICIES, aggregate, key_ids  # noqa: E402
+
+FILES = 500
+MERCHANTS = ['Coffee Corner', 'Grocer', 'Fuel Station', 'Landlord', 'ACME Payroll', 'Book Shop', 'Pharmacy']
+
+
+def staging_rows(rows: int, directory: Path, seed: int = 0) -> pd.DataFrame:
+    """Staging rows of FILES statements, in file order, with overlaps and repeats"""
+    rng = np.random.default_rng(seed)
+    base = int(rows / 1.55)  # Repeats add a quarter, overlaps fill up to rows
+    merchants = rng.choice(MERCHANTS, base)
+    df = pd.DataFrame({
+        'date': np.datetime64('2018-01-01') + rng.integers(0, 2000, base).astype('timedelta64[D]'),
+        'amount': rng.integers(-2000, 2000, base) / 100,
+        'description': [f'{m} purchase {r}' for m, r in zip(merchants, rng.integers(0, 50, base))],
+        'payee': merchants,
+        'file': rng.integers(0, FILES, base),
+    })
+    # Every fourth row is repeated within its own statement
+    df = pd.concat([df, df.iloc[::4]], ignore_index=True)
+    # A share of each statement reappears in the next one, reformatted
+    overlap = df.sample(n=rows - len(df), random_state=seed)
+    overlap = overlap.assign(
+        file=(overlap['file'] + 1) % FILES,
+        description=overlap['description'].str.upper(),
+        payee=' ' + overlap['payee'].str.replace(' ', '  ') + ' '
+    )
+    df = pd.concat([df, overlap], ignore_index=True).sort_values('file', kind='mergesort')
+    paths = [directory / f'statement_{i:03d}.json' for i in range(FILES)]
+    for path in paths:
+        path.touch()
+    df['source_file'] = np.array([str(path) for path in paths], dtype=object)[df.pop('file').to_numpy()]
+    return df.reset_index(drop=True)
+
+
+def reference(df: pd.DataFrame) -> Counter:
+    """Fingerprint merge in plain Python, as a multiset of master rows"""
+    def normalized(text):
+        return re.sub(r'\s+', ' ', text).strip().lower()
+
+    groups = {}
+    counts = {}
+    for row in df.itertuples(index=False):
+        fingerprint = (row.date, row.amount, normalized(row.description), normalized(row.payee))
+        occurrence = counts.get((row.source_file, fingerprint), 0)
+        counts[(row.source_file, fingerprint)] = occurrence + 1
+        group = groups.setdefault((fingerprint, occurrence), [row, []])
+        if row.source_file not in group[1]:
+            group[1].append(row.source_file)
+    return Counter((row.date, row.amount, row.description, row.payee, ', '.join(sources))
+                   for row, sources in groups.values())
+
+
+def groupby_merge(entries: pd.DataFrame) -> pd.DataFrame:
+    """The merge before fingerprints: one row per date and amount, joined in Python per group"""
+    join = lambda separator: lambda x: separator.join(filter(None, dict.fromkeys(x)))  # noqa: E731
+    merged_df = entries.groupby(['date', 'amount'], as_index=False).agg(
+        {'description': join(' - '), 'payee': join(' - '), 'source_file': join(', ')})
+    merged_df = merged_df[
+        merged_df['source_file'].apply(lambda x: all(Path(file.strip()).exists() for file in x.split(',')))
+    ]
+    return merged_df.assign(id=key_ids(merged_df))
+
+
+def timed(func) -> tuple:
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250_000, 500_000, 1_000_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>9} {'master':>8} {'fingerprint s':>14} {'date_amount s':>14} {'groupby s':>10}")
+        for rows in sizes:
+            df = staging_rows(rows, Path(tmp))
+            merged, fingerprint_s = timed(lambda: aggregate(df, MERGE_POLICIES['fingerprint']))
+            legacy, date_amount_s = timed(lambda: aggregate(df, MERGE_POLICIES['date_amount']))
+            before, groupby_s = timed(lambda: groupby_merge(df))
+
+            found = Counter(merged[['date', 'amount', 'description', 'payee', 'source_file']].itertuples(
+                index=False, name=None))
+            assert found == reference(df), 'fingerprint merge differs from reference'
+            assert merged['id'].is_unique
+            # The date_amount policy reproduces the old merge exactly, ids included
+            before = before.sort_values(['date', 'amount']).reset_index(drop=True)
+            legacy = legacy.sort_values(['date', 'amount']).reset_index(drop=True)
+            assert before[legacy.columns].astype(str).equals(legacy.astype(str)), 'date_amount differs from groupby'
+            print(f"{len(df):>9} {len(merged):>8} {fingerprint_s:>14.2f} {date_amount_s:>14.2f} {groupby_s:>10.2f}")
@@ -0,0 +1,71 @@
+"""Benchmark: incremental master merge cost versus lake size and delta size.
+
+The merge time excludes serializing the master file, which is reported
+separately since it is proportional to the master size for the JSON format.
+
+Usage: python benchmarks/bench_incremental_merge.py
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_lake import DataLake  # noqa: E402
+
+ROWS_PER_FILE = 200
+
+
+def write_statement(path: Path, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2018-01-01') + rng.integers(0, 365, ROWS_PER_FILE)
+    rows = [
+        {'date': str(d), 'amount': float(a), 'description': f'desc {seed}', 'payee': f'payee {seed % 7}'}
+        for d, a in zip(dates, rng.integers(-500000, 500000, ROWS_PER_FILE) / 100)
+    ]
+    path.write_text(json.dumps(rows), encoding='utf-8')
+
+
+def run(lake_files: int, delta_files: int) -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        lake = DataLake(tmp, watch=False)
+        for i in range(lake_files):
+            write_statement(lake.staging_zone / f'statement_{i}.json', i)
+        lake.update_master_database()
+
+        for i in range(delta_files):
+            write_statement(lake.staging_zone / f'statement_{i}.json', lake_files + i)
+
+        persist = []
+        write_master = lake._write_master
+
+        def timed_write(state, base=None):
+            start = time.perf_counter()
+            exact = write_master(state, base)
+            persist.append(time.perf_counter() - start)
+            return exact
+
+        lake._write_master = timed_write
+        start = time.perf_counter()
+        lake.update_master_database()
+        incremental = time.perf_counter() - start - persist[0]
+        del lake._write_master
+        output = lake.master_database.read_bytes()
+
+        start = time.perf_counter()
+        lake.rebuild_master_database()
+        full = time.perf_counter() - start
+        assert output == lake.master_database.read_bytes(), 'incremental merge diverged from full rebuild'
+        return incremental, persist[0], full
+
+
+if __name__ == '__main__':
+    results = []
+    for lake_files, delta_files in [(50, 1), (200, 1), (800, 1), (800, 10), (800, 100)]:
+        results.append((lake_files, delta_files, *run(lake_files, delta_files)))
+    print(f"{'lake files':>10} {'delta':>6} {'merge s':>8} {'persist s':>10} {'full rebuild s':>15}")
+    for lake_files, delta_files, incremental, persist, full in results:
+        print(f"{lake_files:>10} {delta_files:>6} {incremental:>8.3f} {persist:>10.3f} {full:>15.3f}")
@@ -0,0 +1,122 @@
+"""Benchmark: resident memory of the master snapshot cache.
+
+Writes one Parquet master of N rows, with heavily repeated payees and
+staging paths and some rows merged from two statements, then loads it in
+a fresh process per variant and reports how much the resident set grew
+once the frame is loaded and an entry has been looked up by id:
+
+- "object strings" is the old loader with text as Python object strings,
+  as pandas before 3 and pd.read_json gave it;
+- "pandas strings" is the old loader with this pandas' default string
+  dtype: dictionary columns decoded to strings and the id index holding
+  every id as a Python string;
+- "master schema" is MasterCache over ParquetStorage: categorical payee
+  and source_file and an id index over 64-bit keys.
+
+Every variant must hold the same rows.
+
+Usage: python benchmarks/bench_master_memory.py [rows]
+"""
+import gc
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from master_cache import MasterCache  # noqa: E402
+from master_merge import format_ids  # noqa: E402
+from storage import ParquetStorage  # noqa: E402
+
+VARIANTS = ['object strings', 'pandas strings', 'master schema']
+
+
+def make_master(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    statements = np.char.add('data_lake/staging/statement_', np.arange(800).astype(str)).astype(object) + '.json'
+    sources = statements[rng.integers(0, len(statements), rows)]
+    merged = rng.random(rows) < 0.05
+    sources[merged] = sources[merged] + ', ' + statements[rng.integers(0, len(statements), merged.sum())]
+    return pd.DataFrame({
+        'date': pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'amount': rng.integers(-500000, 500000, rows) / 100,
+        'description': np.char.add('card purchase ', rng.integers(0, 50000, rows).astype(str)).astype(object),
+        'payee': np.char.add('payee ', rng.integers(0, 2000, rows).astype(str)).astype(object),
+        'source_file': sources,
+        'id': format_ids(rng.integers(0, 2 ** 63, rows, dtype=np.uint64))
+    })
+
+
+def old_load(path: Path, object_strings: bool) -> tuple:
+    """The master as the loader before the master schema read it, and its id index"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pq.read_table(path)
+    schema = pa.schema([
+        field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ])
+    frame = table.cast(schema).to_pandas()
+    if object_strings:
+        for column in ['description', 'payee', 'source_file', 'id']:
+            frame[column] = frame[column].astype(object)
+    ids = pd.Index(frame['id'], dtype='object')
+    return frame, lambda entry_ids: ids.get_indexer(entry_ids)
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(variant: str, path: Path) -> dict:
+    gc.collect()
+    before = rss_mb()
+    start = time.perf_counter()
+    if variant == 'master schema':
+        snapshot = MasterCache(ParquetStorage(path)).get()
+        frame, lookup = snapshot.frame, snapshot.positions
+    else:
+        frame, lookup = old_load(path, variant == 'object strings')
+    assert lookup([frame['id'].iloc[len(frame) // 2]])[0] == len(frame) // 2
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    return {
+        'rss': rss_mb() - before,
+        'frame': frame.memory_usage(deep=True).sum() / 2 ** 20,
+        'seconds': elapsed,
+        'checksum': float(frame['amount'].sum()) + int(frame['source_file'].astype(str).str.len().sum())
+    }
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        print(json.dumps(measure(sys.argv[2], Path(sys.argv[3]))))
+        sys.exit()
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'master_database.parquet'
+        ParquetStorage(path).save(make_master(rows))
+        print(f"{rows} rows, {path.stat().st_size / 2 ** 20:.0f} MiB on disk")
+        print(f"{'variant':>15} {'RSS MiB':>8} {'frame MiB':>10} {'load s':>7}")
+        results = {}
+        for variant in VARIANTS:
+            output = subprocess.run([sys.executable, __file__, '--measure', variant, str(path)],
+                                    check=True, capture_output=True, text=True).stdout
+            results[variant] = json.loads(output.splitlines()[-1])
+            result = results[variant]
+            print(f"{variant:>15} {result['rss']:8.0f} {result['frame']:10.0f} {result['seconds']:7.2f}")
+        assert len({result['checksum'] for result in results.values()}) == 1, 'variants hold different rows'
+        after = results['master schema']['rss']
+        print(', '.join(f"{after and results[variant]['rss'] / after:.1f}x smaller than {variant}"
+                        for variant in VARIANTS[:-1]))
@@ -0,0 +1,76 @@
+"""Benchmark: date and amount normalization throughput of TransactionProcessor.
+
+"before" is process_transactions as it was: pd.to_datetime with the format
+inferred by pandas and pd.to_numeric on the raw amounts. "after" is the
+current process_transactions, detecting the date format once per column
+and cleaning amounts with vectorized string operations. Two frames are
+normalized:
+
+- clean: ISO dates and plain decimal amounts, which both must read alike;
+- dirty: day-first dates and amounts such as "$1,234.56" and "(12.00)",
+  which the old code turned into 0.0 and the new one must read exactly.
+
+Usage: python benchmarks/bench_normalize.py [rows]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from processors.transaction_processor import TransactionProcessor  # noqa: E402
+
+
+def before(df: pd.DataFrame) -> pd.DataFrame:
+    required_cols = ['date', 'amount', 'description', 'payee']
+    for col in required_cols:
+        if col not in df.columns:
+            df[col] = ''
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    if 'amount' in df.columns:
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
+    return df[required_cols]
+
+
+def frames(rows: int, seed: int = 0) -> tuple:
+    rng = np.random.default_rng(seed)
+    days = pd.to_datetime(np.datetime64('2015-01-01') + rng.integers(0, 3650, rows))
+    cents = rng.integers(-10_000_000, 10_000_000, rows)
+    expected = pd.DataFrame({'date': days.strftime('%Y-%m-%d'), 'amount': cents / 100})
+    description = rng.choice(['card purchase', 'transfer', 'salary'], rows)
+    clean = pd.DataFrame({'date': expected['date'], 'amount': (cents / 100).astype(str),
+                          'description': description})
+    dollars = pd.Series(np.abs(cents) / 100).map('{:,.2f}'.format)
+    dirty = pd.DataFrame({'date': days.strftime('%d/%m/%Y'),
+                          'amount': np.where(cents < 0, '(' + dollars + ')', '$' + dollars),
+                          'description': description})
+    return clean, dirty, expected
+
+
+def timed(func, df: pd.DataFrame) -> tuple:
+    start = time.perf_counter()
+    result = func(df.copy())
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    clean, dirty, expected = frames(rows)
+    after = TransactionProcessor().process_transactions
+    print(f"{rows} rows")
+    for name, df in [('clean', clean), ('dirty', dirty)]:
+        new, new_s = timed(after, df)
+        assert new['date'].astype(str).equals(expected['date'].astype(str)), f'{name}: dates differ'
+        assert np.allclose(new['amount'], expected['amount']), f'{name}: amounts differ'
+        try:
+            old, old_s = timed(before, df)
+            wrong = int((old['amount'] != expected['amount']).sum())
+            old_line = f"{old_s:7.2f}s  {rows / old_s:10.0f} rows/s  {wrong} amounts wrong"
+        except ValueError as e:
+            old_s, old_line = None, f"failed: {str(e).splitlines()[0][:60]}"
+        print(f"{name} before: {old_line}")
+        speedup = f"  ({old_s / new_s:.1f}x)" if old_s else ''
+        print(f"{name} after:  {new_s:7.2f}s  {rows / new_s:10.0f} rows/s{speedup}")
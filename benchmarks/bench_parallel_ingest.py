@@ -0,0 +1,68 @@
+"""Benchmark: raw-zone ingestion throughput versus the number of worker processes.
+
+Writes a batch of CSV statements and times process_raw_data over them with
+an increasing worker count. Each run gets a fresh lake, so neither the
+ingestion ledger nor the parse cache of an earlier run serves any file. The
+staging output of every run must be byte-identical to the inline
+(workers=0) run.
+
+Usage: python benchmarks/bench_parallel_ingest.py [files] [rows per file]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_lake import DataLake  # noqa: E402
+
+
+def write_statement(path: Path, seed: int, rows: int) -> None:
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'date': (np.datetime64('2018-01-01') + rng.integers(0, 365, rows)).astype(str),
+        'amount': rng.integers(-500000, 500000, rows) / 100,
+        'description': [f'purchase {i % 97} ü' for i in range(rows)],
+        'payee': [f'payee {i % 13}' for i in range(rows)]
+    }).to_csv(path, index=False)
+
+
+def staging_bytes(lake: DataLake) -> dict:
+    return {path.name: path.read_bytes() for path in sorted(lake.staging_zone.glob('*.json'))}
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    cores = os.cpu_count() or 1
+    counts = [0] + [n for n in [1, 2, 4, 8, 16, 32] if n <= cores]
+    if cores not in counts:
+        counts.append(cores)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        statements = Path(tmp) / 'statements'
+        statements.mkdir()
+        for i in range(files):
+            write_statement(statements / f'statement_{i:04d}.csv', i, rows)
+
+        print(f"{files} files x {rows} rows, {cores} cores")
+        print(f"{'workers':>7} {'seconds':>8} {'files/s':>8} {'speedup':>8}")
+        baseline = reference = None
+        for workers in counts:
+            lake = DataLake(Path(tmp) / f'lake_{workers}', watch=False, workers=workers)
+            shutil.copytree(statements, lake.raw_zone, dirs_exist_ok=True)
+            start = time.perf_counter()
+            failures = lake.process_raw_data()
+            elapsed = time.perf_counter() - start
+            assert not failures, failures
+
+            output = staging_bytes(lake)
+            reference = reference or output
+            assert output == reference, 'staging output differs from the inline run'
+            baseline = baseline or elapsed
+            print(f"{workers:>7} {elapsed:>8.2f} {files / elapsed:>8.1f} {baseline / elapsed:>7.2f}x")
@@ -0,0 +1,64 @@
+"""Benchmark: re-ingesting a raw zone the ingestion ledger has no record of.
+
+A lake ingests N small CSV statements, then loses its ingestion ledger, as
+after a crash before the ledger was saved. Ingestion runs again with the
+parse cache, which serves every file's staging output without parsing,
+and once more with the cache emptied, which parses everything again.
+Staging files must come out byte for byte the same either way.
+
+Usage: python benchmarks/bench_parse_cache.py [files] [rows per file]
+"""
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_lake import DataLake  # noqa: E402
+
+
+def write_raw(raw_zone: Path, files: int, rows: int) -> None:
+    rng = np.random.default_rng(0)
+    raw_zone.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        pd.DataFrame({
+            'date': (np.datetime64('2018-01-01') + rng.integers(0, 2000, rows)).astype(str),
+            'amount': rng.integers(-50000, 50000, rows) / 100,
+            'description': rng.choice(['card purchase', 'transfer to savings', 'salary'], rows),
+            'payee': rng.choice(['ACME Corp', 'Landlord', 'Grocer'], rows)
+        }).to_csv(raw_zone / f'statement_{i:05d}.csv', index=False)
+
+
+def ingest(base: str, lose_ledger: bool = False, clear_cache: bool = False) -> float:
+    if lose_ledger:
+        (Path(base) / 'ingestion_ledger.json').unlink()
+    if clear_cache:
+        shutil.rmtree(Path(base) / 'parse_cache')
+    lake = DataLake(base, watch=False, workers=0)
+    start = time.perf_counter()
+    failures = lake.process_raw_data()
+    elapsed = time.perf_counter() - start
+    assert not failures, failures
+    return elapsed
+
+
+def staging(base: str) -> dict:
+    return {path.name: path.read_bytes() for path in (Path(base) / 'staging').glob('*.json')}
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        write_raw(Path(tmp) / 'raw', files, rows)
+        print(f"{files} files of {rows} rows")
+        print(f"first ingestion:             {ingest(tmp):8.2f}s")
+        expected = staging(tmp)
+        print(f"ledger lost, parse cache:    {ingest(tmp, lose_ledger=True):8.2f}s")
+        assert staging(tmp) == expected
+        print(f"ledger lost, no parse cache: {ingest(tmp, lose_ledger=True, clear_cache=True):8.2f}s")
+        assert staging(tmp) == expected
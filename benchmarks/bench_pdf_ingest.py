@@ -0,0 +1,141 @@
+"""Benchmark: PDF statement parsing, one tabula call per document versus batched pages.
+
+Generates a corpus of multi-page PDF statements, each page a ruled table of
+transactions, and parses every file twice:
+
+- "per document" is the parser before page batching: tabula.read_pdf on the
+  whole file, the first table yielding transactions wins, and PyPDF2 reads
+  the whole document when tabula finds nothing or Java is missing;
+- "per page" is DocumentProcessor.process, which reads pages in batched
+  tabula calls and falls back to PyPDF2 only for pages without a table.
+
+tabula keeps one JVM per process when jpype is installed and starts one per
+call otherwise; the java processes started are counted. Without Java both
+runs take the PyPDF2 path and must give the same rows.
+
+Usage: python benchmarks/bench_pdf_ingest.py [files] [pages per file]
+"""
+import subprocess
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from processors import DocumentProcessor  # noqa: E402
+from processors.document_processor import check_java_installation  # noqa: E402
+
+ROWS_PER_PAGE = 30
+
+
+def pdf_bytes(pages: list) -> bytes:
+    """A minimal PDF, each page a list of table rows drawn as text on a ruled grid"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for rows in pages:
+        lines = [b'0.5 w']
+        columns = [40, 120, 200, 420, 560]
+        top = 780
+        for i in range(len(rows) + 1):
+            lines.append(f'{columns[0]} {top - i * 20} m {columns[-1]} {top - i * 20} l S'.encode())
+        for x in columns:
+            lines.append(f'{x} {top} m {x} {top - len(rows) * 20} l S'.encode())
+        lines.append(b'BT /F1 9 Tf')
+        for i, row in enumerate(rows):
+            for x, cell in zip(columns, row):
+                text = str(cell).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+                lines.append(f'1 0 0 1 {x + 4} {top - i * 20 - 14} Tm ({text}) Tj'.encode())
+        lines.append(b'ET')
+        stream = b'\n'.join(lines)
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+                       b'/Resources << /Font << /F1 3 0 R >> >> >>' % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids))
+
+    out = [b'%PDF-1.4\n']
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(sum(map(len, out)))
+        out.append(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = sum(map(len, out))
+    out.append(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    out.extend(b'%010d 00000 n \n' % offset for offset in offsets)
+    out.append(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return b''.join(out)
+
+
+def write_corpus(directory: Path, files: int, pages: int) -> list:
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(files):
+        statement = []
+        for _ in range(pages):
+            rows = [['date', 'amount', 'description', 'payee']]
+            for _ in range(ROWS_PER_PAGE - 1):
+                day = np.datetime64('2024-01-01') + rng.integers(0, 365)
+                rows.append([str(day), f'{rng.integers(-50000, 50000) / 100:.2f}',
+                             rng.choice(['card purchase', 'transfer', 'salary']), rng.choice(['ACME', 'Grocer'])])
+            statement.append(rows)
+        path = directory / f'statement_{i:04d}.pdf'
+        path.write_bytes(pdf_bytes(statement))
+        paths.append(path)
+    return paths
+
+
+def per_document(processor: DocumentProcessor, file_path: Path) -> pd.DataFrame:
+    """The parser before page batching"""
+    if check_java_installation():
+        try:
+            import tabula
+            for df in tabula.read_pdf(str(file_path), multiple_tables=True, pages='all',
+                                      guess=True, lattice=True, stream=True):
+                if 'payee' not in df.columns:
+                    df['payee'] = ''
+                transactions = processor.transaction_processor.process_transactions(df)
+                if not transactions.empty:
+                    return transactions
+        except Exception as e:
+            print(f"Error processing PDF with tabula: {e}")
+    return processor._process_pdf_fallback(file_path)
+
+
+def timed(parse, paths: list) -> tuple:
+    java_starts = 0
+    run = subprocess.run
+
+    def counting_run(args, *pargs, **kwargs):
+        nonlocal java_starts
+        java_starts += bool(args) and args[0] == 'java'
+        return run(args, *pargs, **kwargs)
+
+    subprocess.run = counting_run
+    try:
+        start = time.perf_counter()
+        frames = [parse(path) for path in paths]
+        return frames, time.perf_counter() - start, java_starts
+    finally:
+        subprocess.run = run
+
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    java = check_java_installation()
+    backend = ('jpype, one JVM per process' if find_spec('jpype') else 'subprocess, one JVM per call') if java \
+        else 'none, PyPDF2 only'
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_corpus(Path(tmp), files, pages)
+        processor = DocumentProcessor()
+        print(f"{files} PDFs of {pages} pages, tabula backend: {backend}")
+        before, before_s, before_starts = timed(lambda path: per_document(processor, path), paths)
+        after, after_s, after_starts = timed(processor.process, paths)
+        print(f"per document: {before_s:7.2f}s  {sum(map(len, before)):7d} rows  {before_starts:5d} java starts")
+        print(f"per page:     {after_s:7.2f}s  {sum(map(len, after)):7d} rows  {after_starts:5d} java starts")
+        if not java:
+            assert all(a.equals(b) for a, b in zip(before, after)), 'PyPDF2 rows differ'
@@ -0,0 +1,77 @@
+"""Benchmark: rendering transaction rows, per-row lambdas versus the shared vectorized layer.
+
+"before" is what /transactions and /search did: pd.to_datetime and strftime
+on dates, a float() lambda per amount, a list comprehension of source
+buttons per row, then DataFrame.to_html. "table" is render_table, "rows"
+render_rows followed by the JSON encoding the endpoints do. The formatted
+dates, amounts and source buttons of both are checked to be identical.
+
+Usage: python benchmarks/bench_render.py [rows]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from transaction_render import format_amounts, format_dates, render_rows, render_table, source_links  # noqa: E402
+
+SOURCES = [f'data_lake/staging/statement_{month:02d}.json' for month in range(1, 25)]
+
+
+def master(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(SOURCES, rows)
+    return pd.DataFrame({
+        'date': np.datetime64('2018-01-01') + rng.integers(0, 2000, rows),
+        'amount': rng.integers(-100000, 100000, rows) / 100,
+        'description': [f'card purchase ref {r}' for r in rng.integers(0, rows, rows)],
+        'payee': rng.choice(['Coffee Corner', 'Grocer', 'Fuel & Co', 'Landlord'], rows),
+        'source_file': np.where(rng.random(rows) < 0.2, sources + ', ' + SOURCES[0], sources),
+        'id': [f'{i:016x}' for i in range(rows)],
+    })
+
+
+def before(df: pd.DataFrame) -> str:
+    df = df.copy().fillna('')
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    df['amount'] = df['amount'].apply(lambda x: f"{float(x):.2f}" if x != '' else '')
+    df['source_file'] = df['source_file'].apply(
+        lambda x: ' '.join([
+            f'<a href="/file/{file.strip()}" class="btn btn-sm btn-outline-secondary">{Path(file.strip()).name}</a>'
+            for file in str(x).split(', ')
+        ])
+    )
+    return df.to_html(classes='table table-striped table-hover', index=False, table_id='transactionTable', escape=False)
+
+
+def timed(func, repeat: int = 3) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = master(rows)
+
+    assert format_dates(df['date']).tolist() == pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d').tolist()
+    assert format_amounts(df['amount']).tolist() == [f"{x:.2f}" for x in df['amount']]
+    assert df['source_file'].map(source_links).tolist() == [
+        ' '.join(f'<a href="/file/{f.strip()}" class="btn btn-sm btn-outline-secondary">{Path(f.strip()).name}</a>'
+                 for f in x.split(', ')) for x in df['source_file']]
+
+    before_ms = timed(lambda: before(df), repeat=1)
+    table_ms = timed(lambda: render_table(df))
+    rows_ms = timed(lambda: json.dumps(render_rows(df)))
+    scale = 100_000 / rows
+    print(f"{rows} rows, times per 100k rows")
+    print(f"before (apply + to_html): {before_ms * scale:8.1f}ms")
+    print(f"render_table:             {table_ms * scale:8.1f}ms")
+    print(f"render_rows + json:       {rows_ms * scale:8.1f}ms")
+    print(f"response size: html {len(render_table(df)) / rows:.0f} B/row, "
+          f"rows {len(json.dumps(render_rows(df))) / rows:.0f} B/row")
@@ -0,0 +1,74 @@
+"""Benchmark: indexed search versus a full scan at up to a million master rows.
+
+The scan is what search_transactions did before the index:
+astype(str).str.lower().str.contains over every row of each field. Results
+of both must match. Index build and refresh times are reported separately
+from query latency.
+
+Usage: python benchmarks/bench_search.py [rows]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from search_index import SearchIndex  # noqa: E402
+
+MERCHANTS = ['Coffee Corner', 'Grocer', 'Fuel Station', 'Landlord', 'ACME Payroll', 'Book Shop', 'Pharmacy']
+QUERIES = [('description', 'coffee'), ('description', 'ref 12345'), ('description', 'zz'), ('description', 'new'),
+           ('payee', 'acme'), ('payee', 'shop 7'), ('amount', '42.5'), ('amount', '-100..-90')]
+
+
+def master(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    merchants = rng.choice(MERCHANTS, rows)
+    refs = rng.integers(0, rows // 5, rows)
+    return pd.DataFrame({
+        'date': np.datetime64('2018-01-01') + rng.integers(0, 2000, rows),
+        'amount': rng.integers(-100000, 100000, rows) / 100,
+        'description': [f'{m} card purchase ref {r}' for m, r in zip(merchants, refs)],
+        'payee': [f'{m} shop {r % 500}' for m, r in zip(merchants, refs)],
+    })
+
+
+def scan(df: pd.DataFrame, field: str, query: str) -> np.ndarray:
+    if field == 'amount':
+        if '..' in query:
+            low, high = map(float, query.split('..'))
+            return np.flatnonzero(df['amount'].between(low, high).to_numpy())
+        return np.flatnonzero((df['amount'] == float(query)).to_numpy())
+    return np.flatnonzero(df[field].astype(str).str.lower().str.contains(query, na=False).to_numpy())
+
+
+def timed(func, repeat: int = 5) -> tuple:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = master(rows)
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.search(1, df, 'x', [])
+    print(f"{rows} rows, {df['description'].nunique()} distinct descriptions")
+    print(f"index build: {time.perf_counter() - start:.2f}s")
+
+    # An entry write: ten rows change, the index follows without a rebuild
+    df = df.copy()
+    df.loc[:9, 'description'] = [f'new coffee entry {i}' for i in range(10)]
+    start = time.perf_counter()
+    index.apply(1, 2, len(df), np.arange(10), np.arange(10), df.iloc[:10])
+    print(f"index update for 10 changed rows: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    print(f"{'field':>12} {'query':>12} {'matches':>8} {'scan ms':>8} {'index ms':>9}")
+    for field, query in QUERIES:
+        expected, scan_ms = timed(lambda: scan(df, field, query), repeat=2)
+        found, index_ms = timed(lambda: index.search(2, df, query, [field]))
+        assert np.array_equal(expected, found), (field, query)
+        print(f"{field:>12} {query:>12} {len(found):>8} {scan_ms:>8.1f} {index_ms:>9.2f}")
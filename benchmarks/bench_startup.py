@@ -0,0 +1,73 @@
+"""Benchmark: app import time and time to the first served request.
+
+Each run starts a fresh interpreter in an empty working directory, as a new
+server worker would, imports app and serves GET /api/cache through Flask's
+test client. Reported are the process wall time to the first response, the
+import and first request as measured inside the process, and the slowest
+imports according to python -X importtime. It also checks that the PDF and
+Word libraries are not imported until a document is parsed.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFERRED = ['tabula', 'PyPDF2', 'docx']
+
+CHILD = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+assert app.app.test_client().get('/api/cache').status_code == 200
+served = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'request': served - imported,
+                  'deferred': [name for name in {DEFERRED!r} if name in sys.modules]}}))
+"""
+
+
+def run(args: list, cwd: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+def import_times(cwd: str) -> list:
+    """(self us, cumulative us, module) of every import, from -X importtime"""
+    times = []
+    for line in run(['-X', 'importtime', '-c', 'import app'], cwd).stderr.splitlines():
+        parts = line.removeprefix('import time:').split('|')
+        if len(parts) == 3 and parts[0].strip().isdigit():
+            times.append((int(parts[0]), int(parts[1]), parts[2].strip()))
+    return times
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    walls, imports, requests = [], [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            result = json.loads(run(['-c', CHILD], tmp).stdout.splitlines()[-1])
+            walls.append(time.perf_counter() - start)
+            imports.append(result['import'])
+            requests.append(result['request'])
+            assert not result['deferred'], f"imported at startup: {result['deferred']}"
+
+    print(f"{runs} runs, medians")
+    print(f"process start to first response: {statistics.median(walls) * 1000:7.0f}ms")
+    print(f"import app:                      {statistics.median(imports) * 1000:7.0f}ms")
+    print(f"first request:                   {statistics.median(requests) * 1000:7.0f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        times = import_times(tmp)
+    print("slowest top-level imports (cumulative):")
+    top_level = [entry for entry in times if '.' not in entry[2]]
+    for _, cumulative, module in sorted(top_level, reverse=True, key=lambda entry: entry[1])[:10]:
+        print(f"  {module:<24} {cumulative / 1000:7.1f}ms")
@@ -0,0 +1,50 @@
+"""Benchmark: master database save/load time and file size per storage backend.
+
+Usage: python benchmarks/bench_storage.py [rows ...]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from storage import STORAGE_BACKENDS  # noqa: E402
+
+
+def make_master(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'date': pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'amount': rng.integers(-500000, 500000, rows) / 100,
+        'description': np.char.add('purchase ', rng.integers(0, 5000, rows).astype(str)).astype(object),
+        'payee': np.char.add('payee ', rng.integers(0, 300, rows).astype(str)).astype(object),
+        'source_file': np.char.add('data_lake/staging/statement_', rng.integers(0, 500, rows).astype(str)).astype(object)
+    })
+
+
+def run(rows: int) -> list:
+    df = make_master(rows)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, storage_class in STORAGE_BACKENDS.items():
+            storage = storage_class(Path(tmp) / f"master_database{storage_class.suffix}")
+            start = time.perf_counter()
+            storage.save(df)
+            save = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = storage.load()
+            load = time.perf_counter() - start
+            assert len(loaded) == rows
+            results.append((rows, name, save, load, storage.path.stat().st_size / 2 ** 20))
+    return results
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'rows':>9} {'backend':>8} {'save s':>8} {'load s':>8} {'size MiB':>9}")
+    for rows in sizes:
+        for rows, name, save, load, size in run(rows):
+            print(f"{rows:>9} {name:>8} {save:>8.3f} {load:>8.3f} {size:>9.1f}")
@@ -0,0 +1,111 @@
+"""Benchmark: parsing a multi-million-line bank text export with TextProcessor.
+
+"before" is the parser it replaced: chardet over the whole file,
+readlines(), uncompiled re.match / re.search per line, up to six strptime
+formats per date and a second match of every following line. "after" is
+TextProcessor.process. The export mixes entries, continuation lines, blank
+lines and dated lines without an amount. The old parser emitted an entry
+again after each such dated line; with those repeats dropped both must
+produce the same rows.
+
+Usage: python benchmarks/bench_text_parse.py [lines]
+"""
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import chardet
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from processors import TextProcessor  # noqa: E402
+
+DATE_PATTERN = r'^(?:\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2})'
+
+
+def write_export(path: Path, lines: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    entries = lines * 2 // 3
+    days = np.datetime64('2020-01-01') + rng.integers(0, 1500, entries)
+    dates = pd.to_datetime(days).strftime('%d/%m/%Y')
+    amounts = rng.integers(-500000, 500000, entries) / 100
+    payees = rng.choice(['ACME', 'Grocer', 'Landlord', 'Fuel'], entries)
+    kinds = rng.random(entries)
+    with open(path, 'w', encoding='utf-8') as file:
+        for date, amount, payee, kind in zip(dates, amounts, payees, kinds):
+            file.write(f'{date} Card purchase café {amount} Payee: {payee}\n')
+            if kind < 0.3:
+                file.write('Reference 00123 terminal 7\n')
+            elif kind < 0.4:
+                file.write('\n')
+            elif kind < 0.5:
+                file.write(f'{date} Balance brought forward\n')
+
+
+def before(file_path: Path) -> pd.DataFrame:
+    def normalize_date(date_str):
+        for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%y']:
+            try:
+                return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+        return None
+
+    with open(file_path, 'rb') as file:
+        encoding = chardet.detect(file.read())['encoding'] or 'utf-8'
+    entries = []
+    current_entry = None
+    with open(file_path, 'r', encoding=encoding) as file:
+        lines = file.readlines()
+        for i, line in enumerate(lines):
+            line = line.strip()
+            if not line:
+                continue
+            date_match = re.match(DATE_PATTERN, line)
+            if date_match:
+                if current_entry:
+                    entries.append(current_entry)
+                normalized_date = normalize_date(date_match.group(0))
+                if normalized_date:
+                    remainder = line[date_match.end():].strip()
+                    amount_match = re.search(r'\s(-?\d+\.?\d*)\s', remainder)
+                    if amount_match:
+                        parts = remainder.split(amount_match.group(0))
+                        payee_match = re.search(r'Payee:\s*(\w+)', parts[1]) if len(parts) > 1 else None
+                        current_entry = {
+                            'date': normalized_date,
+                            'amount': float(amount_match.group(1)),
+                            'description': parts[0].strip(),
+                            'payee': payee_match.group(1) if payee_match else ''
+                        }
+                        if i + 1 < len(lines):
+                            next_line = lines[i + 1].strip()
+                            if next_line and not re.match(DATE_PATTERN, next_line):
+                                current_entry['description'] = f"{current_entry['description']} - {next_line}"
+    if current_entry:
+        entries.append(current_entry)
+    return pd.DataFrame(entries) if entries else pd.DataFrame(columns=['date', 'amount', 'description', 'payee'])
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'export.txt'
+        write_export(path, lines)
+        print(f"{sum(1 for _ in open(path, encoding='utf-8'))} lines, {path.stat().st_size / 1e6:.0f} MB")
+        old, old_s = timed(lambda: before(path))
+        new, new_s = timed(lambda: TextProcessor().process(path))
+        repeated = old.eq(old.shift()).all(axis=1)
+        assert old[~repeated].reset_index(drop=True).equals(new), 'parsers disagree'
+        print(f"before: {old_s:7.2f}s  {len(new) / old_s:10.0f} entries/s")
+        print(f"after:  {new_s:7.2f}s  {len(new) / new_s:10.0f} entries/s  ({old_s / new_s:.1f}x)")
@@ -0,0 +1,56 @@
+"""Load test: entry write throughput with 1, 8 and 32 concurrent writers.
+
+Each writer adds entries and then updates every entry it added. Afterwards
+the lake is reopened from disk, replaying the write-ahead log, and every
+add and update must be present.
+
+Group commit only pays off where fsync is slow, so point the benchmark at
+the disk the lake will live on.
+
+Usage: python benchmarks/bench_wal_writers.py [ops per writer] [directory]
+"""
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_lake import DataLake  # noqa: E402
+
+
+def run(writers: int, ops: int, directory: str = None) -> tuple:
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        lake = DataLake(tmp, watch=False)
+        lake.WAL_COMPACT_RECORDS = 10 ** 9  # Keep the whole run in the log
+        added = [[] for _ in range(writers)]
+
+        def writer(n: int) -> None:
+            for i in range(ops):
+                added[n].append(lake.add_entry({'date': 1533081600000, 'amount': i, 'description': f'writer {n}'}))
+            for entry_id in added[n]:
+                lake.update_entry(entry_id, {'payee': f'payee {n}'})
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        commits = lake.wal.commits
+
+        df = DataLake(tmp, watch=False).get_master_data().set_index('id')
+        for n, entry_ids in enumerate(added):
+            assert len(entry_ids) == ops and all(entry_ids), 'add failed'
+            assert (df.loc[entry_ids, 'payee'] == f'payee {n}').all(), 'lost update'
+        return 2 * writers * ops / elapsed, 2 * writers * ops / commits
+
+
+if __name__ == '__main__':
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+    print(f"{'writers':>7} {'writes/s':>9} {'records/fsync':>14}")
+    for writers in [1, 8, 32]:
+        throughput, batch = run(writers, ops, directory)
+        print(f"{writers:>7} {throughput:>9.0f} {batch:>14.1f}")
@@ -0,0 +1,131 @@
+"""Benchmark: per-worker memory and cold load time of the master snapshot.
+
+Writes one master of N rows with each storage backend, drops it from the
+page cache and starts W worker processes at once, as gunicorn forks its
+workers. Each loads the master through MasterCache and reads every column,
+then all report together how much their memory grew:
+
+- RSS counts every resident page the worker maps, shared or not;
+- private is what only that worker holds (USS);
+- PSS splits shared pages between the processes mapping them, so the
+  PSS of all workers adds up to the memory they cost the machine.
+
+Parquet is parsed into private memory by each worker. The Arrow IPC file is
+memory-mapped, so the workers share its pages in the page cache. Every
+worker must read the same rows.
+
+Usage: python benchmarks/bench_worker_memory.py [rows] [workers]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from master_cache import MasterCache  # noqa: E402
+from master_merge import format_ids  # noqa: E402
+from storage import STORAGE_BACKENDS  # noqa: E402
+
+BACKENDS = ['parquet', 'arrow']
+
+
+def make_master(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'date': pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'amount': rng.integers(-500000, 500000, rows) / 100,
+        'description': np.char.add('card purchase ', rng.integers(0, 50000, rows).astype(str)),
+        'payee': np.char.add('payee ', rng.integers(0, 2000, rows).astype(str)),
+        'source_file': np.char.add('data_lake/staging/statement_', rng.integers(0, 800, rows).astype(str)),
+        'id': format_ids(rng.integers(0, 2 ** 63, rows, dtype=np.uint64))
+    })
+
+
+def memory_mb() -> dict:
+    """RSS, private and PSS of this process in MiB"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0]) / 1024
+    return {'rss': fields['Rss'], 'private': fields['Private_Clean'] + fields['Private_Dirty'], 'pss': fields['Pss']}
+
+
+def evict(path: Path) -> None:
+    """Drop the file's pages from the page cache, so the next load reads the disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def worker(backend: str, path: Path) -> None:
+    before = memory_mb()
+    start = time.perf_counter()
+    frame = MasterCache(STORAGE_BACKENDS[backend](path)).get().frame
+    seconds = time.perf_counter() - start
+    # Read every column, as serving pages and searches eventually does
+    checksum = (float(frame['amount'].sum()) + int(frame['date'].to_numpy().view('int64').sum() % 1000)
+                + int(frame['description'].str.len().sum()) + int(frame['id'].str.len().sum())
+                + int(frame['payee'].cat.codes.sum()) + int(frame['source_file'].cat.codes.sum()))
+    pa.default_memory_pool().release_unused()  # Scratch memory of the sums above
+    print('ready', flush=True)
+    sys.stdin.readline()  # Measure once every worker has loaded
+    after = memory_mb()
+    print(json.dumps({'seconds': seconds, 'checksum': checksum,
+                      **{name: after[name] - before[name] for name in after}}), flush=True)
+
+
+def run(backend: str, path: Path, workers: int) -> dict:
+    evict(path)
+    processes = [subprocess.Popen([sys.executable, __file__, '--worker', backend, str(path)],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    for process in processes:
+        assert process.stdout.readline().strip() == 'ready', f'{backend} worker failed'
+    results = []
+    for process in processes:
+        process.stdin.write('\n')
+        process.stdin.flush()
+    for process in processes:
+        results.append(json.loads(process.stdout.readline()))
+        process.wait()
+    assert len({result['checksum'] for result in results}) == 1, f'{backend} workers read different rows'
+    return {
+        'checksum': results[0]['checksum'],
+        'seconds': max(result['seconds'] for result in results),
+        **{name: sum(result[name] for result in results) / workers for name in ['rss', 'private', 'pss']},
+        'total': sum(result['pss'] for result in results)
+    }
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--worker']:
+        worker(sys.argv[2], Path(sys.argv[3]))
+        sys.exit()
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    df = make_master(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{rows} rows, {workers} workers, MiB per worker")
+        print(f"{'backend':>8} {'file MiB':>9} {'cold load s':>12} "
+              f"{'RSS':>6} {'private':>8} {'PSS':>6} {'PSS total':>10}")
+        results = {}
+        for backend in BACKENDS:
+            storage = STORAGE_BACKENDS[backend](Path(tmp) / f'master_database{STORAGE_BACKENDS[backend].suffix}')
+            storage.save(df)
+            result = results[backend] = run(backend, storage.path, workers)
+            print(f"{backend:>8} {storage.path.stat().st_size / 2 ** 20:9.0f} {result['seconds']:12.2f} "
+                  f"{result['rss']:6.0f} {result['private']:8.0f} {result['pss']:6.0f} {result['total']:10.0f}")
+        assert len({result['checksum'] for result in results.values()}) == 1, 'backends hold different rows'
@@ -1,38 +1,95 @@
-import time
+import numpy as np
 import pandas as pd
 import os
 from pathlib import Path
 import shutil
-from typing import Union, List
-from processors import ExcelCsvProcessor, DocumentProcessor, TextProcessor
+from typing import Dict, Iterable, Iterator, Union, List, Set, Tuple
+from staging_manifest import StagingManifest
+from ingestion_ledger import IngestionLedger
+from parse_cache import ParseCache
+from master_merge import DEFAULT_MERGE_POLICY, MERGE_POLICIES, MergeState, aggregate, assign_ids, merge_keys
+from storage import MASTER_COLUMNS, STORAGE_BACKENDS, JsonStorage, conform_master, create_storage
+from master_cache import MasterCache, MasterSnapshot
+from search_index import SearchIndex, unchanged_rows
+from master_query import PageQuery, SortIndex
+from master_rollup import AggregateQuery, RollupIndex
+from master_export import EXPORT_CHUNK_ROWS
+from merge_scheduler import MergeScheduler
+from write_ahead_log import WriteAheadLog, apply_records, check_record, validate_operation
+from raw_ingest import RAW_COLUMNS, IngestPool, ProcessorRegistry, parse_file
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import threading
 from contextlib import contextmanager
 
 class DataLake:
-    def __init__(self, base_path: str):
+    WAL_COMPACT_RECORDS = 1000  # Fold the write-ahead log into the master after this many records
+    WAL_COMPACT_INTERVAL = 60.0  # ... or after this many seconds with any records pending
+    INGEST_TIMEOUT = 300.0  # Give up on a raw file whose parser runs longer than this
+    PARSE_CACHE_BYTES = 512 * 1024 * 1024  # Staging output kept for reuse, least recently used evicted first
+
+    def __init__(self, base_path: str, watch: bool = True, storage: str = 'arrow', workers: int = None,
+                 merge_policy: str = DEFAULT_MERGE_POLICY):
+        if merge_policy not in MERGE_POLICIES:
+            raise ValueError(f"Unsupported merge policy: {merge_policy}")
         self.base_path = Path(base_path)
+        self.merge_policy = MERGE_POLICIES[merge_policy]  # Which staging rows are the same transaction
+        self.workers = (os.cpu_count() or 1) if workers is None else workers  # Raw parsing processes, 0 parses inline
         self.raw_zone = self.base_path / "raw"
         self.staging_zone = self.base_path / "staging"
-        self.master_database = self.base_path / "master_database.json"
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.storage = create_storage(storage, self.base_path)
+        self.master_database = self.storage.path
+        self.wal = WriteAheadLog(self.base_path / "master_wal.ndjson")
+        self._cache = MasterCache(self.storage, load=self._load_master, watch=self.wal.signature)
+        self.manifest = StagingManifest(self.base_path / "staging_manifest.json")
+        self.ledger = IngestionLedger(self.base_path / "ingestion_ledger.json")
+        self.parse_cache = ParseCache(self.base_path / "parse_cache", self.PARSE_CACHE_BYTES)
+        self._ingest_lock = threading.Lock()  # One raw-zone ingestion at a time
+        self._merge_state = None  # (generation, MergeState) written by the last merge
+        self._deleted_sources: Set[str] = set()  # Staging files the watcher saw deleted and not recreated
+        self._merge_scheduler = None  # Runs merges for the staging watcher
+        self._watch_lock = threading.Lock()
+        self._search_index = SearchIndex()
+        self._sort_index = SortIndex()
+        self._rollup_index = RollupIndex()
+        self._db_lock = threading.Lock()  # Add lock for master database
+        self._write_queue: List[dict] = []  # Entry writes waiting for the master lock
+        self._write_queue_lock = threading.Lock()
         
-        # Initialize processors
-        self.excel_processor = ExcelCsvProcessor()
-        self.document_processor = DocumentProcessor()
-        self.text_processor = TextProcessor()
+        # Processors are built the first time a file of their type is parsed
+        self.processors = ProcessorRegistry()
         
         # Create necessary directories
         for path in [self.raw_zone, self.staging_zone]:
             path.mkdir(parents=True, exist_ok=True)
         
-        # Initialize master database if it doesn't exist
-        if not self.master_database.exists():
-            self.master_database.write_text('[]', encoding='utf-8')
-        
+        # Initialize master database if it doesn't exist, importing the latest master
+        # written by another backend together with the entry changes logged over it
+        if not self.storage.exists():
+            previous = [storage_class(self.base_path / f"master_database{storage_class.suffix}")
+                        for storage_class in STORAGE_BACKENDS.values()]
+            previous = [other for other in previous if other.path != self.master_database and other.exists()]
+            if previous:
+                latest = max(previous, key=lambda other: other.path.stat().st_mtime_ns)
+                self._save_master(apply_records(latest.load(), self.wal.records())[0])
+            else:
+                self._save_master(pd.DataFrame(columns=MASTER_COLUMNS))
+
+        # Give rows from masters written before entry ids existed a stable id
+        master_df = self._cache.get().frame
+        if not master_df.empty and ('id' not in master_df.columns or master_df['id'].isna().any()):
+            self._save_master(assign_ids(master_df.copy()))
+
+        # Fold entry changes left in the log by the last run into the master file
+        if self.wal.records_since_checkpoint:
+            self.compact()
+        self._compact_event = threading.Event()
+        threading.Thread(target=self._compact_loop, name='wal-compactor', daemon=True).start()
+
         # Start watching the staging area
-        self.watch_staging()
-        self._db_lock = threading.Lock()  # Add lock for master database
+        if watch:
+            self.watch_staging()
 
     @contextmanager
     def _master_db_lock(self):
@@ -60,159 +117,471 @@ class DataLake:
     def process_file(self, file_path: Path) -> pd.DataFrame:
         """Process different file types using appropriate processor"""
         try:
-            suffix = file_path.suffix.lower()
-            
-            if suffix in ['.csv', '.xlsx', '.xls']:
-                df = self.excel_processor.process(file_path)
-            elif suffix in ['.pdf', '.docx']:
-                df = self.document_processor.process(file_path)
-            elif suffix == '.txt':
-                df = self.text_processor.process(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {suffix}")
-                
-            # Ensure all required columns exist with correct types
-            required_cols = ['date', 'amount', 'description', 'payee']
-            for col in required_cols:
-                if col not in df.columns:
-                    df[col] = '' if col != 'amount' else 0.0
-                    
-            return df[required_cols]  # Return only required columns in correct order
-            
+            return parse_file(file_path, self.processors)
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
             # Return empty DataFrame with required columns
-            return pd.DataFrame(columns=['date', 'amount', 'description', 'payee'])
+            return pd.DataFrame(columns=RAW_COLUMNS)
 
-    def process_raw_data(self, folder: str = None) -> None:
-        """Process all files in raw zone and save as JSON in staging"""
-        source_dir = self.raw_zone / (folder if folder else "")
-        for file_path in source_dir.glob("**/*"):
-            if file_path.is_file():
-                try:
-                    df = self.process_file(file_path)
-                    output_path = self.staging_zone / folder if folder else self.staging_zone
-                    output_path.mkdir(parents=True, exist_ok=True)
-                    json_path = output_path / f"{file_path.stem}.json"
-                    
-                    try:
-                        # Convert DataFrame to JSON with orient='records' for better readability
-                        df.to_json(json_path, orient='records', indent=4)
-                    except Exception as e:
-                        print(f"Error saving JSON for {file_path.name}: {e}")
-                        
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
+    def process_raw_data(self, folder: str = None) -> Dict[str, str]:
+        """Process new and changed files in raw zone and save as JSON in staging.
+
+        The ingestion ledger skips raw files whose content and processor
+        version match their last successful parse. Files whose content was
+        parsed before by the same processor version, under any path or in a
+        run the ledger never recorded, get their staging output from the
+        parse cache. The rest are parsed in
+        parallel by self.workers processes, each within INGEST_TIMEOUT seconds,
+        and streamed to staging chunk by chunk. Raw files are handled in sorted
+        path order, so the output does not depend on which worker finishes
+        first. A staging file is only replaced when its content changes. A
+        file that fails keeps its previous staging output. Returns the error of
+        every failed file by path.
+        """
+        with self._ingest_lock:
+            source_dir = self.raw_zone / (folder if folder else "")
+            file_paths = sorted(path for path in source_dir.glob("**/*") if path.is_file())
+            output_path = self.staging_zone / folder if folder else self.staging_zone
+            staging_paths = {str(path): output_path / f"{path.stem}.json" for path in file_paths}
+            parsers = {str(path): self.processors.version(path.suffix.lower()) for path in file_paths}
+
+            pending = self.ledger.pending(file_paths, parsers, staging_paths)
+            self.ledger.prune(source_dir, file_paths)
+            pool = IngestPool(self.workers, self.INGEST_TIMEOUT, self.processors)
+            output_path.mkdir(parents=True, exist_ok=True)
+
+            failures = {}
+            todo = []
+            cache_keys = {}
+            for path in file_paths:
+                entry = pending.get(str(path))
+                if entry is None:
                     continue
+                if entry['parser']:
+                    cache_keys[str(path)] = ParseCache.key(entry['sha256'], entry['parser'], entry['version'])
+                    rows = self.parse_cache.get(cache_keys[str(path)], staging_paths[str(path)])
+                    if rows is not None:
+                        self.ledger.entries[str(path)] = {**entry, 'rows': rows}
+                        continue
+                todo.append(path)
 
-    def update_master_database(self) -> None:
-        """Update master database with data from staging"""
-        with self._master_db_lock():  # Use lock when updating
-            all_data = []
-            for file_path in self.staging_zone.glob("**/*.json"):
-                try:
-                    df = pd.read_json(file_path, orient='records')
-                    df['source_file'] = str(file_path)  # Add source file column here
-                    # Fill NA/None values
-                    df['payee'] = df['payee'].fillna('')
-                    df['description'] = df['description'].fillna('')
-                    all_data.append(df)
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
+            for file_path, rows, error in pool.map(todo, [staging_paths[str(path)] for path in todo]):
+                if error is not None:
+                    print(f"Error processing {file_path}: {error}")
+                    failures[str(file_path)] = error
                     continue
-            
-            if all_data:
-                combined_df = pd.concat(all_data, ignore_index=True)
-                
-                # Load existing master database
-                if self.master_database.exists():
-                    master_df = pd.read_json(self.master_database, orient='records')
-                else:
-                    master_df = pd.DataFrame(columns=['date', 'amount', 'description', 'payee', 'source_file'])
-                
-                # Combine all entries (master and new)
-                all_entries = pd.concat([master_df, combined_df], ignore_index=True)
-                
-                # Group by date and amount
-                updated_master_df = all_entries.groupby(['date', 'amount'], as_index=False).agg({
-                    'description': lambda x: ' - '.join(filter(None, set(x))),  # Combine unique descriptions
-                    'payee': lambda x: ' - '.join(filter(None, set(x))),  # Combine unique payees
-                    'source_file': lambda x: ', '.join(set(x))  # Combine source files
-                })
-                
-                # Remove entries with deleted source files
-                updated_master_df = updated_master_df[
-                    updated_master_df['source_file'].apply(
-                        lambda x: all(Path(file.strip()).exists() for file in x.split(','))
-                    )
-                ]
-                
-                updated_master_df.to_json(self.master_database, orient='records', indent=4)
-                print(f"Updated master database with {len(updated_master_df)} records")
+                self.ledger.entries[str(file_path)] = {**pending[str(file_path)], 'rows': rows}
+                try:
+                    self.parse_cache.put(cache_keys[str(file_path)], staging_paths[str(file_path)], rows)
+                except OSError as e:
+                    print(f"Error caching parse result of {file_path}: {e}")
+
+            self.ledger.save()
+            return failures
+
+    def update_master_database(self, paths: Iterable[str] = None) -> None:
+        """Merge new, changed and deleted staging files into the master database.
+
+        Only the staging delta reported by the manifest is read. Rows from
+        changed or deleted files are retracted and the affected (date, amount)
+        groups are recomputed from their remaining sources, giving the same
+        result as rebuild_master_database. A master merged under another
+        merge policy is rebuilt. Given the paths the staging watcher saw
+        change, only those are compared with the manifest instead of listing
+        the whole staging area.
+        """
+        with self._master_db_lock():  # Use lock when updating
+            if (not self.manifest.entries or not self.master_database.exists()
+                    or self.manifest.settings.get('merge_policy') != self.merge_policy.name):
+                self._rebuild_master(self._staging_files())
+                return
+
+            if paths is None:
+                changed, deleted = self.manifest.diff(self._staging_files())
+            else:
+                staging = {str(path) for path in map(Path, paths)
+                           if path.suffix == '.json' and path.is_relative_to(self.staging_zone)}
+                present = [Path(path) for path in sorted(staging) if Path(path).is_file()]
+                self._deleted_sources.difference_update(staging - {str(path) for path in present})
+                changed, deleted = self.manifest.diff(
+                    [path for path in present if str(path) not in self._deleted_sources], only=staging)
+            if not changed and not deleted:
+                self.manifest.save()
+                print("Master database already up to date with staging")
+                return
+
+            self._merge_delta(changed, deleted)
+
+    def rebuild_master_database(self) -> None:
+        """Rebuild the master database from every staging file"""
+        with self._master_db_lock():
+            self._rebuild_master(self._staging_files())
+
+    def _staging_files(self) -> List[Path]:
+        """Staging files present now, leaving out any the watcher has since seen deleted"""
+        staging_files = sorted(self.staging_zone.glob("**/*.json"))
+        # Only files still listed can be stale, forget the rest
+        self._deleted_sources.intersection_update(str(path) for path in staging_files)
+        deleted = set(self._deleted_sources)
+        return [path for path in staging_files if str(path) not in deleted]
+
+    def _read_staging_file(self, file_path: Path) -> pd.DataFrame:
+        """Load one staging JSON file as master rows, or None if unreadable"""
+        try:
+            df = pd.read_json(file_path, orient='records')
+            df['source_file'] = str(file_path)  # Add source file column here
+            # Fill NA/None values
+            df['payee'] = df['payee'].fillna('')
+            df['description'] = df['description'].fillna('')
+            return df
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
+            return None
+
+    def _load_master(self) -> pd.DataFrame:
+        """Master file with the entry changes logged since it was written"""
+        return apply_records(self.storage.load(), self.wal.records())[0]
+
+    def _save_master(self, df: pd.DataFrame, source: MasterSnapshot = None) -> int:
+        """Persist the master database and publish it to readers, returning its generation.
+
+        df must contain every entry change logged by this process and the ones
+        of other processes that snapshot source had seen; changes they logged
+        since are folded in. The logs are emptied once the file is on disk.
+        When df is source's frame, its sorted ids carry over.
+        """
+        with self.wal.checkpoint():
+            carry = source is not None and df is source.frame
+            if source is not None:
+                unseen = self.wal.records_after(source.watched)
+                if unseen:
+                    df, carry = apply_records(df, unseen)[0], False
+            frame = self.storage.save(df)
+            self.wal.truncate()
+            ids = None
+            if carry:
+                ids = source.ids.patched(frame['id'], source.overlay.deleted, list(source.overlay.appended))
+            return self._cache.publish(frame, ids).generation
+
+    def _log_entries(self, records: List[dict], atomic: bool = False) -> int:
+        """Apply entry mutations and make them durable, returning how many took effect.
+
+        Writes queue up and whoever holds the master lock applies every queued
+        write to the snapshot's entry overlay in one pass and appends the batch
+        to the write-ahead log, so concurrent writers never lose each other's updates.
+        The wait for the fsync happens outside the lock, letting concurrent
+        requests share one group commit. An atomic write is applied only if
+        every one of its records takes effect, otherwise none is.
+        """
+        return self._submit_write(records, atomic)['applied']
+
+    def _submit_write(self, records: List[dict], atomic: bool = False) -> dict:
+        """Queue a write, apply it and wait until it is durable, returning its write state.
+
+        The state holds 'applied', the number of records that took effect,
+        and 'flags', whether each one did. Raises ValueError before queueing
+        a record that cannot be applied, and the error of this write if
+        applying it failed; the other queued writes are applied regardless.
+        """
+        for record in records:
+            check_record(record)
+        write = {'records': records, 'atomic': atomic, 'applied': 0, 'flags': [], 'seq': 0, 'error': None}
+        with self._write_queue_lock:
+            self._write_queue.append(write)
+
+        with self._master_db_lock():
+            with self._write_queue_lock:
+                batch, self._write_queue = self._write_queue, []
+            if batch:
+                # Otherwise an earlier lock holder already applied this write
+                self._apply_writes(batch)
+
+        if write['error'] is not None:
+            raise write['error']
+        if not write['applied']:
+            return write
+        try:
+            self.wal.wait(write['seq'])
+        except OSError:
+            self._cache.invalidate()  # Fall back to what actually reached the disk
+            raise
+        if self.wal.records_since_checkpoint >= self.WAL_COMPACT_RECORDS:
+            self._compact_event.set()
+        return write
+
+    def _apply_writes(self, batch: List[dict]) -> None:
+        """Apply queued writes in order and log the ones that changed something.
+
+        The changes go into the snapshot's overlay; the master frame is only
+        copied when a reader folds them in, or by compact().
+        """
+        snapshot = self._cache.get()
+        while True:
+            records = [record for write in batch for record in write['records']]
+            try:
+                overlay, applied = snapshot.overlay.apply(snapshot.base, snapshot.ids, records)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0]['error'] = e
+                    return
+                # Apply each write on its own, so only the one that cannot be applied fails
+                for write in batch:
+                    self._apply_writes([write])
+                return
+            flags = iter(applied)
+            for write in batch:
+                write['flags'] = [next(flags) for _ in write['records']]
+            # Drop atomic writes that did not fully apply and redo the others without them
+            rejected = [write for write in batch if write['atomic'] and not all(write['flags'])]
+            if not rejected:
+                break
+            batch = [write for write in batch if not (write['atomic'] and not all(write['flags']))]
+        if not any(applied):
+            return
+        logged = [record for record, changed in zip(records, applied) if changed]
+        seq = self.wal.append(logged) - len(logged)
+        published = self._cache.publish_changes(snapshot, overlay)
+        entry_ids = list(dict.fromkeys(record['id'] for record in logged))
+        if snapshot.generation in (self._search_index.generation, self._rollup_index.generation):
+            # Indexes following the snapshot get the touched rows before and after the write
+            old_positions, new_positions = snapshot.positions(entry_ids), published.positions(entry_ids)
+            removed, added = snapshot.rows(entry_ids), published.rows(entry_ids)
+            self._search_index.apply(snapshot.generation, published.generation, published.size, old_positions,
+                                     new_positions, added.iloc[np.argsort(new_positions[new_positions >= 0])])
+            self._rollup_index.apply(snapshot.generation, published.generation, removed, added)
+
+        for write in batch:
+            for flag in write['flags']:
+                if flag:
+                    seq += 1
+                    write['applied'] += 1
+                    write['seq'] = seq
+
+    def compact(self) -> None:
+        """Fold the write-ahead log into the master file"""
+        with self._master_db_lock():
+            if not self.wal.records_since_checkpoint:
+                return
+            with self.wal.checkpoint():
+                snapshot = self._cache.get()  # Reloaded if other processes logged changes
+                frame = snapshot.frame
+                generation = self._save_master(frame, snapshot)
+            # Same rows, the search index and rollups carry over
+            no_rows = np.empty(0, dtype=np.intp)
+            self._search_index.apply(snapshot.generation, generation, len(frame), no_rows, no_rows,
+                                     frame.iloc[no_rows])
+            self._rollup_index.apply(snapshot.generation, generation, frame.iloc[no_rows], frame.iloc[no_rows])
+
+    def _compact_loop(self) -> None:
+        while True:
+            self._compact_event.wait(self.WAL_COMPACT_INTERVAL)
+            self._compact_event.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting write-ahead log: {e}")
+
+    def _load_merge_state(self) -> Tuple[MasterSnapshot, MergeState]:
+        """(current snapshot, its merge state), reusing the last merge's unless the master changed"""
+        snapshot = self._cache.get()
+        if self._merge_state is not None and self._merge_state[0] == snapshot.generation:
+            return snapshot, self._merge_state[1]
+        return snapshot, MergeState.from_master(snapshot.frame.copy())
+
+    def _write_master(self, state: MergeState, base: MasterSnapshot = None) -> bool:
+        """Save the master of a merge state made from snapshot base.
+
+        Returns False if other processes had logged entry changes base had
+        not seen, which the master then holds on top of the state.
+        """
+        self._merge_state = None  # Force a reload if the write fails half way
+        base = base or self._cache.get()
+        master_df = state.to_master()
+        with self.wal.checkpoint():
+            exact = not self.wal.records_after(base.watched)
+            generation = self._save_master(master_df, base)
+        if exact:
+            self._merge_state = (generation, state)
+        if self._search_index.generation == base.generation:
+            # Rows the merge kept as they were keep their search documents
+            published = self._cache.get()
+            old_rows = unchanged_rows(base.frame, base.positions(published.frame['id']), published.frame)
+            self._search_index.remap(base.generation, generation, published.frame, old_rows)
+        print(f"Updated master database with {len(master_df)} records")
+        return exact
+
+    def _rebuild_master(self, staging_files: List[Path]) -> None:
+        self.manifest.clear()
+        self.manifest.settings['merge_policy'] = self.merge_policy.name
+        changed, _ = self.manifest.diff(staging_files)
+        all_data = [df for df in map(self._read_staging_file, staging_files) if df is not None]
+        if not all_data:
+            self.manifest.apply(changed, [])
+            self.manifest.save()
+            print("No data found in staging to update master database")
+            return
+
+        base = None
+        if self.master_database.exists():
+            base, state = self._load_merge_state()
+            manual_df = state.manual_df
+        else:
+            manual_df = pd.DataFrame(columns=MASTER_COLUMNS)
+        merged_df = aggregate(pd.concat(all_data, ignore_index=True), self.merge_policy,
+                              deleted=set(self._deleted_sources))
+
+        self._write_master(MergeState(merged_df, manual_df), base)
+        self.manifest.apply(changed, [])
+        self.manifest.save()
+
+    def _merge_delta(self, changed: dict, deleted: List[str]) -> None:
+        base, state = self._load_merge_state()
+        touched = set(changed) | set(deleted)
+
+        new_data = {path: self._read_staging_file(Path(path)) for path in changed}
+        new_data = {path: (df, merge_keys(df, self.merge_policy)) for path, df in new_data.items() if df is not None}
+        new_keys = np.concatenate([np.empty(0, dtype=np.uint64)] + [
+            keys[(df['date'].notna() & df['amount'].notna()).to_numpy()] for df, keys in new_data.values()
+        ])
+
+        # Existing groups fed by the touched files or hit by the new rows
+        affected = state.affected_keys(touched, new_keys)
+        contributors = (state.contributors(affected) - touched) | set(new_data)
+        recompute = pd.Index(np.concatenate([affected, new_keys])).unique()
+
+        recomputed, recomputed_keys = [], []
+        for path in sorted(contributors):
+            if path in new_data:
+                df, keys = new_data[path]
             else:
-                print("No data found in staging to update master database")
+                df = self._read_staging_file(Path(path))
+                if df is None:
+                    continue
+                keys = merge_keys(df, self.merge_policy)
+            rows = recompute.get_indexer(keys) >= 0
+            recomputed.append(df[rows])
+            recomputed_keys.append(keys[rows])
+
+        if recomputed:
+            merged_df = aggregate(pd.concat(recomputed, ignore_index=True), self.merge_policy,
+                                  np.concatenate(recomputed_keys), set(self._deleted_sources))
+        else:
+            merged_df = pd.DataFrame(columns=MASTER_COLUMNS)
+        replaced = state.replace(affected, merged_df)
+
+        if self._write_master(state, base):
+            # The merge swapped the replaced rows for the merged ones, rollups follow it
+            self._rollup_index.apply(base.generation, self._merge_state[0], replaced, conform_master(merged_df))
+        self.manifest.apply(changed, deleted)
+        self.manifest.save()
+        print(f"Merged {len(changed)} changed and {len(deleted)} deleted staging files")
 
     def watch_staging(self):
-        """Continuously watch the staging area for updates"""
+        """Continuously watch the staging area for updates, once per lake"""
+        with self._watch_lock:
+            if self._merge_scheduler is None:
+                self._start_watching()
+
+    def _start_watching(self):
         class StagingHandler(FileSystemEventHandler):
-            def __init__(self, data_lake):
-                self.data_lake = data_lake
-                self._last_modified = 0
-                self._update_lock = threading.Lock()
+            """Track deleted staging files and hand every changed path to the merge scheduler"""
 
-            def _debounced_update(self):
-                """Debounce updates to prevent multiple rapid-fire updates"""
-                current_time = time.time()
-                if current_time - self._last_modified > 1.0:  # 1 second debounce
-                    with self._update_lock:
-                        self._last_modified = current_time
-                        self.data_lake.update_master_database()
+            def __init__(self, data_lake, scheduler):
+                self.data_lake = data_lake
+                self.scheduler = scheduler
 
             def on_modified(self, event):
                 if event.is_directory:
                     return
-                self._debounced_update()
+                self.data_lake._deleted_sources.discard(str(Path(event.src_path)))
+                self.scheduler.notify(str(Path(event.src_path)))
 
             def on_created(self, event):
                 if event.is_directory:
                     return
-                self._debounced_update()
+                self.data_lake._deleted_sources.discard(str(Path(event.src_path)))
+                self.scheduler.notify(str(Path(event.src_path)))
 
             def on_deleted(self, event):
                 if event.is_directory:
                     return
-                self._debounced_update()
+                self.data_lake._deleted_sources.add(str(Path(event.src_path)))
+                self.scheduler.notify(str(Path(event.src_path)))
 
-        event_handler = StagingHandler(self)
+            def on_moved(self, event):
+                if event.is_directory:
+                    return
+                self.data_lake._deleted_sources.add(str(Path(event.src_path)))
+                self.data_lake._deleted_sources.discard(str(Path(event.dest_path)))
+                self.scheduler.notify(str(Path(event.src_path)))
+                self.scheduler.notify(str(Path(event.dest_path)))
+
+        self._merge_scheduler = MergeScheduler(self.update_master_database)
+        event_handler = StagingHandler(self, self._merge_scheduler)
         observer = Observer()
         observer.schedule(event_handler, str(self.staging_zone), recursive=True)
         observer.start()
         print("Started watching staging area")  # Debug print
 
+    def export_master_json(self, json_path: str) -> bool:
+        """Export the master database in the legacy JSON records format"""
+        try:
+            JsonStorage(Path(json_path)).save(self._cache.get().frame)
+            return True
+        except Exception as e:
+            print(f"Error exporting master database: {e}")
+            return False
+
+    def import_master_json(self, json_path: str) -> bool:
+        """Replace the master database with a JSON records file"""
+        try:
+            with self._master_db_lock():
+                self._save_master(JsonStorage(Path(json_path)).load())
+            return True
+        except Exception as e:
+            print(f"Error importing master database: {e}")
+            return False
+
     def refresh_app(self):
         """Refresh the app with a loading screen overlay"""
         pass
 
     def get_master_data(self) -> pd.DataFrame:
-        """Retrieve data from master database"""
-        with self._master_db_lock():  # Use lock when reading
-            try:
-                if self.master_database.exists():
-                    return pd.read_json(self.master_database, orient='records')
-                return pd.DataFrame()
-            except Exception as e:
-                print(f"Error reading master database: {e}")
-                return pd.DataFrame()
-
-    def search_transactions(self, query: str, fields: list = None) -> pd.DataFrame:
-        """Search transactions in master database"""
+        """Retrieve a private copy of the master database from the shared snapshot"""
         try:
-            # Load master database
-            if not self.master_database.exists():
-                print("Master database does not exist")
-                return pd.DataFrame()
+            return self._cache.get().frame.copy()
+        except Exception as e:
+            print(f"Error reading master database: {e}")
+            return pd.DataFrame()
 
-            df = pd.read_json(self.master_database, orient='records')
+    def iter_master(self, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """The master database in chunks of rows, at least one, all from the current snapshot.
+
+        Chunks are read-only views of the shared snapshot, so walking them
+        costs no copy and later writes do not show up half way.
+        """
+        frame = self._cache.get().frame
+        return (frame.iloc[start:start + chunk_rows] for start in range(0, max(len(frame), 1), chunk_rows))
+
+    def watch_stats(self) -> dict:
+        """Queued events and merge latency of the staging watcher, empty when not watching"""
+        return self._merge_scheduler.stats() if self._merge_scheduler is not None else {}
+
+    def cache_stats(self) -> dict:
+        """Generation and hit/miss/reload counters of the master snapshot cache"""
+        return self._cache.stats()
+
+    def search_transactions(self, query: str, fields: list = None, prefix: bool = False) -> pd.DataFrame:
+        """Search transactions in master database.
+
+        Text fields match the query as a case-insensitive substring, or with
+        prefix=True any word starting with it. Amounts match a number or a
+        low..high range.
+        """
+        try:
+            # Read from the shared snapshot, results are filtered copies
+            snapshot = self._cache.get()
+            df = snapshot.frame
             if df.empty:
                 print("Empty master database")
                 return df
@@ -221,86 +590,106 @@ class DataLake:
             if not fields:
                 fields = ['description', 'payee']
 
-            # Convert query to string and lowercase
-            query = str(query).lower()
-            mask = pd.Series(False, index=df.index)
-
-            # Search in specified fields
-            for field in fields:
-                if field not in df.columns:
-                    continue
-                
-                if field == 'amount':
-                    # Try to convert query to float for amount search
-                    try:
-                        amount = float(query)
-                        mask |= (df['amount'] == amount)
-                    except ValueError:
-                        continue
-                else:
-                    # Text search for other fields
-                    mask |= df[field].astype(str).str.lower().str.contains(query, na=False)
-
-            return df[mask].copy()
+            positions = self._search_index.search(snapshot.generation, df, str(query), fields, prefix)
+            return df.iloc[positions].copy()
 
         except Exception as e:
             print(f"Error searching transactions: {e}")
             return pd.DataFrame()
 
-    def get_entry(self, timestamp: int) -> dict:
-        """Get a specific entry by timestamp"""
+    def query_transactions(self, query: PageQuery) -> Tuple[pd.DataFrame, int]:
+        """One page of the master database and how many rows match the query.
+
+        Rows are filtered by the query's date and amount ranges and payee
+        substring, ordered by its sort key and cut to its offset and limit.
+        The page is a copy, the total counts every matching row.
+        """
+        snapshot = self._cache.get()
+        df = snapshot.frame
+        if df.empty:
+            return df.copy(), 0
+
+        matches = []
+        if query.payee:
+            matches.append(self._search_index.search(snapshot.generation, df, query.payee, ['payee']))
+        positions, total = self._sort_index.page(snapshot.generation, df, query, matches)
+        return df.iloc[positions].copy(), total
+
+    def aggregate_transactions(self, query: AggregateQuery) -> pd.DataFrame:
+        """The query's metric of the amounts per month, payee or description.
+
+        Totals come from rollups that follow entry writes and staging merges,
+        so answering costs the number of groups, not of master rows.
+        """
+        snapshot = self._cache.get()
+        return self._rollup_index.totals(snapshot.generation, snapshot.frame, query).copy()
+
+    def get_entry(self, entry_id: str) -> dict:
+        """Get a specific entry by id"""
         try:
-            df = self.get_master_data()
-            entry = df[df['date'] == timestamp].to_dict('records')
-            return entry[0] if entry else None
+            rows = self._cache.get().rows([entry_id])
+            return rows.iloc[0].to_dict() if len(rows) else None
         except Exception as e:
             print(f"Error getting entry: {e}")
             return None
 
-    def add_entry(self, entry_data: dict) -> bool:
-        """Add a new entry to master database"""
+    @staticmethod
+    def _validated(operations: List[dict]) -> List[dict]:
+        """Log records of the valid API entry operations, reporting the others"""
+        records = []
+        for operation in operations:
+            try:
+                records.append(validate_operation(operation))
+            except ValueError as e:
+                print(f"Skipping invalid {operation.get('op')} of entry {operation.get('id', '')}: {e}")
+        return records
+
+    def add_entry(self, entry_data: dict) -> str:
+        """Add a new entry to master database, returning its id"""
         try:
-            df = self.get_master_data()
-            new_entry = pd.DataFrame([entry_data])
-            updated_df = pd.concat([df, new_entry], ignore_index=True)
-            updated_df.to_json(self.master_database, orient='records', indent=4)
-            return True
+            record = validate_operation({'op': 'insert', 'data': entry_data})
+            return record['id'] if self._log_entries([record]) else None
         except Exception as e:
             print(f"Error adding entry: {e}")
-            return False
+            return None
 
-    def update_entry(self, timestamp: int, entry_data: dict) -> bool:
+    def update_entry(self, entry_id: str, entry_data: dict) -> bool:
         """Update an existing entry in master database"""
+        return self.update_entries({entry_id: entry_data}) == 1
+
+    def update_entries(self, updates: dict) -> int:
+        """Update several entries by id in one commit, returning how many were found"""
         try:
-            df = self.get_master_data()
-            mask = df['date'] == timestamp
-            if not mask.any():
-                return False
-            
-            for key, value in entry_data.items():
-                if key in df.columns:
-                    df.loc[mask, key] = value
-                    
-            df.to_json(self.master_database, orient='records', indent=4)
-            return True
+            return self._log_entries(self._validated([
+                {'op': 'update', 'id': entry_id, 'data': entry_data}
+                for entry_id, entry_data in updates.items()
+            ]))
         except Exception as e:
-            print(f"Error updating entry: {e}")
-            return False
+            print(f"Error updating entries: {e}")
+            return 0
+
+    def bulk_write(self, records: List[dict]) -> List[bool]:
+        """Apply entry records as one atomic write, returning whether each took effect.
+
+        Either every record takes effect in one write-ahead log commit or
+        none does; then the flags show which records could not be applied,
+        such as an update of an unknown id.
+        """
+        return self._submit_write(records, atomic=True)['flags']
 
-    def delete_entry(self, timestamp: int) -> bool:
+    def delete_entry(self, entry_id: str) -> bool:
         """Delete an entry from master database"""
+        return self.delete_entries([entry_id]) == 1
+
+    def delete_entries(self, entry_ids: List[str]) -> int:
+        """Delete several entries by id in one commit, returning how many were removed"""
         try:
-            df = self.get_master_data()
-            mask = df['date'] == timestamp
-            if not mask.any():
-                return False
-                
-            df = df[~mask]
-            df.to_json(self.master_database, orient='records', indent=4)
-            return True
+            return self._log_entries(self._validated([
+                {'op': 'delete', 'id': entry_id} for entry_id in set(entry_ids)
+            ]))
         except Exception as e:
-            print(f"Error deleting entry: {e}")
-            return False
+            print(f"Error deleting entries: {e}")
+            return 0
 
 # Example usage for transaction data
 def import_transactions(data_lake: DataLake, source_files: List[str], folder: str = "transactions"):
@@ -0,0 +1,172 @@
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from staging_manifest import StagingManifest
+
+# Share of the progress bar reached when each stage starts
+STAGE_PROGRESS = {'queued': 0.0, 'copying': 0.1, 'parsing': 0.2, 'merging': 0.7, 'done': 1.0, 'failed': 1.0}
+
+
+class IngestJob:
+    """One uploaded file travelling through raw, staging and master"""
+
+    def __init__(self, upload_path: Path, sha256: str):
+        self.id = secrets.token_hex(8)
+        self.upload_path = upload_path
+        self.filename = upload_path.name
+        self.sha256 = sha256
+        self.stage = 'queued'
+        self.rows = None  # Rows parsed from the file
+        self.master_rows = None  # Rows in the master once merged
+        self.errors: List[str] = []
+        self.submitted = time.time()
+        self.finished = None
+
+    @property
+    def active(self) -> bool:
+        return self.stage not in ('done', 'failed')
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'stage': self.stage,
+            'progress': STAGE_PROGRESS[self.stage],
+            'rows': self.rows,
+            'master_rows': self.master_rows,
+            'errors': list(self.errors),
+            'submitted': self.submitted,
+            'finished': self.finished
+        }
+
+
+class IngestQueue:
+    """Bounded queue of upload jobs ingested by a background thread.
+
+    submit() returns at once with a job whose stage, progress, row counts
+    and errors can be polled. A file whose name and content match a job
+    still queued or running joins that job instead of being ingested twice.
+    The worker takes every job queued so far as one batch, so a burst of
+    uploads shares a single raw-zone pass and master merge. Uploads named
+    like one already in the batch wait for the next batch, as they would
+    overwrite its raw file.
+    """
+
+    def __init__(self, data_lake, max_pending: int = 100, history: int = 1000):
+        self.data_lake = data_lake
+        self.history = history
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._jobs: 'OrderedDict[str, IngestJob]' = OrderedDict()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, name='ingest-jobs', daemon=True).start()
+
+    def submit(self, upload_path: Path) -> Optional[IngestJob]:
+        """Queue an uploaded file, returning its job or None if the queue is full.
+
+        The upload is owned by the queue from here on and removed once it has
+        been copied to the raw zone, or at once if it joins an existing job.
+        """
+        upload_path = Path(upload_path)
+        sha256 = StagingManifest.file_hash(upload_path)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.filename == upload_path.name and job.sha256 == sha256:
+                    self._discard_upload(upload_path)
+                    return job
+
+            job = IngestJob(upload_path, sha256)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                return None
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history and not next(iter(self._jobs.values())).active:
+                self._jobs.popitem(last=False)
+            return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def _set(self, jobs: List[IngestJob], stage: str) -> None:
+        with self._lock:
+            for job in jobs:
+                job.stage = stage
+                if not job.active:
+                    job.finished = time.time()
+
+    def _fail(self, job: IngestJob, error: str) -> None:
+        with self._lock:
+            job.errors.append(error)
+        self._set([job], 'failed')
+
+    @staticmethod
+    def _discard_upload(upload_path: Path) -> None:
+        """Remove an upload and its per-upload directory once empty"""
+        upload_path.unlink(missing_ok=True)
+        try:
+            upload_path.parent.rmdir()
+        except OSError:
+            pass
+
+    def _run(self) -> None:
+        deferred: List[IngestJob] = []
+        while True:
+            pending = deferred or [self._queue.get()]
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # One upload per raw file name and batch, later ones in submission order after it
+            batch, deferred, names = [], [], set()
+            for job in pending:
+                (deferred if job.filename in names else batch).append(job)
+                names.add(job.filename)
+            try:
+                self._ingest(batch)
+            except Exception as e:
+                print(f"Error ingesting uploads: {e}")
+                with self._lock:
+                    for job in batch:
+                        if job.active:
+                            job.errors.append(str(e))
+                self._set([job for job in batch if job.active], 'failed')
+
+    def _ingest(self, batch: List[IngestJob]) -> None:
+        self._set(batch, 'copying')
+        copied = []
+        for job in batch:
+            if self.data_lake.copy_to_raw(str(job.upload_path)):
+                copied.append(job)
+            else:
+                self._fail(job, 'Could not copy file to the raw zone')
+            self._discard_upload(job.upload_path)
+        if not copied:
+            return
+
+        self._set(copied, 'parsing')
+        failures = self.data_lake.process_raw_data()
+        parsed = []
+        for job in copied:
+            raw_path = str(self.data_lake.raw_zone / job.filename)
+            if raw_path in failures:
+                self._fail(job, failures[raw_path])
+                continue
+            job.rows = self.data_lake.ledger.entries.get(raw_path, {}).get('rows')
+            parsed.append(job)
+        if not parsed:
+            return
+
+        self._set(parsed, 'merging')
+        self.data_lake.update_master_database()
+        master_rows = self.data_lake.cache_stats()['rows']
+        for job in parsed:
+            job.master_rows = master_rows
+        self._set(parsed, 'done')
@@ -0,0 +1,58 @@
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from staging_manifest import StagingManifest
+
+
+class IngestionLedger(StagingManifest):
+    """Track which raw files have been parsed into staging, and by which parser.
+
+    Each raw path maps to its mtime, size and content hash, the processor and
+    processor version that parsed it, and the staging file it produced. A raw
+    file is parsed again only when its content, its processor's version or
+    its staging output changes.
+    """
+
+    def pending(self, file_paths: List[Path], parsers: Dict[str, Tuple[str, int]],
+                staging_paths: Dict[str, Path]) -> Dict[str, dict]:
+        """Raw files that need parsing, mapped to their fresh ledger entries.
+
+        parsers maps each raw path to its (processor name, version) and
+        staging_paths to the staging file it is written to. Files whose mtime
+        and size are unchanged are not hashed again.
+        """
+        pending = {}
+        for file_path in file_paths:
+            key = str(file_path)
+            stat = file_path.stat()
+            entry = self.entries.get(key)
+            parser, version = parsers[key]
+            staging = str(staging_paths[key])
+            current = (
+                entry is not None and entry['parser'] == parser and entry['version'] == version
+                and entry['staging'] == staging and Path(staging).exists()
+            )
+            if current and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                continue
+
+            new_entry = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'sha256': self.file_hash(file_path),
+                'parser': parser,
+                'version': version,
+                'staging': staging
+            }
+            if current and entry['sha256'] == new_entry['sha256']:
+                # Touched but identical content, just refresh the stat info
+                self.entries[key] = {**entry, **new_entry}
+                continue
+            pending[key] = new_entry
+        return pending
+
+    def prune(self, source_dir: Path, file_paths: List[Path]) -> None:
+        """Forget raw files under source_dir that are no longer present"""
+        present = {str(file_path) for file_path in file_paths}
+        for key in list(self.entries):
+            if key not in present and Path(key).is_relative_to(source_dir):
+                del self.entries[key]
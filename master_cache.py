@@ -0,0 +1,141 @@
+import threading
+from typing import Callable, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from master_merge import IdIndex
+from storage import BaseStorage
+from write_ahead_log import EntryOverlay
+
+Signature = Tuple[int, int, int, Hashable]  # (inode, mtime_ns, size) of the master file and the watched state
+
+
+class MasterSnapshot:
+    """One published master: a base frame and the entry changes written over it since.
+
+    frame, the rows readers see, folds the changes into the base on first
+    use, outside any writer's lock, and is kept for the snapshot's lifetime;
+    lookups of single entries read the base and the changes without folding.
+    """
+
+    def __init__(self, generation: int, signature: Optional[Signature], base: pd.DataFrame, ids: IdIndex,
+                 overlay: EntryOverlay = None):
+        self.generation = generation
+        self.signature = signature
+        self.base = base  # Shared between readers, never modify in place
+        self.ids = ids  # Row id -> position in base, built on first lookup
+        self.overlay = overlay if overlay is not None else EntryOverlay()
+        self._frame = base if not self.overlay.changes else None
+        self._fold_lock = threading.Lock()
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """The master rows, shared between readers, never modify in place"""
+        if self._frame is None:
+            with self._fold_lock:
+                if self._frame is None:
+                    self._frame = self.overlay.fold(self.base)
+        return self._frame
+
+    @property
+    def watched(self) -> Optional[Hashable]:
+        """The cache's watched state when the snapshot was loaded, None if unknown"""
+        return self.signature[3] if self.signature is not None else None
+
+    @property
+    def size(self) -> int:
+        return self.overlay.size(self.base)
+
+    def positions(self, entry_ids: Iterable[str]) -> np.ndarray:
+        """Row positions of the given ids in frame, -1 where an id is unknown"""
+        return self.overlay.positions(self.base, self.ids, entry_ids)
+
+    def rows(self, entry_ids: Iterable[str]) -> pd.DataFrame:
+        """Rows of the given ids that exist, in their order"""
+        return self.overlay.rows(self.base, self.ids, entry_ids)
+
+
+class MasterCache:
+    """One parsed master snapshot shared by every reader.
+
+    Readers take the current snapshot without locking; it is replaced as a
+    whole, either when a writer publishes the frame it just committed or the
+    entry changes it just logged, or when the file's inode, mtime or size
+    changes underneath the cache. load rebuilds the frame from disk and
+    defaults to storage.load; watch returns any other state the frame is
+    loaded from, such as the entry logs of other processes, and a change of
+    it reloads the snapshot too.
+    """
+
+    def __init__(self, storage: BaseStorage, load: Callable[[], pd.DataFrame] = None,
+                 watch: Callable[[], Hashable] = None):
+        self.storage = storage
+        self.load = load or storage.load
+        self.watch = watch or (lambda: None)
+        self._snapshot: Optional[MasterSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _signature(self) -> Optional[Signature]:
+        try:
+            stat = self.storage.path.stat()
+            return stat.st_ino, stat.st_mtime_ns, stat.st_size, self.watch()
+        except FileNotFoundError:
+            return None
+
+    def get(self) -> MasterSnapshot:
+        """Current snapshot, reloaded only if the file or the watched state changed"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == self._signature():
+            self.hits += 1
+            return snapshot
+
+        with self._reload_lock:
+            snapshot = self._snapshot
+            signature = self._signature()
+            if snapshot is not None and snapshot.signature == signature:
+                self.hits += 1
+                return snapshot
+
+            if snapshot is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            frame = self.load() if signature is not None else pd.DataFrame()
+            return self._swap(frame, signature)
+
+    def publish(self, frame: pd.DataFrame, ids: IdIndex = None) -> MasterSnapshot:
+        """Install the frame a writer has just saved as the new snapshot, with its IdIndex if known"""
+        with self._reload_lock:
+            return self._swap(frame, self._signature(), ids)
+
+    def publish_changes(self, snapshot: MasterSnapshot, overlay: EntryOverlay) -> MasterSnapshot:
+        """Install the entry changes a writer has just logged over snapshot as the new snapshot"""
+        with self._reload_lock:
+            return self._swap(snapshot.base, snapshot.signature, snapshot.ids, overlay)
+
+    def invalidate(self) -> None:
+        """Drop the snapshot's signature so the next read reloads from disk"""
+        with self._reload_lock:
+            if self._snapshot is not None:
+                self._snapshot.signature = None
+
+    def _swap(self, frame: pd.DataFrame, signature: Optional[Signature], ids: IdIndex = None,
+              overlay: EntryOverlay = None) -> MasterSnapshot:
+        generation = self._snapshot.generation + 1 if self._snapshot is not None else 1
+        if ids is None:
+            ids = IdIndex(frame['id'] if 'id' in frame.columns else pd.Series(dtype=object))
+        self._snapshot = MasterSnapshot(generation, signature, frame, ids, overlay)
+        return self._snapshot
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            'generation': snapshot.generation if snapshot is not None else 0,
+            'rows': snapshot.size if snapshot is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads
+        }
@@ -0,0 +1,89 @@
+from typing import Iterable, Iterator
+
+import pandas as pd
+from storage import ParquetStorage
+
+EXPORT_CHUNK_ROWS = 10_000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+class _StreamSink:
+    """Write-only file that hands out what was written since the last take()"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def _ndjson(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        yield chunk.to_json(orient='records', lines=True, date_format='iso').encode('utf-8')
+
+
+def _csv(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+
+def _parquet(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from storage.parquet_storage import MASTER_SCHEMA
+
+    sink = _StreamSink()
+    writer = None
+    try:
+        for chunk in chunks:
+            # One row group per chunk, typed like the Parquet master file
+            table = pa.Table.from_pandas(ParquetStorage._coerce(chunk), preserve_index=False)
+            fields = {field.name: field for field in MASTER_SCHEMA}
+            table = table.cast(pa.schema([fields.get(field.name, field) for field in table.schema]))
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+            yield sink.take()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.take()
+
+
+def export_chunks(chunks: Iterable[pd.DataFrame], format: str) -> Iterator[bytes]:
+    """Encode master chunks as one ndjson, csv or parquet stream, chunk by chunk.
+
+    Only one encoded chunk is held at a time. Parquet writes a row group per
+    chunk and its footer last, so the stream is a complete file only once
+    exhausted.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {format}")
+    if format == 'parquet' and ParquetStorage is None:
+        raise ValueError("Parquet export needs pyarrow")
+    return {'ndjson': _ndjson, 'csv': _csv, 'parquet': _parquet}[format](chunks)
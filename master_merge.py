@@ -0,0 +1,364 @@
+import re
+import secrets
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from storage import MASTER_COLUMNS, concat_master, conform_master
+
+MANUAL_SOURCE = 'manual_entry'  # source_file of entries added by hand
+
+ID_DIGITS = 16  # Row ids are 64-bit numbers in hex
+ID_BLOCK_ROWS = 65536
+_HEX_ID = re.compile('[0-9a-f]{16}')
+_HEX_VALUES = np.full(256, 16, dtype=np.uint8)  # Byte -> hex digit value, 16 for any other byte
+_HEX_VALUES[np.frombuffer(b'0123456789abcdef', dtype=np.uint8)] = np.arange(16, dtype=np.uint8)
+
+# Columns joined across merged rows when they are not part of the merge key
+MERGE_SEPARATORS = {'description': ' - ', 'payee': ' - ', 'source_file': ', '}
+
+
+class MergePolicy(NamedTuple):
+    """How staging rows are recognised as the same transaction.
+
+    Rows whose key_fields match after normalization share a fingerprint.
+    With within_source, the n-th row of a fingerprint in one staging file
+    only matches the n-th row of it in another file, so identical
+    transactions repeated within one statement stay apart while overlapping
+    statements still merge. Description and payee, when not part of the key,
+    and source_file are joined across the merged rows.
+    """
+    name: str
+    key_fields: Tuple[str, ...]
+    within_source: bool
+
+
+MERGE_POLICIES = {
+    'fingerprint': MergePolicy('fingerprint', ('date', 'amount', 'description', 'payee'), True),
+    'date_amount': MergePolicy('date_amount', ('date', 'amount'), False),  # One row per date and amount
+}
+DEFAULT_MERGE_POLICY = 'fingerprint'
+
+
+def _normalized(df: pd.DataFrame, field: str):
+    if field == 'date':
+        return pd.to_datetime(df['date']).to_numpy('datetime64[ns]').view('i8')
+    if field == 'amount':
+        return df['amount'].to_numpy('float64')
+    # Text compares case-insensitively with runs of whitespace collapsed; each
+    # distinct value is normalized and hashed once
+    text = df[field].fillna('').astype(str) if field in df.columns else pd.Series('', index=df.index)
+    codes, uniques = pd.factorize(text)
+    normalized = pd.Series(uniques, dtype=str).str.replace(r'\s+', ' ', regex=True).str.strip().str.lower()
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()[codes]
+
+
+def merge_keys(df: pd.DataFrame, policy: MergePolicy) -> np.ndarray:
+    """64-bit merge key of every staging row.
+
+    With policy.within_source rows are numbered per source_file, so df must
+    hold whole staging files.
+    """
+    fields = pd.DataFrame({field: _normalized(df, field) for field in policy.key_fields}, index=df.index)
+    keys = pd.util.hash_pandas_object(fields, index=False).to_numpy()
+    if policy.within_source and len(df):
+        occurrence = pd.DataFrame({'source': df['source_file'].to_numpy(), 'key': keys}).groupby(
+            ['source', 'key'], sort=False).cumcount().to_numpy()
+        keys = pd.util.hash_pandas_object(pd.DataFrame({'key': keys, 'occurrence': occurrence}), index=False).to_numpy()
+    return keys
+
+
+def format_ids(keys: np.ndarray) -> np.ndarray:
+    """Row ids of merge keys, as 16 hex digits"""
+    digits = np.asarray(keys, dtype='>u8').tobytes().hex().encode('ascii')
+    return np.frombuffer(digits, dtype='S16').astype(str)
+
+
+def _id_bytes(ids: pd.Series) -> Optional[List[np.ndarray]]:
+    """(rows, 16) bytes of the ids, one array per Arrow chunk, if every id is 16 bytes long.
+
+    Read straight from the Arrow buffers behind a string column, without a
+    Python string per id or a copy; None when there are no such buffers.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        array = pa.array(ids)
+    except (ImportError, TypeError, ValueError):
+        return None
+    chunks = array.chunks if isinstance(array, pa.ChunkedArray) else [array]
+    data = []
+    for chunk in chunks:
+        if not (pa.types.is_string(chunk.type) or pa.types.is_large_string(chunk.type)) or chunk.null_count:
+            return None
+        if not len(chunk):
+            continue
+        if not pc.all(pc.equal(pc.binary_length(chunk), ID_DIGITS)).as_py():
+            return None
+        offset_type = np.int64 if pa.types.is_large_string(chunk.type) else np.int32
+        start = np.frombuffer(chunk.buffers()[1], dtype=offset_type)[chunk.offset]
+        values = np.frombuffer(chunk.buffers()[2], dtype=np.uint8)[start:start + ID_DIGITS * len(chunk)]
+        data.append(values.reshape(-1, ID_DIGITS))
+    return data
+
+
+def parse_ids(ids: pd.Series) -> np.ndarray:
+    """Merge keys of row ids; ids not made by format_ids get a hash of the id instead"""
+    ids = ids.fillna('').astype(str)
+    data = _id_bytes(ids)
+    if data is not None:
+        keys = np.empty(len(ids), dtype=np.uint64)
+        valid = np.empty(len(ids), dtype=bool)
+        # Decoded in blocks so the temporary digit arrays stay small
+        start = 0
+        for block in (chunk[low:low + ID_BLOCK_ROWS] for chunk in data for low in range(0, len(chunk), ID_BLOCK_ROWS)):
+            digits = _HEX_VALUES[block]
+            valid[start:start + len(digits)] = (digits < 16).all(axis=1)
+            keys[start:start + len(digits)] = ((digits[:, 0::2] << 4) | digits[:, 1::2]).view('>u8').ravel()
+            start += len(digits)
+    else:
+        valid = ids.str.fullmatch('[0-9a-f]{16}').to_numpy(dtype=bool)
+        keys = np.empty(len(ids), dtype=np.uint64)
+        if valid.any():
+            keys[valid] = np.frombuffer(bytes.fromhex(''.join(ids[valid].tolist())), dtype='>u8')
+    if not valid.all():
+        keys[~valid] = pd.util.hash_pandas_object(ids[~valid], index=False).to_numpy()
+    return keys
+
+
+class IdIndex:
+    """Row id -> position of a frame, over the 64-bit number behind each id.
+
+    The numbers are sorted on first lookup and ids are found by binary
+    search, 16 bytes per row rather than a Python string and a hash table
+    slot per id. The index of a frame written from another by deleting and
+    appending rows is derived with patched().
+    """
+
+    def __init__(self, ids: pd.Series):
+        self._ids = ids
+        self._keys = None  # Sorted numbers of the ids
+        self._rows = None  # Row of each sorted number
+
+    def _build(self) -> None:
+        if self._rows is None:
+            keys = parse_ids(self._ids)
+            rows = np.argsort(keys, kind='stable')
+            self._keys, self._rows = keys[rows], rows
+
+    def patched(self, ids: pd.Series, deleted: np.ndarray, added: Iterable[str]) -> 'IdIndex':
+        """Index of ids, this index's frame with the rows at deleted removed and the added ids appended.
+
+        The sorted numbers are carried over and patched, so only the added
+        ids are parsed and nothing is sorted again.
+        """
+        index = IdIndex(ids)
+        if self._rows is None:
+            return index  # Nothing to carry over, built on first lookup
+        keys, rows = self._keys, self._rows
+        deleted = np.unique(np.asarray(deleted, dtype=np.intp))
+        if len(deleted):
+            kept = ~np.isin(rows, deleted)
+            keys, rows = keys[kept], rows[kept]
+            rows = rows - np.searchsorted(deleted, rows)
+        added_keys = self._parse(added)
+        if len(added_keys):
+            order = np.argsort(added_keys, kind='stable')
+            at = np.searchsorted(keys, added_keys[order], 'right')
+            keys = np.insert(keys, at, added_keys[order])
+            rows = np.insert(rows, at, len(rows) + order)
+        index._keys, index._rows = keys, rows
+        return index
+
+    @staticmethod
+    def _parse(entry_ids: Iterable[str]) -> np.ndarray:
+        if isinstance(entry_ids, pd.Series):
+            return parse_ids(entry_ids)
+        entry_ids = [str(entry_id) for entry_id in entry_ids]
+        if all(_HEX_ID.fullmatch(entry_id) for entry_id in entry_ids):
+            return np.array([int(entry_id, 16) for entry_id in entry_ids], dtype=np.uint64)
+        return parse_ids(pd.Series(entry_ids, dtype=object))
+
+    def positions(self, entry_ids: Iterable[str]) -> np.ndarray:
+        """Row positions of the given ids, -1 where an id is unknown.
+
+        A Series of ids, such as another frame's id column, is parsed column-wise.
+        """
+        self._build()
+        keys = self._parse(entry_ids)
+        if not len(self._keys):
+            return np.full(len(keys), -1, dtype=np.intp)
+        at = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[at] == keys, self._rows[at], -1).astype(np.intp)
+
+
+def _member(values: np.ndarray, candidates) -> np.ndarray:
+    """Which values are among the candidates, by hash lookup"""
+    return pd.Series(values).isin(list(candidates) if isinstance(candidates, set) else candidates).to_numpy(dtype=bool, copy=True)
+
+
+def dead_sources(paths: Iterable[str], deleted: Set[str] = frozenset()) -> Set[str]:
+    """The given staging files that are gone: known deleted, or failing one stat each"""
+    return {path for path in set(paths) if path in deleted or not Path(path).exists()}
+
+
+def _join_distinct(codes: np.ndarray, values: pd.Series, separator: str, groups: int) -> np.ndarray:
+    """Distinct non-empty values of each group joined in first-seen order.
+
+    Values are ranked within their group and appended one rank at a time,
+    each rank a single vectorized step over the groups that have it.
+    """
+    pairs = pd.DataFrame({'group': codes, 'value': values.fillna('').astype(str).to_numpy()})
+    pairs = pairs[pairs['value'] != ''].drop_duplicates()
+    order = np.argsort(pairs['group'].to_numpy(), kind='stable')
+    group = pairs['group'].to_numpy()[order]
+    text = pairs['value'].to_numpy(dtype=object)[order]
+    starts = np.flatnonzero(np.diff(group, prepend=-1) != 0)
+    rank = np.arange(len(group)) - np.repeat(starts, np.diff(np.append(starts, len(group))))
+
+    joined = np.full(groups, '', dtype=object)
+    by_rank = np.argsort(rank, kind='stable')
+    bounds = np.searchsorted(rank[by_rank], np.arange(rank.max() + 2)) if len(rank) else [0]
+    for position, (low, high) in enumerate(zip(bounds[:-1], bounds[1:])):
+        at = by_rank[low:high]
+        joined[group[at]] = text[at] if position == 0 else joined[group[at]] + separator + text[at]
+    return joined
+
+
+def key_ids(df: pd.DataFrame) -> pd.Series:
+    """Stable row ids derived from the (date, amount) key, identical across rebuilds"""
+    return pd.Series(format_ids(merge_keys(df, MERGE_POLICIES['date_amount'])), index=df.index)
+
+
+def new_id() -> str:
+    """Random row id for entries added by hand"""
+    return secrets.token_hex(8)
+
+
+def is_manual(df: pd.DataFrame) -> pd.Series:
+    """Rows that did not come from a staging file"""
+    return df['source_file'].fillna('').isin(['', MANUAL_SOURCE])
+
+
+def assign_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """Fill in missing row ids: merged rows get key ids, manual rows random ones"""
+    if 'id' not in df.columns:
+        df['id'] = pd.Series(index=df.index, dtype='object')
+    missing = df['id'].isna() | (df['id'] == '')
+    if missing.any():
+        df['id'] = df['id'].astype('object')
+        merged = missing & ~is_manual(df)
+        df.loc[merged, 'id'] = key_ids(df[merged])
+        manual = missing & ~merged
+        df.loc[manual, 'id'] = [new_id() for _ in range(manual.sum())]
+    return df
+
+
+def aggregate(entries: pd.DataFrame, policy: MergePolicy = MERGE_POLICIES[DEFAULT_MERGE_POLICY],
+              keys: np.ndarray = None, deleted: Set[str] = frozenset()) -> pd.DataFrame:
+    """Collapse staging rows sharing a merge key into one master row.
+
+    keys are the rows' merge keys, computed here when not given; pass them
+    when entries are only part of their staging files. Rows are matched by
+    a hash join on the keys and the first row of each key supplies its key
+    fields. Rows without a date or amount are dropped, and so is every
+    master row fed by a staging file that is gone: one in deleted or one
+    that no longer exists, checked once per distinct file.
+    """
+    if keys is None:
+        keys = merge_keys(entries, policy)
+    valid = (entries['date'].notna() & entries['amount'].notna()).to_numpy()
+    entries, keys = entries[valid], keys[valid]
+
+    codes, uniques = pd.factorize(keys)
+    # Codes are numbered in order of first appearance, so each key's first row raises the running maximum
+    first = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+    merged_df = pd.DataFrame({
+        column: entries[column].to_numpy()[first] if column in entries.columns else ''
+        for column in ['date', 'amount', 'description', 'payee']
+    })
+    for column, separator in MERGE_SEPARATORS.items():
+        if column not in policy.key_fields:
+            merged_df[column] = _join_distinct(codes, entries[column], separator, len(uniques))
+    merged_df['id'] = format_ids(uniques)
+
+    # Remove entries with deleted source files
+    sources = entries['source_file']
+    gone = _member(sources.to_numpy(dtype=object), dead_sources(sources.unique(), deleted))
+    live = np.ones(len(uniques), dtype=bool)
+    live[codes[gone]] = False
+    return merged_df.loc[live, MASTER_COLUMNS].reset_index(drop=True)
+
+
+def _source_pairs(source_files: pd.Series) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+    """(row, source id) of every file named in each row's source_file, and the files by id.
+
+    Rows share few distinct source_file values, each one is split once.
+    """
+    codes, combos = pd.factorize(source_files.fillna(''))
+    split = pd.Series(np.asarray(combos, dtype=object)).str.split(', ').explode()
+    ids, paths = pd.factorize(split.to_numpy(dtype=object))
+    # Pairs of each distinct value are contiguous, in the order the value was first seen
+    counts = np.bincount(split.index.to_numpy(), minlength=len(combos))
+    starts = np.cumsum(counts) - counts
+    per_row = counts[codes]
+    rows = np.repeat(np.arange(len(codes), dtype=np.int64), per_row)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+    sources = ids[np.repeat(starts[codes], per_row) + within].astype(np.int32)
+    return rows, sources, pd.Index(paths, dtype=object)
+
+
+class MergeState:
+    """Merged master rows kept in memory with indexes for incremental merges.
+
+    Every staging-derived row carries its merge key, the number behind its
+    id, and (row, source id) pairs record which files fed each row, so a
+    delta only touches the rows it can affect; sources maps source ids to
+    staging files. Lookups are hash joins over these arrays. Entries added
+    by hand (no staging file) are carried separately and never merged.
+    """
+
+    def __init__(self, staging_df: pd.DataFrame, manual_df: pd.DataFrame):
+        self.staging_df = staging_df.reset_index(drop=True)
+        self.manual_df = manual_df.reset_index(drop=True)
+        self.keys = parse_ids(self.staging_df['id'])
+        self.pair_rows, self.pair_sources, self.sources = _source_pairs(self.staging_df['source_file'])
+
+    @classmethod
+    def from_master(cls, master_df: pd.DataFrame) -> 'MergeState':
+        master_df = conform_master(master_df)
+        manual = is_manual(master_df)
+        return cls(master_df[~manual], master_df[manual])
+
+    def affected_keys(self, touched: Set[str], new_keys: np.ndarray) -> np.ndarray:
+        """Existing merge keys fed by the touched files or hit by new rows"""
+        fed = self.pair_rows[_member(self.pair_sources, np.flatnonzero(self.sources.isin(list(touched))))]
+        hit = _member(self.keys, new_keys)
+        hit[fed] = True
+        return self.keys[hit]
+
+    def contributors(self, keys: np.ndarray) -> Set[str]:
+        """Staging files contributing to any of the given keys"""
+        rows = _member(self.keys, keys)
+        return set(self.sources[np.unique(self.pair_sources[rows[self.pair_rows]])].tolist())
+
+    def replace(self, keys: np.ndarray, merged_df: pd.DataFrame) -> pd.DataFrame:
+        """Swap the rows of the given keys for freshly merged ones, returning the rows swapped out"""
+        keep = ~_member(self.keys, keys)
+        replaced = self.staging_df[~keep]
+        kept_pairs = keep[self.pair_rows]
+        new_rows, new_ids, new_paths = _source_pairs(merged_df['source_file'])
+        self.sources = self.sources.append(new_paths[~new_paths.isin(self.sources)])
+        new_sources = self.sources.get_indexer(new_paths)[new_ids].astype(np.int32)
+        self.pair_rows = np.concatenate([(np.cumsum(keep) - 1)[self.pair_rows[kept_pairs]],
+                                         new_rows + np.count_nonzero(keep)])
+        self.pair_sources = np.concatenate([self.pair_sources[kept_pairs], new_sources])
+        self.keys = np.concatenate([self.keys[keep], parse_ids(merged_df['id'])])
+        self.staging_df = concat_master([self.staging_df[keep], merged_df])
+        return replaced
+
+    def to_master(self) -> pd.DataFrame:
+        """Master rows in the order they are persisted"""
+        master_df = concat_master([self.staging_df, self.manual_df])
+        return master_df.sort_values(['date', 'amount', 'id'], kind='mergesort').reset_index(drop=True)
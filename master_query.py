@@ -0,0 +1,155 @@
+import threading
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SORT_KEYS = ['date', 'amount', 'description', 'payee']
+TEXT_SORT_KEYS = ['description', 'payee']  # Sorted case-insensitively
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PageQuery(NamedTuple):
+    """One page of master rows: filters, sort order and the offset/limit window"""
+    offset: int = 0
+    limit: int = DEFAULT_PAGE_SIZE
+    sort: str = 'date'
+    descending: bool = True
+    date_from: Optional[pd.Timestamp] = None
+    date_to: Optional[pd.Timestamp] = None
+    amount_min: Optional[float] = None
+    amount_max: Optional[float] = None
+    payee: Optional[str] = None  # Case-insensitive substring
+
+
+def parse_page_query(args: Mapping[str, str]) -> PageQuery:
+    """PageQuery from request arguments, raising ValueError on a bad one.
+
+    Takes offset, limit (at most MAX_PAGE_SIZE), sort (one of SORT_KEYS),
+    order ('asc' or 'desc'), date_from and date_to (inclusive dates),
+    amount_min and amount_max (inclusive) and payee.
+    """
+    def value(name):
+        text = args.get(name)
+        return text.strip() if text is not None and text.strip() else None
+
+    offset = int(value('offset') or 0)
+    limit = int(value('limit') or DEFAULT_PAGE_SIZE)
+    if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}")
+    sort = value('sort') or 'date'
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+    order = value('order') or 'desc'
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be asc or desc")
+
+    date_from, date_to = value('date_from'), value('date_to')
+    amount_min, amount_max = value('amount_min'), value('amount_max')
+    return PageQuery(
+        offset=offset, limit=limit, sort=sort, descending=order == 'desc',
+        date_from=pd.Timestamp(date_from) if date_from else None,
+        date_to=pd.Timestamp(date_to) if date_to else None,
+        amount_min=float(amount_min) if amount_min else None,
+        amount_max=float(amount_max) if amount_max else None,
+        payee=value('payee')
+    )
+
+
+class _SortKey:
+    """Rows of a snapshot ranked by one column, missing values last in either direction"""
+
+    def __init__(self, values: pd.Series):
+        codes, self.uniques = pd.factorize(values, sort=True)
+        self.missing = len(self.uniques)
+        self.codes = np.where(codes < 0, self.missing, codes)  # Row -> rank of its value
+        self._orders: Dict[bool, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def keys(self, descending: bool) -> np.ndarray:
+        """Row -> sort key, smallest first"""
+        if not descending:
+            return self.codes
+        return np.where(self.codes < self.missing, self.missing - 1 - self.codes, self.missing)
+
+    def order(self, descending: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows in sort order, their sorted keys); ties keep row order"""
+        if descending not in self._orders:
+            keys = self.keys(descending)
+            order = np.argsort(keys, kind='stable')
+            self._orders[descending] = order, keys[order]
+        return self._orders[descending]
+
+    def between(self, low, high, descending: bool = False) -> Tuple[np.ndarray, int, int]:
+        """(rows in sort order, start, stop) where rows[start:stop] have values in [low, high].
+
+        Missing values match only when both bounds are None.
+        """
+        order, keys = self.order(descending)
+        if low is None and high is None:
+            return order, 0, len(order)
+        first = self.uniques.searchsorted(low, 'left') if low is not None else 0
+        last = self.uniques.searchsorted(high, 'right') if high is not None else self.missing
+        if descending:
+            first, last = self.missing - last, self.missing - first
+        return order, np.searchsorted(keys, first, 'left'), np.searchsorted(keys, last, 'left')
+
+
+class SortIndex:
+    """Sort orders of the current master snapshot for paging through it.
+
+    Each column is ranked once per snapshot generation, on first use, and
+    kept until the snapshot changes. An unfiltered page, or one filtered
+    only on its own sort column, is then a slice of a precomputed order, so
+    its cost depends on the page size alone. Other filters intersect the
+    matching rows and sort just those.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self._keys: Dict[str, _SortKey] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, generation: int, frame: pd.DataFrame, column: str) -> _SortKey:
+        with self._lock:
+            if generation != self.generation:
+                self._keys = {}
+                self.generation = generation
+            if column not in self._keys:
+                values = frame[column] if column in frame.columns else pd.Series(index=frame.index, dtype='object')
+                if column in TEXT_SORT_KEYS:
+                    values = values.fillna('').astype(str).str.lower()
+                elif column == 'date':
+                    values = pd.to_datetime(values, errors='coerce')
+                self._keys[column] = _SortKey(values)
+            return self._keys[column]
+
+    def page(self, generation: int, frame: pd.DataFrame, query: PageQuery,
+             matches: List[np.ndarray] = ()) -> Tuple[np.ndarray, int]:
+        """(row positions of the page in order, rows matching the query).
+
+        matches are sorted row positions from filters applied by the caller,
+        such as a payee search; the date and amount ranges are applied here.
+        """
+        ranges = {}
+        if query.date_from is not None or query.date_to is not None:
+            ranges['date'] = (query.date_from, query.date_to)
+        if query.amount_min is not None or query.amount_max is not None:
+            ranges['amount'] = (query.amount_min, query.amount_max)
+
+        sort_key = self._key(generation, frame, query.sort)
+        window = slice(query.offset, query.offset + query.limit)
+        if not matches and set(ranges) <= {query.sort}:
+            order, start, stop = sort_key.between(*ranges.get(query.sort, (None, None)), query.descending)
+            rows = order[start:stop]
+            return rows[window], len(rows)
+
+        candidates = list(matches)
+        for column, (low, high) in ranges.items():
+            order, start, stop = self._key(generation, frame, column).between(low, high)
+            candidates.append(np.sort(order[start:stop]))
+        rows = candidates[0]
+        for other in candidates[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        rows = rows[np.argsort(sort_key.keys(query.descending)[rows], kind='stable')]
+        return rows[window], len(rows)
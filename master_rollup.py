@@ -0,0 +1,162 @@
+import threading
+from typing import Dict, List, Mapping, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+GROUP_BY = ['month', 'payee', 'description']
+METRICS = ['sum', 'count', 'mean']
+
+
+class AggregateQuery(NamedTuple):
+    """Totals of one metric of the amounts per group of master rows"""
+    group_by: str = 'month'
+    metric: str = 'sum'
+
+
+def parse_aggregate_query(args: Mapping[str, str]) -> AggregateQuery:
+    """AggregateQuery from request arguments, raising ValueError on a bad one.
+
+    Takes group_by (one of GROUP_BY) and metric (one of METRICS).
+    """
+    group_by = (args.get('group_by') or '').strip() or 'month'
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+    metric = (args.get('metric') or '').strip() or 'sum'
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    return AggregateQuery(group_by, metric)
+
+
+def _group_keys(frame: pd.DataFrame, group_by: str) -> Tuple[np.ndarray, List[str]]:
+    """(row -> group code, -1 for no group; group keys) of the rows of frame.
+
+    Months are YYYY-MM, rows without a date fall in no month.
+    """
+    if group_by == 'month':
+        if 'date' not in frame.columns:
+            return np.full(len(frame), -1), []
+        codes, months = pd.factorize(frame['date'].to_numpy('datetime64[ms]').astype('datetime64[M]'))
+        return codes, np.datetime_as_string(months).tolist()
+    if group_by not in frame.columns:
+        return np.full(len(frame), -1), []
+    codes, uniques = pd.factorize(frame[group_by])
+    return codes, np.asarray(uniques, dtype=object).astype(str).tolist()
+
+
+class _Rollup:
+    """Rows, amount sum and amounts present per group of one column, updated in place.
+
+    Groups get a slot the first time they are seen and keep it; a group
+    whose rows all went away stays at zero rows and is left out of totals.
+    """
+
+    def __init__(self, group_by: str):
+        self.group_by = group_by
+        self.slots: Dict[str, int] = {}  # Group key -> slot
+        self.keys: List[str] = []  # Slot -> group key
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros(0, dtype='float64')
+        self.valued = np.zeros(0, dtype=np.int64)  # Rows with an amount, mean divides by these
+
+    def add(self, frame: pd.DataFrame, sign: int = 1) -> None:
+        """Count the rows of frame in their groups, or take them out with sign -1"""
+        if frame.empty:
+            return
+        codes, keys = _group_keys(frame, self.group_by)
+        slots = np.empty(len(keys), dtype=np.int64)
+        for code, key in enumerate(keys):
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self.slots[key] = len(self.keys)
+                self.keys.append(key)
+            slots[code] = slot
+        if len(self.keys) > len(self.rows):
+            grow = max(len(self.keys), 2 * len(self.rows)) - len(self.rows)
+            self.rows = np.concatenate([self.rows, np.zeros(grow, dtype=np.int64)])
+            self.sums = np.concatenate([self.sums, np.zeros(grow)])
+            self.valued = np.concatenate([self.valued, np.zeros(grow, dtype=np.int64)])
+
+        grouped = codes >= 0
+        amounts = frame['amount'].to_numpy('float64')[grouped] if 'amount' in frame.columns \
+            else np.full(np.count_nonzero(grouped), np.nan)
+        codes = codes[grouped]
+        valued = ~np.isnan(amounts)
+        # Slots are distinct, so each group is updated once
+        self.rows[slots] += sign * np.bincount(codes, minlength=len(keys))
+        self.valued[slots] += sign * np.bincount(codes[valued], minlength=len(keys))
+        self.sums[slots] += sign * np.bincount(codes[valued], weights=amounts[valued], minlength=len(keys))
+        # Drop rounding left over in a group whose last amount was taken out
+        self.sums[slots[self.valued[slots] == 0]] = 0.0
+
+    def totals(self, metric: str) -> pd.DataFrame:
+        """One row per group holding any rows, ordered by group key"""
+        live = np.flatnonzero(self.rows[:len(self.keys)] > 0)
+        if metric == 'count':
+            values = self.rows[live]
+        elif metric == 'sum':
+            values = self.sums[live]
+        else:
+            valued = self.valued[live]
+            values = np.divide(self.sums[live], valued, out=np.full(len(live), np.nan), where=valued > 0)
+        keys = np.asarray(self.keys, dtype=object)[live]
+        order = np.argsort(keys, kind='stable')
+        return pd.DataFrame({self.group_by: keys[order], metric: values[order]})
+
+
+class RollupIndex:
+    """Per-group totals of the current master snapshot for dashboards.
+
+    A grouping is rolled up over the whole snapshot once, on first use, and
+    then follows changes through apply(), which takes the rows a write or
+    merge removed out of their groups and counts the rows it added, so a
+    query reads a table of groups and never rescans the transactions.
+    Results are kept until the next change. A snapshot the index has not
+    followed, such as a full rebuild or a change made by another process,
+    rolls the groupings up again on the next query.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self._rollups: Dict[str, _Rollup] = {}
+        self._totals: Dict[AggregateQuery, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def apply(self, base_generation: int, generation: int, removed: pd.DataFrame, added: pd.DataFrame) -> None:
+        """Follow a change from snapshot base_generation to generation.
+
+        removed are the rows the change took out of the master and added the
+        rows it put in, an updated row being both. Never waits for a rollup
+        in progress; the groupings are then rolled up on the next query.
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self.generation != base_generation:
+                return
+            self.generation = None  # Until the change is followed through
+            for rollup in self._rollups.values():
+                rollup.add(removed, -1)
+                rollup.add(added)
+            self._totals = {}
+            self.generation = generation
+        finally:
+            self._lock.release()
+
+    def totals(self, generation: int, frame: pd.DataFrame, query: AggregateQuery) -> pd.DataFrame:
+        """The query's metric per group of the snapshot's rows, ordered by group.
+
+        The frame's columns are the group_by key and the metric; a mean is
+        NaN for a group without amounts.
+        """
+        with self._lock:
+            if generation != self.generation:
+                self._rollups, self._totals = {}, {}
+                self.generation = generation
+            if query not in self._totals:
+                if query.group_by not in self._rollups:
+                    rollup = _Rollup(query.group_by)
+                    rollup.add(frame)
+                    self._rollups[query.group_by] = rollup
+                self._totals[query] = self._rollups[query.group_by].totals(query.metric)
+            return self._totals[query]
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Callable, Optional, Set
+
+
+class MergeScheduler:
+    """Coalesce bursts of staging events into single trailing-edge merges.
+
+    notify() records a changed path and returns at once, so the watcher
+    thread never waits on a merge. A worker thread runs merge with every
+    path reported since the previous merge once no event has arrived for
+    quiet seconds, or max_delay seconds after the oldest pending event so a
+    steady stream of events still gets merged. Merges run one at a time;
+    events arriving during a merge are kept for the next one, and the paths
+    of a merge that fails are queued again.
+    """
+
+    def __init__(self, merge: Callable[[Set[str]], None], quiet: float = 1.0, max_delay: float = 10.0):
+        self.merge = merge
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._pending: Set[str] = set()
+        self._pending_events = 0
+        self._first: Optional[float] = None  # When the pending burst started, for max_delay
+        self._last: Optional[float] = None  # Latest pending event, for quiet
+        self._oldest: Optional[float] = None  # Oldest event not merged yet, for latency
+        self._running = False
+        self.events = 0
+        self.merges = 0
+        self.failures = 0
+        self.last_latency: Optional[float] = None  # Oldest event of a merge until it finished
+        self.max_latency = 0.0
+        self.last_duration: Optional[float] = None
+        threading.Thread(target=self._run, name='staging-merge', daemon=True).start()
+
+    def notify(self, path: str) -> None:
+        now = time.monotonic()
+        with self._cond:
+            self._pending.add(path)
+            self._pending_events += 1
+            self.events += 1
+            if self._first is None:
+                self._first = self._oldest = now
+            self._last = now
+            self._cond.notify()
+
+    def _next_batch(self):
+        """Wait for the trailing edge of a burst and take its paths"""
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                due = min(self._last + self.quiet, self._first + self.max_delay)
+                now = time.monotonic()
+                if now >= due:
+                    break
+                self._cond.wait(due - now)
+            paths, oldest = self._pending, self._oldest
+            self._pending, self._pending_events = set(), 0
+            self._first = self._last = self._oldest = None
+            self._running = True
+            return paths, oldest
+
+    def _run(self) -> None:
+        while True:
+            paths, oldest = self._next_batch()
+            start = time.monotonic()
+            try:
+                self.merge(paths)
+                failed = False
+            except Exception as e:
+                print(f"Error merging staging changes: {e}")
+                failed = True
+            end = time.monotonic()
+            with self._cond:
+                self._running = False
+                self.last_duration = end - start
+                if failed:
+                    # Retry after the next quiet period, counting latency from the original events
+                    self.failures += 1
+                    self._pending |= paths
+                    self._pending_events += len(paths)
+                    if self._first is None:
+                        self._first = self._last = end
+                    self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+                    continue
+                self.merges += 1
+                self.last_latency = end - oldest
+                self.max_latency = max(self.max_latency, self.last_latency)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'queued_events': self._pending_events,
+                'queued_paths': len(self._pending),
+                'running': self._running,
+                'events': self.events,
+                'merges': self.merges,
+                'failures': self.failures,
+                'last_latency': self.last_latency,
+                'max_latency': self.max_latency,
+                'last_duration': self.last_duration
+            }
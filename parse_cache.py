@@ -0,0 +1,98 @@
+import filecmp
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+class ParseCache:
+    """Content-addressed store of staging files, keyed by what produced them.
+
+    A raw file's staging JSON depends only on the raw content and on the
+    processor and version parsing it, so the output is stored under the hash
+    of (content sha256, processor, version) and reused for any raw file with
+    that key, whatever its path. Each entry is one file named after its key
+    and row count and is written before the raw file counts as parsed, so
+    entries survive a crash mid-ingestion. The file's mtime records its last
+    use; once the store holds more than max_bytes the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[str, Path]' = OrderedDict()  # Least recently used first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def key(sha256: str, parser: str, version: int) -> str:
+        return hashlib.sha256(f"{sha256}:{parser}:{version}".encode('utf-8')).hexdigest()
+
+    def load(self) -> None:
+        """Index the store's files by key in order of last use"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for path in self.cache_dir.glob("*.tmp"):
+            path.unlink(missing_ok=True)  # Left by a crash while storing
+        files = []
+        for path in self.cache_dir.glob("*.json"):
+            stat = path.stat()
+            files.append((stat.st_mtime_ns, path.name.split('.')[0], path, stat.st_size))
+        self.entries = OrderedDict((key, path) for _, key, path, _ in sorted(files))
+        self.size = sum(size for _, _, _, size in files)
+
+    def get(self, key: str, json_path: Path) -> Optional[int]:
+        """Write the cached staging file of key to json_path, returning its rows, or None on a miss.
+
+        json_path is left untouched when it already holds the same content.
+        """
+        cached = self.entries.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        tmp_path = json_path.with_name(json_path.name + '.tmp')
+        try:
+            os.utime(cached)
+            if not json_path.exists() or not filecmp.cmp(cached, json_path, shallow=False):
+                shutil.copyfile(cached, tmp_path)
+                os.replace(tmp_path, json_path)
+        except FileNotFoundError:
+            # Evicted by another process since it was indexed, re-index the store and miss
+            tmp_path.unlink(missing_ok=True)
+            self.load()
+            self.misses += 1
+            return None
+        self.hits += 1
+        return int(cached.name.split('.')[1])
+
+    def put(self, key: str, json_path: Path, rows: int) -> None:
+        """Store a freshly written staging file under key, then evict down to max_bytes"""
+        size = json_path.stat().st_size
+        if size > self.max_bytes:
+            return
+        self._evict(key)
+        cached = self.cache_dir / f"{key}.{rows}.json"
+        tmp_path = cached.with_suffix('.tmp')
+        shutil.copyfile(json_path, tmp_path)
+        os.replace(tmp_path, cached)
+        self.entries[key] = cached
+        self.size += size
+        while self.size > self.max_bytes:
+            self._evict(next(iter(self.entries)))
+
+    def _evict(self, key: str) -> None:
+        cached = self.entries.pop(key, None)
+        if cached is not None:
+            try:
+                self.size -= cached.stat().st_size
+                cached.unlink()
+            except FileNotFoundError:
+                pass  # Already removed by another process
+
+    def stats(self) -> dict:
+        return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
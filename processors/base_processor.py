@@ -1,9 +1,51 @@
 # processors/base_processor.py
 from abc import ABC, abstractmethod
+import codecs
+import chardet
 import pandas as pd
 from pathlib import Path
+from typing import Iterator, Tuple
+
+
+def _cp1252_fallback(error: UnicodeDecodeError):
+    """Decode error handler reading undecodable bytes as cp1252, or latin1 where cp1252 has a gap"""
+    data = error.object[error.start:error.end]
+    try:
+        return data.decode('cp1252'), error.end
+    except UnicodeDecodeError:
+        return data.decode('latin1'), error.end
+
+
+codecs.register_error('cp1252_fallback', _cp1252_fallback)
 
 class BaseProcessor(ABC):
+    VERSION = 1  # Bump when a change alters the parsed output, raw files it handled are parsed again
+    SUFFIXES: Tuple[str, ...] = ()  # Lower-case raw file suffixes the processor parses
+    SAMPLE_BYTES = 1 << 20  # Bytes read to detect a text file's encoding
+
     @abstractmethod
     def process(self, file_path: Path) -> pd.DataFrame:
-        pass
\ No newline at end of file
+        pass
+
+    def iter_chunks(self, file_path: Path) -> Iterator[pd.DataFrame]:
+        """Parse the file as a sequence of frames, processors that can stream override this"""
+        yield self.process(file_path)
+
+    def detect_encoding(self, file_path: Path) -> str:
+        """Detect the encoding from the start of the file.
+
+        Read the file with errors='cp1252_fallback' so bytes the detected
+        encoding cannot decode further on are read as cp1252.
+        """
+        detector = chardet.UniversalDetector()
+        with open(file_path, 'rb') as file:
+            read = 0
+            while read < self.SAMPLE_BYTES and not detector.done:
+                block = file.read(min(64 * 1024, self.SAMPLE_BYTES - read))
+                if not block:
+                    break
+                detector.feed(block)
+                read += len(block)
+        encoding = detector.close()['encoding']
+        # An ASCII sample says nothing about the rest of the file, UTF-8 covers it
+        return 'utf-8' if encoding in (None, 'ascii') else encoding
@@ -1,62 +1,88 @@
 # processors/document_processor.py
+import functools
+import json
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import PyPDF2
-import docx
 import os
 import shutil
+import tempfile
+from typing import Dict, List
 from .base_processor import BaseProcessor
 from .transaction_processor import TransactionProcessor
-import tabula
+# tabula, PyPDF2 and docx are imported on first use, they dominate import time
+
+
+@functools.lru_cache(maxsize=None)
+def check_java_installation() -> bool:
+    """Check if Java is installed and set JAVA_HOME if needed, once per process"""
+    try:
+        # A java on PATH is all tabula needs
+        if shutil.which('java'):
+            return True
+
+        # First check if JAVA_HOME is already set correctly
+        java_home = os.environ.get('JAVA_HOME')
+        if (java_home and os.path.exists(os.path.join(java_home, 'bin', 'java.exe'))):
+            return True
+
+        # Try to find Java installation
+        common_java_paths = [
+            r'C:\Program Files\Java',
+            r'C:\Program Files (x86)\Java',
+            r'C:\Program Files\Common Files\Oracle\Java',
+            r'C:\ProgramData\Oracle\Java'
+        ]
+
+        # Find all possible Java installations
+        java_installations = []
+        for base_path in common_java_paths:
+            if os.path.exists(base_path):
+                for root, dirs, files in os.walk(base_path):
+                    if 'bin' in dirs and 'java.exe' in os.listdir(os.path.join(root, 'bin')):
+                        java_installations.append(root)
+
+        if java_installations:
+            # Use the most recent version (assuming directory names are version-related)
+            java_path = sorted(java_installations)[-1]
+            os.environ['JAVA_HOME'] = java_path
+            
+            # Add Java bin to PATH
+            bin_path = os.path.join(java_path, 'bin')
+            if bin_path not in os.environ['PATH']:
+                os.environ['PATH'] = bin_path + os.pathsep + os.environ['PATH']
+            
+            print(f"Set JAVA_HOME to: {java_path}")
+            return True
+        else:
+            print("Java installation found but unable to locate java.exe")
+            return False
+            
+    except Exception as e:
+        print(f"Error checking Java installation: {e}")
+        return False
+
+
+def _table_frame(table: dict) -> pd.DataFrame:
+    """DataFrame of one table from tabula's JSON output, its first row as header like tabula.read_pdf"""
+    rows = [[cell['text'] or None for cell in row] for row in table['data']]
+    unnamed = iter(range(len(rows[0])))
+    header = [text if text is not None else f"Unnamed: {next(unnamed)}" for text in rows[0]]
+    return pd.DataFrame(rows[1:], columns=header)
+
 
 class DocumentProcessor(BaseProcessor):
+    VERSION = 3
+    SUFFIXES = ('.pdf', '.docx')
+    PAGE_WORKERS = 4  # Concurrent tabula calls on one long PDF
+    MIN_BATCH_PAGES = 8  # Fewest pages worth a tabula call of their own
+
     def __init__(self):
         self.transaction_processor = TransactionProcessor()
-        self._check_java_installation()
 
     def _check_java_installation(self):
-        """Check if Java is installed and set JAVA_HOME if needed"""
-        try:
-            # First check if JAVA_HOME is already set correctly
-            java_home = os.environ.get('JAVA_HOME')
-            if (java_home and os.path.exists(os.path.join(java_home, 'bin', 'java.exe'))):
-                return True
-
-            # Try to find Java installation
-            common_java_paths = [
-                r'C:\Program Files\Java',
-                r'C:\Program Files (x86)\Java',
-                r'C:\Program Files\Common Files\Oracle\Java',
-                r'C:\ProgramData\Oracle\Java'
-            ]
-
-            # Find all possible Java installations
-            java_installations = []
-            for base_path in common_java_paths:
-                if os.path.exists(base_path):
-                    for root, dirs, files in os.walk(base_path):
-                        if 'bin' in dirs and 'java.exe' in os.listdir(os.path.join(root, 'bin')):
-                            java_installations.append(root)
-
-            if java_installations:
-                # Use the most recent version (assuming directory names are version-related)
-                java_path = sorted(java_installations)[-1]
-                os.environ['JAVA_HOME'] = java_path
-                
-                # Add Java bin to PATH
-                bin_path = os.path.join(java_path, 'bin')
-                if bin_path not in os.environ['PATH']:
-                    os.environ['PATH'] = bin_path + os.pathsep + os.environ['PATH']
-                
-                print(f"Set JAVA_HOME to: {java_path}")
-                return True
-            else:
-                print("Java installation found but unable to locate java.exe")
-                return False
-                
-        except Exception as e:
-            print(f"Error checking Java installation: {e}")
-            return False
+        """Whether Java is available to tabula, probed once per process"""
+        return check_java_installation()
 
     def process(self, file_path: Path) -> pd.DataFrame:
         if file_path.suffix.lower() == '.pdf':
@@ -67,47 +93,96 @@ class DocumentProcessor(BaseProcessor):
             raise ValueError(f"Unsupported document type: {file_path.suffix}")
         
     def _process_pdf(self, file_path: Path) -> pd.DataFrame:
-        """Process PDF file using tabula with PyPDF2 fallback"""
+        """Process PDF file page by page, using tabula with PyPDF2 fallback per page"""
         try:
-            if not self._check_java_installation():
-                print("Java not properly configured, falling back to PyPDF2...")
-                return self._process_pdf_fallback(file_path)
-
-            # Try tabula first
-            tables = tabula.read_pdf(
-                str(file_path), 
-                multiple_tables=True,
-                pages='all',
-                guess=True,
-                lattice=True,
-                stream=True
-            )
-            
-            if tables:
-                for df in tables:
-                    # Ensure required columns exist
-                    if 'payee' not in df.columns:
-                        df['payee'] = ''
-                    transactions = self.transaction_processor.process_transactions(df)
-                    if not transactions.empty:
-                        return transactions
-            
-            # Fallback to PyPDF2 if no tables found
-            print("No valid tables found, falling back to PyPDF2...")
-            return self._process_pdf_fallback(file_path)
-            
+            import PyPDF2
+            page_count = len(PyPDF2.PdfReader(str(file_path)).pages)
         except Exception as e:
-            print(f"Error processing PDF with tabula: {e}")
-            return self._process_pdf_fallback(file_path)
+            print(f"Error reading PDF: {e}")
+            return pd.DataFrame(columns=['date', 'amount', 'description', 'payee'])
+
+        page_tables = {}
+        if not self._check_java_installation():
+            print("Java not properly configured, falling back to PyPDF2...")
+        else:
+            try:
+                page_tables = self._read_page_tables(file_path)
+            except Exception as e:
+                print(f"Error processing PDF with tabula: {e}")
+
+        frames = []
+        fallback_pages = []
+        for page in range(page_count):
+            transactions = []
+            for df in page_tables.get(page, []):
+                # Ensure required columns exist
+                if 'payee' not in df.columns:
+                    df['payee'] = ''
+                transactions.append(self.transaction_processor.process_transactions(df))
+            transactions = [df for df in transactions if not df.empty]
+            if transactions:
+                frames.extend(df.assign(page=page) for df in transactions)
+            else:
+                fallback_pages.append(page)
+
+        if fallback_pages:
+            # Fallback to PyPDF2 on the pages where no valid table was found
+            text_df = self._process_pdf_fallback(file_path, fallback_pages)
+            if not text_df.empty:
+                frames.append(text_df.assign(page=fallback_pages[:len(text_df)]))
+        if not frames:
+            return pd.DataFrame(columns=['date', 'amount', 'description', 'payee'])
+        df = pd.concat(frames, ignore_index=True).sort_values('page', kind='stable')
+        return df.drop(columns='page').reset_index(drop=True)
+
+    def _read_page_tables(self, file_path: Path) -> Dict[int, List[pd.DataFrame]]:
+        """Tables tabula finds on each page of the PDF, by page index.
+
+        Every page is written out as a PDF of its own, so each table keeps its
+        page, and the pages are read in batches with one tabula call per batch.
+        tabula runs in a JVM kept for the whole process when jpype is installed
+        and starts one JVM per call otherwise. Long documents are split into up
+        to PAGE_WORKERS batches read concurrently.
+        """
+        import tabula
+        from PyPDF2 import PdfReader, PdfWriter
+
+        reader = PdfReader(str(file_path))
+        page_count = len(reader.pages)
+        batches = max(1, min(self.PAGE_WORKERS, page_count // self.MIN_BATCH_PAGES))
+        convert = functools.partial(tabula.convert_into_by_batch, output_format='json',
+                                    guess=True, lattice=True, stream=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            directories = [Path(tmp) / str(batch) for batch in range(batches)]
+            for page in range(page_count):
+                writer = PdfWriter()
+                writer.add_page(reader.pages[page])
+                directory = directories[page * batches // page_count]
+                directory.mkdir(exist_ok=True)
+                with open(directory / f"{page:05d}.pdf", 'wb') as file:
+                    writer.write(file)
+
+            # The first call starts tabula's JVM, concurrent calls would race to start it
+            convert(str(directories[0]))
+            if batches > 1:
+                with ThreadPoolExecutor(batches - 1) as pool:
+                    list(pool.map(convert, map(str, directories[1:])))
+
+            page_tables = {}
+            for output in Path(tmp).glob("*/*.json"):
+                tables = json.loads(output.read_text(encoding='utf-8'))
+                page_tables[int(output.stem)] = [_table_frame(table) for table in tables if table['data']]
+            return page_tables
 
-    def _process_pdf_fallback(self, file_path: Path) -> pd.DataFrame:
-        """Fallback method using PyPDF2 for text extraction"""
+    def _process_pdf_fallback(self, file_path: Path, pages: List[int] = None) -> pd.DataFrame:
+        """Fallback method using PyPDF2 for text extraction, of all pages or the given ones"""
         try:
+            import PyPDF2
             with open(file_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
                 text_content = []
-                for page in reader.pages:
-                    text_content.append(page.extract_text())
+                for page in range(len(reader.pages)) if pages is None else pages:
+                    text_content.append(reader.pages[page].extract_text())
                 
                 # Create DataFrame with basic structure
                 df = pd.DataFrame(columns=['date', 'amount', 'description', 'payee'])
@@ -123,6 +198,7 @@ class DocumentProcessor(BaseProcessor):
             return pd.DataFrame(columns=['date', 'amount', 'description', 'payee'])
         
     def _process_docx(self, file_path: Path) -> pd.DataFrame:
+        import docx
         doc = docx.Document(file_path)
         tables = doc.tables
         if tables:
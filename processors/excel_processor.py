@@ -1,45 +1,48 @@
 # processors/excel_processor.py
 import pandas as pd
-import chardet
 from pathlib import Path
+from typing import Iterator
 from .base_processor import BaseProcessor
+from .normalization import detect_date_format
 from .transaction_processor import TransactionProcessor
 
+
 class ExcelCsvProcessor(BaseProcessor):
+    VERSION = 4
+    SUFFIXES = ('.csv', '.xlsx', '.xls')
+    CHUNK_ROWS = 100_000  # CSV rows parsed per chunk
+
     def __init__(self):
         self.transaction_processor = TransactionProcessor()
 
     def process(self, file_path: Path) -> pd.DataFrame:
-        # Read the file
-        if file_path.suffix == '.csv':
-            # Detect file encoding
-            with open(file_path, 'rb') as file:
-                raw_data = file.read()
-                result = chardet.detect(raw_data)
-                encoding = result['encoding']
-            
-            # Try different encodings
-            encodings = [encoding, 'utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-            for enc in encodings:
-                try:
-                    df = pd.read_csv(file_path, encoding=enc)
-                    break
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    print(f"Error reading CSV with {enc} encoding: {e}")
-            else:
-                raise ValueError(f"Could not read CSV file with any supported encoding")
-        else:
-            df = pd.read_excel(file_path)
+        chunks = list(self.iter_chunks(file_path))
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+    def iter_chunks(self, file_path: Path) -> Iterator[pd.DataFrame]:
+        """Parse the file in chunks of CHUNK_ROWS transactions, CSVs in a single pass.
+        The date format detected in the first chunk is used for the whole file; a
+        later chunk with dates in another order raises ValueError."""
+        if file_path.suffix.lower() != '.csv':
+            yield self._process_frame(pd.read_excel(file_path))
+            return
+
+        # One pass: bytes the detected encoding cannot decode are read as cp1252
+        encoding = self.detect_encoding(file_path)
+        emitted = False
+        date_format = None
+        with pd.read_csv(file_path, encoding=encoding, encoding_errors='cp1252_fallback',
+                         chunksize=self.CHUNK_ROWS) as reader:
+            for chunk in reader:
+                if not emitted:
+                    date_column = self.transaction_processor.date_column(chunk)
+                    if date_column is not None:
+                        date_format = detect_date_format(chunk[date_column])
+                emitted = True
+                yield self._process_frame(chunk, date_format)
+        if not emitted:
+            # Header only, still yield the columns
+            yield self._process_frame(pd.read_csv(file_path, encoding=encoding, nrows=0))
 
-        # Process transactions
-        transactions = self.transaction_processor.process_transactions(df)
-        
-        # Extract payee if present
-        if 'payee' in df.columns:
-            transactions['payee'] = df['payee']
-        else:
-            transactions['payee'] = ''
-        
-        return transactions
\ No newline at end of file
+    def _process_frame(self, df: pd.DataFrame, date_format: str = None) -> pd.DataFrame:
+        return self.transaction_processor.process_transactions(df, date_format)
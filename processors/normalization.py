@@ -0,0 +1,144 @@
+# processors/normalization.py
+"""Column-at-a-time normalization of transaction dates and amounts.
+
+Formats are detected once per column from a sample of its values and the
+whole column is then parsed with them, instead of inferring the format of
+every value. A date format covers its two- and four-digit year variants.
+"""
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Tried in order, the first one fitting the whole sample wins; month before
+# day where both fit, as pandas reads ambiguous dates. Each also reads its
+# dates with the year written in the other width.
+DATE_FORMATS = [
+    '%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%d/%m/%Y', '%m-%d-%Y', '%d-%m-%Y', '%d.%m.%Y',
+    '%m/%d/%y', '%d/%m/%y', '%d-%m-%y', '%d.%m.%y', '%Y%m%d', '%d %b %Y', '%d %B %Y', '%b %d, %Y',
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'
+]
+SAMPLE_SIZE = 1000
+# Currency symbols and codes, letters such as CR/DR and spaces: everything but digits, separators and signs
+_NOT_NUMERIC = r'[^0-9.,\-]'
+_NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+
+
+def _sample(values: pd.Series) -> pd.Series:
+    present = values.dropna()
+    present = present[present.astype(str).str.strip() != '']
+    return present.iloc[:: max(1, len(present) // SAMPLE_SIZE)].astype(str).str.strip()
+
+
+def _parse_dates(text: pd.Series, date_format: str) -> pd.Series:
+    """Datetimes of text in date_format or its other year width, NaT where neither fits"""
+    parsed = pd.to_datetime(text, format=date_format, errors='coerce')
+    other_year = date_format.replace('%Y', '%y') if '%Y' in date_format else date_format.replace('%y', '%Y')
+    unfit = parsed.isna()
+    if other_year != date_format and unfit.any():
+        parsed[unfit] = pd.to_datetime(text[unfit], format=other_year, errors='coerce')
+    return parsed
+
+
+def _date_order(date_format: str) -> str:
+    """Order of day, month and year in date_format, such as 'dmY'"""
+    return ''.join(re.findall(r'%([dmbBYy])', date_format)).translate(str.maketrans('bBy', 'mmY'))
+
+
+def _check_date_order(text: pd.Series, date_format: str) -> None:
+    """Raise ValueError if dates not fitting date_format fit a format ordering day, month and year otherwise"""
+    for other_format in DATE_FORMATS:
+        if _date_order(other_format) != _date_order(date_format):
+            fits = _parse_dates(text, other_format).notna()
+            if fits.any():
+                raise ValueError(f"Date {text[fits].iloc[0]!r} is written as {other_format}, "
+                                 f"not as {date_format} like the dates before it")
+
+
+def detect_date_format(values: pd.Series) -> Optional[str]:
+    """The first of DATE_FORMATS parsing every sampled value of the column, None if none does"""
+    sample = _sample(values)
+    if sample.empty:
+        return None
+    for date_format in DATE_FORMATS:
+        if _parse_dates(sample, date_format).notna().all():
+            return date_format
+    return None
+
+
+def normalize_dates(values: pd.Series, date_format: str = None) -> pd.Series:
+    """Dates as YYYY-MM-DD strings, NaN where a value is missing or not a date.
+
+    Values are parsed with date_format, detected from the column when not
+    given. Raises ValueError if a value that does not fit it fits a format
+    ordering day, month and year otherwise, as dates read in the wrong order
+    would pass unnoticed; other values have their format inferred one by
+    one. Each distinct value is parsed and formatted once.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = pd.DatetimeIndex(values)
+        codes, uniques = np.arange(len(values)), parsed
+    else:
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques, dtype=object).astype(str).str.strip()
+        date_format = date_format or detect_date_format(uniques)
+        if date_format is not None:
+            parsed = _parse_dates(uniques, date_format)
+        else:
+            parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+        unfit = parsed.isna() & (uniques != '')
+        if unfit.any() and date_format is not None:
+            _check_date_order(uniques[unfit], date_format)
+        if unfit.any():
+            parsed[unfit] = pd.to_datetime(uniques[unfit], format='mixed', errors='coerce')
+        parsed = pd.DatetimeIndex(parsed)
+
+    days = np.datetime_as_string(parsed.to_numpy('datetime64[ns]').astype('datetime64[D]')).astype(object)
+    days[parsed.isna()] = np.nan
+    return pd.Series(np.append(days, np.nan)[codes], index=values.index, dtype=object)
+
+
+def detect_decimal_comma(values: pd.Series) -> bool:
+    """Whether the column writes decimals with a comma, as in 1.234,56"""
+    sample = _sample(values)
+    comma = sample.str.contains(r',\d{1,2}\)?-?$', regex=True).any()
+    point = sample.str.contains(r'\.\d{1,2}\)?-?$', regex=True).any()
+    return bool(comma and not point)
+
+
+def _to_float(text: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Floats of the values that are plain numbers, NaN elsewhere, and which those are.
+    Casting only checked values is much faster than pd.to_numeric with errors='coerce'."""
+    number = text.str.fullmatch(_NUMBER, na=False)
+    amounts = pd.Series(np.nan, index=text.index)
+    amounts[number] = text[number].astype('float64')
+    return amounts, number
+
+
+def normalize_amounts(values: pd.Series) -> pd.Series:
+    """Amounts as floats, NaN where a value holds no number.
+
+    Currency symbols and codes and thousands separators are dropped, the
+    decimal separator is detected from the column. Amounts in parentheses
+    or with a trailing minus are negative.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype('float64')
+    text = values.astype(str).str.strip()
+    amounts, plain = _to_float(text)
+    # Only the values that are not plain numbers need cleaning
+    dirty = ~plain & values.notna()
+    if not dirty.any():
+        return amounts
+
+    text = text[dirty]
+    negative = (text.str.startswith('(') & text.str.endswith(')')) | text.str.endswith('-')
+    digits = text.str.replace(_NOT_NUMERIC, '', regex=True).str.rstrip('-')
+    if detect_decimal_comma(text):
+        digits = digits.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    else:
+        digits = digits.str.replace(',', '', regex=False)
+    cleaned, _ = _to_float(digits)
+    amounts[dirty] = cleaned.where(~negative, -cleaned.abs())
+    return amounts
@@ -1,96 +1,106 @@
 # processors/text_processor.py
 import pandas as pd
-import chardet
 from pathlib import Path
 import re
 from datetime import datetime
+from typing import Callable, Iterator, Optional
 from .base_processor import BaseProcessor
 
+COLUMNS = ['date', 'amount', 'description', 'payee']
+
+
 class TextProcessor(BaseProcessor):
-    def __init__(self):
-        # Common date patterns at start of line
-        self.date_pattern = r'^(?:\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2})'
-        
+    VERSION = 2
+    SUFFIXES = ('.txt',)
+    CHUNK_ROWS = 100_000  # Entries per parsed chunk
+    # Common date patterns at start of line
+    DATE_PATTERN = re.compile(r'^(?:\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}[-/]\d{1,2}[-/]\d{1,2})')
+    # Look for amount pattern like "-2108.0"
+    AMOUNT_PATTERN = re.compile(r'\s(-?\d+\.?\d*)\s')
+    PAYEE_PATTERN = re.compile(r'Payee:\s*(\w+)')
+    DATE_FORMATS = ['%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%y']
+
     def normalize_date(self, date_str: str) -> str:
         """Convert various date formats to ISO format"""
-        try:
-            # Try different date formats
-            for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y-%m-%d', 
-                       '%d/%m/%y', '%d-%m-%y']:
+        return self._date_normalizer()(date_str)
+
+    def _date_normalizer(self) -> Callable[[str], Optional[str]]:
+        """normalize_date for one file: remembers every date it converted and tries the
+        format that last worked first, so a file's own format is found once and reused"""
+        formats = list(self.DATE_FORMATS)
+        dates = {}
+
+        def normalize(date_str: str) -> Optional[str]:
+            if date_str in dates:
+                return dates[date_str]
+            dates[date_str] = None
+            # A date string matches at most one format, trying them in any order gives the same result
+            for i, fmt in enumerate(formats):
                 try:
-                    return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+                    dates[date_str] = datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
                 except ValueError:
                     continue
-            return None
-        except Exception:
-            return None
+                formats.insert(0, formats.pop(i))
+                break
+            return dates[date_str]
 
-    def process(self, file_path: Path) -> pd.DataFrame:
-        # Detect encoding
-        with open(file_path, 'rb') as file:
-            raw_data = file.read()
-            result = chardet.detect(raw_data)
-            encoding = result['encoding'] or 'utf-8'
-        
-        # Process file content
-        entries = []  # List to store entries
-        current_date = None
-        current_entry = None
-        
-        with open(file_path, 'r', encoding=encoding) as file:
-            lines = file.readlines()
-            for i, line in enumerate(lines):
+        return normalize
+
+    def iter_entries(self, file_path: Path) -> Iterator[dict]:
+        """Transactions of the file one at a time, reading it in a single pass.
+
+        A line starting with a date and holding an amount between spaces is an
+        entry; the line right after it, unless empty or dated itself, is added
+        to its description. An entry is yielded once that next line is seen.
+        """
+        normalize = self._date_normalizer()
+        entry = None
+        with open(file_path, 'r', encoding=self.detect_encoding(file_path), errors='cp1252_fallback') as file:
+            for line in file:
                 line = line.strip()
-                if not line:
+                date_match = self.DATE_PATTERN.match(line) if line else None
+                if entry is not None:
+                    if line and date_match is None:
+                        # Additional description
+                        entry['description'] = f"{entry['description']} - {line}"
+                    yield entry
+                    entry = None
+                if date_match is None:
+                    continue
+
+                date = normalize(date_match.group(0))
+                if date is None:
+                    continue
+                # Get remainder after date
+                remainder = line[date_match.end():].strip()
+                amount_match = self.AMOUNT_PATTERN.search(remainder)
+                if amount_match is None:
                     continue
-                
-                # Check for date at start of line
-                date_match = re.match(self.date_pattern, line)
-                if date_match:
-                    # Save previous entry if exists
-                    if current_entry:
-                        entries.append(current_entry)
-                    
-                    # Extract and normalize date
-                    date_str = date_match.group(0)
-                    normalized_date = self.normalize_date(date_str)
-                    if normalized_date:
-                        current_date = normalized_date
-                        # Get remainder after date
-                        remainder = line[date_match.end():].strip()
-                        
-                        # Extract description, amount, and payee
-                        # Look for amount pattern like "-2108.0"
-                        amount_match = re.search(r'\s(-?\d+\.?\d*)\s', remainder)
-                        if amount_match:
-                            amount = float(amount_match.group(1))
-                            # Split remainder into parts before and after amount
-                            parts = remainder.split(amount_match.group(0))
-                            description = parts[0].strip()
-                            
-                            # Extract payee if present
-                            payee_match = re.search(r'Payee:\s*(\w+)', parts[1]) if len(parts) > 1 else None
-                            payee = payee_match.group(1) if payee_match else ''
-                            
-                            current_entry = {
-                                'date': current_date,
-                                'amount': amount,
-                                'description': description,
-                                'payee': payee
-                            }
-                            
-                            # Check if next line is additional description
-                            if i + 1 < len(lines):
-                                next_line = lines[i + 1].strip()
-                                if next_line and not re.match(self.date_pattern, next_line):
-                                    current_entry['description'] = f"{current_entry['description']} - {next_line}"
-    
-        # Add last entry if exists
-        if current_entry:
-            entries.append(current_entry)
-        
-        # Convert to DataFrame
-        if entries:
-            return pd.DataFrame(entries)
-        
-        return pd.DataFrame(columns=['date', 'amount', 'description', 'payee'])
\ No newline at end of file
+                # Split remainder into parts before and after amount
+                parts = remainder.split(amount_match.group(0))
+                payee_match = self.PAYEE_PATTERN.search(parts[1]) if len(parts) > 1 else None
+                entry = {
+                    'date': date,
+                    'amount': float(amount_match.group(1)),
+                    'description': parts[0].strip(),
+                    'payee': payee_match.group(1) if payee_match else ''
+                }
+        if entry is not None:
+            yield entry
+
+    def iter_chunks(self, file_path: Path) -> Iterator[pd.DataFrame]:
+        """Parse the file in chunks of CHUNK_ROWS entries"""
+        chunk = []
+        for entry in self.iter_entries(file_path):
+            chunk.append(entry)
+            if len(chunk) == self.CHUNK_ROWS:
+                yield pd.DataFrame(chunk, columns=COLUMNS)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=COLUMNS)
+
+    def process(self, file_path: Path) -> pd.DataFrame:
+        chunks = list(self.iter_chunks(file_path))
+        if not chunks:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
@@ -1,8 +1,7 @@
 # processors/transaction_processor.py
-from datetime import datetime
 import pandas as pd
-import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+from .normalization import normalize_amounts, normalize_dates
 
 class TransactionProcessor:
     def __init__(self):
@@ -45,13 +44,43 @@ class TransactionProcessor:
             if any(word in col_lower for word in ['category', 'type']):
                 column_mapping['source'] = col
 
+            # Description column detection
+            if any(word in col_lower for word in ['description', 'narrative', 'details', 'memo']):
+                column_mapping['description'] = col
+
             # Payee column detection
             if 'payee' in col_lower:
                 column_mapping['payee'] = col
 
         return column_mapping
 
-    def process_transactions(self, df: pd.DataFrame) -> pd.DataFrame:
+    def date_column(self, df: pd.DataFrame) -> Optional[str]:
+        """The column process_transactions reads dates from, None if there is none"""
+        return 'date' if 'date' in df.columns else self.detect_columns(df).get('date')
+
+    def process_transactions(self, df: pd.DataFrame, date_format: str = None) -> pd.DataFrame:
+        """Map a parsed table onto date, amount, description and payee.
+
+        Columns detected by detect_columns fill date, description and payee
+        when the table has none of that name; description falls back to the
+        category or type column. Dates are parsed with date_format, or one
+        detected from the column, amounts are cleaned of currency symbols and
+        thousands separators. A table without an amount column but with
+        debit and credit amount columns gets credits minus debits.
+        """
+        columns = self.detect_columns(df)
+        columns.setdefault('description', columns.get('source'))
+        for col in ['date', 'description', 'payee']:
+            if col not in df.columns and columns.get(col) is not None:
+                df[col] = df[columns[col]]
+        if 'amount' not in df.columns and ('debit_amount' in columns or 'credit_amount' in columns):
+            amount = pd.Series(0.0, index=df.index)
+            if 'credit_amount' in columns:
+                amount += normalize_amounts(df[columns['credit_amount']]).abs().fillna(0.0)
+            if 'debit_amount' in columns:
+                amount -= normalize_amounts(df[columns['debit_amount']]).abs().fillna(0.0)
+            df['amount'] = amount
+
         # Ensure all required columns exist
         required_cols = ['date', 'amount', 'description', 'payee']
         for col in required_cols:
@@ -59,45 +88,6 @@ class TransactionProcessor:
                 df[col] = ''
                 
         # Process existing columns
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-        
-        if 'amount' in df.columns:
-            df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
-            
-        if 'description' not in df.columns:
-            df['description'] = ''
-            
-        if 'payee' not in df.columns:
-            df['payee'] = ''
-            
+        df['date'] = normalize_dates(df['date'], date_format)
+        df['amount'] = normalize_amounts(df['amount']).fillna(0.0)
         return df[required_cols]  # Return only required columns in correct order
-
-    def normalize_date(self, value: str) -> str:
-        """Convert various date formats to ISO format"""
-        if pd.isna(value):
-            return None
-        
-        try:
-            # Handle common date formats including DD/MM/YY
-            date_str = str(value).strip()
-            if '/' in date_str:
-                day, month, year = date_str.split('/')
-                # Handle 2-digit year
-                if len(year) == 2:
-                    year = '20' + year
-                return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            return pd.to_datetime(value).strftime('%Y-%m-%d')
-        except:
-            return None
-
-    def normalize_amount(self, value: str) -> float:
-        """Convert amount string to float"""
-        if pd.isna(value):
-            return 0.0
-        try:
-            # Remove currency symbols and other non-numeric chars except . and -
-            amount_str = re.sub(r'[^\d.-]', '', str(value))
-            return float(amount_str)
-        except ValueError:
-            return 0.0
\ No newline at end of file
@@ -0,0 +1,252 @@
+import filecmp
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+import pandas as pd
+from processors import BaseProcessor, DocumentProcessor, ExcelCsvProcessor, TextProcessor
+
+RAW_COLUMNS = ['date', 'amount', 'description', 'payee']
+
+# (raw file, staging rows written or None, error message or None)
+ParseResult = Tuple[Path, Optional[int], Optional[str]]
+
+
+# Processors parsing raw files, each for the suffixes it declares
+PROCESSOR_CLASSES = [ExcelCsvProcessor, DocumentProcessor, TextProcessor]
+
+
+class ProcessorRegistry(Mapping):
+    """Processors by raw file suffix, each built on first lookup.
+
+    Every registered BaseProcessor subclass handles the SUFFIXES it
+    declares; a later registration takes over a suffix from an earlier one.
+    Suffixes sharing a class share one instance, and a class whose files
+    never show up is never instantiated; processors defer their heavy
+    imports to first use as well. version() describes a suffix's parser
+    without building it.
+    """
+
+    def __init__(self, processor_classes: List[type] = None):
+        self.classes: Dict[str, type] = {}
+        self._instances: Dict[type, BaseProcessor] = {}
+        self._lock = threading.Lock()
+        for processor_class in PROCESSOR_CLASSES if processor_classes is None else processor_classes:
+            self.register(processor_class)
+
+    def register(self, processor_class: type) -> None:
+        if not processor_class.SUFFIXES:
+            raise ValueError(f"{processor_class.__name__} declares no suffixes")
+        for suffix in processor_class.SUFFIXES:
+            self.classes[suffix.lower()] = processor_class
+
+    def __getitem__(self, suffix: str) -> BaseProcessor:
+        processor_class = self.classes[suffix]
+        with self._lock:
+            if processor_class not in self._instances:
+                self._instances[processor_class] = processor_class()
+            return self._instances[processor_class]
+
+    def __contains__(self, suffix) -> bool:
+        return suffix in self.classes
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.classes)
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+    def version(self, suffix: str) -> Tuple[str, int]:
+        """(processor class name, VERSION) parsing the suffix, ('', 0) if none does"""
+        processor_class = self.classes.get(suffix)
+        return (processor_class.__name__, processor_class.VERSION) if processor_class else ('', 0)
+
+
+def _staging_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Ensure all required columns exist with correct types
+    for col in RAW_COLUMNS:
+        if col not in df.columns:
+            df[col] = '' if col != 'amount' else 0.0
+    return df[RAW_COLUMNS]  # Return only required columns in correct order
+
+
+def _processor(file_path: Path, processors: Mapping[str, BaseProcessor]) -> BaseProcessor:
+    suffix = file_path.suffix.lower()
+    if suffix not in processors:
+        raise ValueError(f"Unsupported file type: {suffix}")
+    return processors[suffix]
+
+
+def parse_file(file_path: Path, processors: Mapping[str, BaseProcessor]) -> pd.DataFrame:
+    """Parse one raw file into the staging columns, raising if it cannot be parsed"""
+    return _staging_columns(_processor(file_path, processors).process(file_path))
+
+
+def _tmp_path(json_path: Path) -> Path:
+    return json_path.with_name(json_path.name + '.tmp')
+
+
+def write_staging(file_path: Path, processors: Mapping[str, BaseProcessor], json_path: Path) -> int:
+    """Parse one raw file straight into its staging JSON, returning the row count.
+
+    Chunks from the processor are written as they come, so memory stays flat
+    for processors that stream. The output is the same as
+    DataFrame.to_json(orient='records', indent=4) on the whole file. It is
+    built next to json_path and only replaces it if the content differs.
+    """
+    tmp_path = _tmp_path(json_path)
+    rows = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write('[\n')
+            for chunk in _processor(file_path, processors).iter_chunks(file_path):
+                if chunk.empty:
+                    continue
+                # Strip the chunk's own brackets, keeping its indented records
+                file.write((',\n' if rows else '') + _staging_columns(chunk).to_json(orient='records', indent=4)[2:-2])
+                rows += len(chunk)
+            file.write('\n]')
+        if not json_path.exists() or not filecmp.cmp(tmp_path, json_path, shallow=False):
+            os.replace(tmp_path, json_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return rows
+
+
+def _describe(error: Exception) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+def _worker_main(conn, classes: Dict[str, type]) -> None:
+    """Worker process: write the staging files of the raw files sent over conn until told to stop.
+
+    classes are the parent's processor classes by suffix, built here on first use.
+    """
+    processors = ProcessorRegistry([])
+    processors.classes.update(classes)
+    for file_path, json_path in iter(conn.recv, None):
+        try:
+            conn.send((write_staging(Path(file_path), processors, Path(json_path)), None))
+        except Exception as e:
+            conn.send((None, _describe(e)))
+
+
+class _Worker:
+    def __init__(self, context, classes: Dict[str, type]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, classes), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task: Optional[Tuple[int, float]] = None  # (file index, deadline)
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class IngestPool:
+    """Parse raw files into their staging files across worker processes.
+
+    Each file gets at most timeout seconds; a worker that overruns it or dies
+    (a crashed JVM, say) is replaced and only that file is reported as
+    failed. Results come back in input order whatever order the workers
+    finish in. With workers=0 files are parsed in this process with the given
+    processors and no timeout; workers build their own instances of the same
+    processor classes.
+    """
+
+    def __init__(self, workers: int, timeout: float, processors: Mapping[str, BaseProcessor] = None):
+        self.workers = workers
+        self.timeout = timeout
+        self.processors = processors
+
+    def map(self, file_paths: List[Path], json_paths: List[Path]) -> Iterator[ParseResult]:
+        """Write each raw file's staging JSON to the matching json_path"""
+        if self.workers <= 0:
+            yield from self._map_inline(file_paths, json_paths)
+        else:
+            yield from self._map_workers(file_paths, json_paths)
+
+    def _map_inline(self, file_paths: List[Path], json_paths: List[Path]) -> Iterator[ParseResult]:
+        processors = self.processors if self.processors is not None else ProcessorRegistry()
+        for file_path, json_path in zip(file_paths, json_paths):
+            try:
+                yield file_path, write_staging(file_path, processors, json_path), None
+            except Exception as e:
+                yield file_path, None, _describe(e)
+
+    def _processor_classes(self) -> Dict[str, type]:
+        """Processor class by suffix, for workers to build their own processors from"""
+        if self.processors is None:
+            return ProcessorRegistry().classes
+        if isinstance(self.processors, ProcessorRegistry):
+            return dict(self.processors.classes)
+        return {suffix: type(processor) for suffix, processor in self.processors.items()}
+
+    def _map_workers(self, file_paths: List[Path], json_paths: List[Path]) -> Iterator[ParseResult]:
+        # fork keeps workers from re-importing the app's main module
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        classes = self._processor_classes()
+        workers = [_Worker(context, classes) for _ in range(min(self.workers, len(file_paths)))]
+        queue = deque(range(len(file_paths)))
+        results: Dict[int, Tuple[Optional[int], Optional[str]]] = {}
+        next_index = 0
+        try:
+            while next_index < len(file_paths):
+                for worker in workers:
+                    if worker.task is None and queue:
+                        index = queue.popleft()
+                        worker.conn.send((str(file_paths[index]), str(json_paths[index])))
+                        worker.task = (index, time.monotonic() + self.timeout)
+
+                busy = [worker for worker in workers if worker.task is not None]
+                if busy:
+                    remaining = min(worker.task[1] for worker in busy) - time.monotonic()
+                    wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy],
+                         max(remaining, 0))
+
+                for position, worker in enumerate(workers):
+                    if worker.task is None:
+                        continue
+                    index, deadline = worker.task
+                    if worker.conn.poll():
+                        try:
+                            results[index] = worker.conn.recv()
+                            worker.task = None
+                            continue
+                        except (EOFError, OSError):
+                            error = "worker exited while parsing"
+                    elif not worker.process.is_alive():
+                        error = f"worker exited with code {worker.process.exitcode}"
+                    elif time.monotonic() >= deadline:
+                        error = f"timed out after {self.timeout:g}s"
+                    else:
+                        continue
+                    results[index] = (None, error)
+                    worker.kill()
+                    _tmp_path(json_paths[index]).unlink(missing_ok=True)
+                    workers[position] = _Worker(context, classes)
+
+                while next_index in results:
+                    rows, error = results.pop(next_index)
+                    yield file_paths[next_index], rows, error
+                    next_index += 1
+        finally:
+            for worker in workers:
+                worker.stop()
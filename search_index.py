@@ -0,0 +1,328 @@
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TEXT_FIELDS = ['description', 'payee']
+NGRAM = 3
+POSITION_BITS = 40  # Keys are (n-gram << POSITION_BITS) | position in the corpus
+POSITION_MASK = (1 << POSITION_BITS) - 1
+SEPARATOR = 10  # '\n' ends every document in a corpus
+DELTA_LIMIT = 1 << 16  # Keys kept unmerged before folding them into the sorted main array
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    """array with room for at least size items, doubling its capacity when full"""
+    if size <= len(array):
+        return array
+    grown = np.empty(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _dedupe(values: np.ndarray) -> np.ndarray:
+    """Distinct values of a sorted array"""
+    if not len(values):
+        return values
+    return values[np.concatenate([[True], values[1:] != values[:-1]])]
+
+
+def _encode(values: Iterable[str]) -> np.ndarray:
+    """Lowercased values as one UTF-8 byte string, each value ended by a separator"""
+    text = ''.join(f"{value.replace(chr(SEPARATOR), ' ')}\n" for value in values).lower()
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+
+def _gram_keys(data: np.ndarray, offset: int) -> np.ndarray:
+    """Sorted positional n-gram keys of the bytes, positions shifted by offset.
+
+    Every byte other than a separator starts one n-gram, padded with
+    separators at a document's end, so one- and two-byte queries are a key
+    range too.
+    """
+    padded = np.concatenate([data, np.full(NGRAM - 1, SEPARATOR, dtype=np.uint8)])
+    grams = np.zeros(len(data), dtype=np.uint64)
+    for i in range(NGRAM):
+        grams = (grams << np.uint64(8)) | padded[i:i + len(data)]
+    valid = data != SEPARATOR
+    positions = np.flatnonzero(valid).astype(np.uint64) + np.uint64(offset)
+    keys = (grams[valid] << np.uint64(POSITION_BITS)) | positions
+    keys.sort()
+    return keys
+
+
+def unchanged_rows(old_frame: pd.DataFrame, old_rows: np.ndarray, frame: pd.DataFrame) -> np.ndarray:
+    """old_rows, the row of old_frame each row of frame had, with -1 where an indexed field changed"""
+    old_rows = np.asarray(old_rows, dtype=np.int64).copy()
+    carried = np.flatnonzero(old_rows >= 0)
+    for field in TEXT_FIELDS + ['amount']:
+        if not len(carried):
+            break
+        if field not in frame.columns or field not in old_frame.columns:
+            old_rows[carried] = -1
+            break
+        old = old_frame[field].take(old_rows[carried])
+        new = frame[field].take(carried)
+        if isinstance(old.dtype, pd.CategoricalDtype) and isinstance(new.dtype, pd.CategoricalDtype):
+            # Compare codes, translating the new categories to the old ones
+            translated = old.cat.categories.get_indexer(new.cat.categories)
+            same = old.cat.codes.to_numpy() == np.append(translated, -1)[new.cat.codes.to_numpy()]
+        else:
+            old, new = old.to_numpy(), new.to_numpy()
+            same = (old == new) | (pd.isna(old) & pd.isna(new))
+        old_rows[carried[~same]] = -1
+        carried = carried[same]
+    return old_rows
+
+
+class _NgramIndex:
+    """Positional n-gram index over the lowercased text of one column.
+
+    Each document (a row's value) is appended to a byte corpus and every
+    n-gram in it is recorded as a sorted (n-gram, position) key. A substring
+    query intersects the positions of the n-grams covering it, shifted to
+    the query start, which gives exact matches without re-reading the text.
+    Shorter queries scan the corpus directly. Documents are only appended;
+    the owner drops replaced ones through a liveness mask.
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.delta = np.empty(0, dtype=np.uint64)  # Recent keys, sorted, merged into keys in bulk
+        self.corpus = np.empty(0, dtype=np.uint8)
+        self.size = 0  # Bytes of corpus in use
+        self.starts = np.empty(0, dtype=np.int64)  # Document -> first corpus byte
+        self.count = 0  # Documents in use
+
+    def add(self, values: List[str]) -> None:
+        """Append documents, numbered in order after the existing ones"""
+        if not values:
+            return
+        data = _encode(values)
+        ends = np.flatnonzero(data == SEPARATOR) + 1
+        self.starts = _grow(self.starts, self.count + len(values))
+        self.starts[self.count:self.count + len(values)] = self.size + np.concatenate([[0], ends[:-1]])
+        self.count += len(values)
+        self.corpus = _grow(self.corpus, self.size + len(data))
+        self.corpus[self.size:self.size + len(data)] = data
+
+        keys = _gram_keys(data, self.size)
+        self.size += len(data)
+        if len(self.delta) + len(keys) > DELTA_LIMIT or not len(self.keys):
+            # Both runs are sorted, a stable sort merges them in linear time
+            self.keys = np.sort(np.concatenate([self.keys, self.delta, keys]), kind='stable')
+            self.delta = np.empty(0, dtype=np.uint64)
+        else:
+            self.delta = np.sort(np.concatenate([self.delta, keys]), kind='stable')
+
+    def _range(self, low: int, high: int) -> List[np.ndarray]:
+        """Keys from low to high inclusive, from the main and delta arrays"""
+        low, high = np.uint64(low), np.uint64(high)
+        return [
+            keys[np.searchsorted(keys, low, 'left'):np.searchsorted(keys, high, 'right')]
+            for keys in (self.keys, self.delta)
+        ]
+
+    def _contains(self, probes: np.ndarray) -> np.ndarray:
+        """Which of the sorted keys in probes are indexed"""
+        found = np.zeros(len(probes), dtype=bool)
+        for keys in (self.keys, self.delta):
+            if len(keys):
+                at = np.minimum(np.searchsorted(keys, probes), len(keys) - 1)
+                found |= keys[at] == probes
+        return found
+
+    def positions(self, query: bytes) -> np.ndarray:
+        """Sorted corpus positions where query starts"""
+        if len(query) < NGRAM:
+            # Every n-gram starting with the query bytes
+            low = int.from_bytes(query.ljust(NGRAM, b'\x00'), 'big') << POSITION_BITS
+            high = (int.from_bytes(query.ljust(NGRAM, b'\xff'), 'big') << POSITION_BITS) | POSITION_MASK
+            found = np.concatenate(self._range(low, high)) & np.uint64(POSITION_MASK)
+            return np.sort(found.astype(np.int64))
+
+        # Seed candidates from the rarest n-gram of the query, then probe the others
+        grams = sorted(
+            (sum(len(keys) for keys in self._range(gram << POSITION_BITS, (gram << POSITION_BITS) | POSITION_MASK)),
+             offset, gram)
+            for offset, gram in (
+                (offset, int.from_bytes(query[offset:offset + NGRAM], 'big'))
+                for offset in range(len(query) - NGRAM + 1)
+            )
+        )
+        _, offset, gram = grams[0]
+        seed = np.concatenate(self._range(gram << POSITION_BITS, (gram << POSITION_BITS) | POSITION_MASK))
+        starts = np.sort((seed & np.uint64(POSITION_MASK)).astype(np.int64) - offset)
+        for _, offset, gram in grams[1:]:
+            if not len(starts):
+                break
+            probes = np.uint64(gram << POSITION_BITS) | (starts + offset).astype(np.uint64)
+            starts = starts[self._contains(probes)]
+        return starts
+
+    def documents(self, query: str, prefix: bool = False) -> np.ndarray:
+        """Sorted documents containing query, or with prefix a word starting with it"""
+        query = query.replace(chr(SEPARATOR), ' ').lower().encode('utf-8')
+        if not query:
+            return np.arange(self.count)
+        positions = self.positions(query)
+        if prefix and len(positions):
+            # Keep matches at the start of a word: the byte before is not a word character
+            before = self.corpus[np.maximum(positions - 1, 0)]
+            word = (before >= 128) | (before == ord('_')) | (
+                (before >= ord('0')) & (before <= ord('9'))) | ((before >= ord('a')) & (before <= ord('z')))
+            positions = positions[(positions == 0) | ~word]
+        return _dedupe(np.searchsorted(self.starts[:self.count], positions, 'right') - 1)
+
+
+class SearchIndex:
+    """Search structures over the current master snapshot.
+
+    description and payee get a positional n-gram index, amount a sorted
+    index for exact and range lookups. Every indexed row is a document, and
+    doc_position maps documents to rows of the snapshot. The index is built
+    once and then follows entry writes through apply(), which retires the
+    documents of changed rows and appends their new values, and staging
+    merges through remap(). A snapshot the index has not followed, such as a
+    change made by another process, rebuilds it on the next search.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.fields = {field: _NgramIndex() for field in TEXT_FIELDS}
+        self.count = 0  # Documents, live or retired
+        self.doc_position = np.empty(0, dtype=np.int64)  # Document -> row, -1 once retired
+        self.position_doc = np.empty(0, dtype=np.int64)  # Row -> document
+        self.sorted_amounts = np.empty(0, dtype='float64')
+        self.amount_docs = np.empty(0, dtype=np.int64)  # Documents in sorted_amounts order
+
+    def _add(self, frame: pd.DataFrame) -> np.ndarray:
+        """Index the rows of frame as new documents and return their numbers"""
+        docs = np.arange(self.count, self.count + len(frame))
+        self.count += len(frame)
+        for field, index in self.fields.items():
+            values = frame[field].fillna('').astype(str).tolist() if field in frame.columns else [''] * len(frame)
+            index.add(values)
+        self.doc_position = _grow(self.doc_position, self.count)
+
+        amounts = frame['amount'].to_numpy('float64')
+        order = np.argsort(amounts, kind='stable')
+        at = np.searchsorted(self.sorted_amounts, amounts[order], 'right')
+        self.sorted_amounts = np.insert(self.sorted_amounts, at, amounts[order])
+        self.amount_docs = np.insert(self.amount_docs, at, docs[order])
+        return docs
+
+    def _build(self, generation: int, frame: pd.DataFrame) -> None:
+        self._reset()
+        self.position_doc = self._add(frame)
+        self.doc_position[:self.count] = self.position_doc
+        self.generation = generation
+
+    def apply(self, base_generation: int, generation: int, size: int,
+              old_positions: np.ndarray, new_positions: np.ndarray, rows: pd.DataFrame) -> None:
+        """Follow an entry write from snapshot base_generation to generation.
+
+        old_positions and new_positions are the rows of the touched entries
+        before and after the write, -1 where an entry did not exist, and rows
+        the touched entries' new rows in row order; size is the snapshot's
+        row count. Rows the write did not touch must keep their relative
+        order, updated rows their position and added rows come last, as
+        EntryOverlay lays them out. Never waits for a rebuild in progress;
+        the index then rebuilds on the next search instead.
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self.generation != base_generation:
+                return
+            self.generation = None  # Until the write is followed through
+            retired = self.position_doc[old_positions[old_positions >= 0]]
+            self.doc_position[retired] = -1
+            position_doc = np.delete(self.position_doc, old_positions[(old_positions >= 0) & (new_positions < 0)])
+            touched = new_positions[new_positions >= 0]
+            if len(position_doc) + np.count_nonzero(touched >= len(position_doc)) != size or len(rows) != len(touched):
+                return  # Rows moved in a way this cannot follow, rebuild on the next search
+            if self.count > 2 * size + 1000:
+                return  # Mostly retired documents, rebuild on the next search
+
+            position_doc = _grow(position_doc, size)[:size]
+            position_doc[np.sort(touched)] = self._add(rows)
+            self.position_doc = position_doc
+            self.doc_position[position_doc] = np.arange(size)
+            self.generation = generation
+        finally:
+            self._lock.release()
+
+    def remap(self, base_generation: int, generation: int, frame: pd.DataFrame, old_rows: np.ndarray) -> None:
+        """Follow any change from snapshot base_generation to generation, such as a merge.
+
+        old_rows[row] is the row of the base snapshot whose indexed values
+        the frame's row carries over unchanged, -1 for a new or changed row.
+        Documents of base rows not carried over are retired and new rows
+        appended. Never waits for a rebuild in progress, like apply().
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self.generation != base_generation:
+                return
+            self.generation = None  # Until the change is followed through
+            carried = old_rows >= 0
+            if self.count + np.count_nonzero(~carried) > 2 * len(frame) + 1000:
+                return  # Mostly retired documents, rebuild on the next search
+            position_doc = np.empty(len(frame), dtype=np.int64)
+            position_doc[carried] = self.position_doc[old_rows[carried]]
+            self.doc_position[:self.count] = -1
+            new_rows = np.flatnonzero(~carried)
+            position_doc[new_rows] = self._add(frame.iloc[new_rows])
+            self.position_doc = position_doc
+            self.doc_position[position_doc] = np.arange(len(frame))
+            self.generation = generation
+        finally:
+            self._lock.release()
+
+    def search(self, generation: int, frame: pd.DataFrame, query: str, fields: List[str],
+               prefix: bool = False) -> np.ndarray:
+        """Sorted row positions of frame matching query in any of the fields.
+
+        Text fields match a case-insensitive substring, or with prefix a word
+        starting with the query. amount takes a number or a low..high range.
+        Fields without an index are scanned.
+        """
+        matches = []
+        with self._lock:
+            if generation != self.generation:
+                self._build(generation, frame)
+            for field in fields:
+                if field not in frame.columns:
+                    continue
+                if field == 'amount':
+                    bounds = parse_amount_query(query)
+                    if bounds is not None:
+                        start = np.searchsorted(self.sorted_amounts, bounds[0], 'left')
+                        stop = np.searchsorted(self.sorted_amounts, bounds[1], 'right')
+                        matches.append(self.doc_position[self.amount_docs[start:stop]])
+                elif field in self.fields:
+                    matches.append(self.doc_position[self.fields[field].documents(query, prefix)])
+                else:
+                    scan = frame[field].astype(str).str.lower().str.contains(query.lower(), regex=False, na=False)
+                    matches.append(np.flatnonzero(scan.to_numpy()))
+        positions = np.sort(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+        return _dedupe(positions[positions >= 0])
+
+
+def parse_amount_query(query: str) -> Optional[Tuple[float, float]]:
+    """(low, high) bounds of an amount query: '12.5', '10..20', '..0' or '100..'"""
+    try:
+        if '..' in query:
+            low, high = query.split('..', 1)
+            return float(low) if low.strip() else -np.inf, float(high) if high.strip() else np.inf
+        amount = float(query)
+        return amount, amount
+    except ValueError:
+        return None
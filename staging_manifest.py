@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+
+class StagingManifest:
+    """Track mtime, size and content hash of every staging file merged into master"""
+
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = Path(manifest_path)
+        self.entries: Dict[str, dict] = {}
+        self.settings: Dict[str, str] = {}  # How the recorded files were merged, such as the merge policy
+        self.load()
+
+    def load(self) -> None:
+        """Load the manifest from disk, starting empty if it is missing or unreadable"""
+        try:
+            if self.manifest_path.exists():
+                content = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+                if 'files' in content and 'settings' in content:
+                    self.entries, self.settings = content['files'], content['settings']
+                else:
+                    self.entries = content  # Written before settings existed
+        except Exception as e:
+            print(f"Error reading staging manifest: {e}")
+            self.entries = {}
+
+    def save(self) -> None:
+        """Write the manifest atomically next to the master database"""
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        content = {'files': self.entries, 'settings': self.settings} if self.settings else self.entries
+        tmp_path.write_text(json.dumps(content, indent=4, sort_keys=True), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+
+    def clear(self) -> None:
+        self.entries = {}
+        self.settings = {}
+
+    @staticmethod
+    def file_hash(file_path: Path) -> str:
+        """SHA-256 of the file content, read in blocks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def diff(self, file_paths: List[Path], only: Set[str] = None) -> Tuple[Dict[str, dict], List[str]]:
+        """Compare staging files against the manifest.
+
+        Returns (changed, deleted): changed maps each new or modified path to its
+        fresh manifest entry, deleted lists paths that are no longer present.
+        Files whose mtime and size are unchanged are not hashed again. With
+        only, file_paths are the present files among those paths and no other
+        recorded file is reported deleted.
+        """
+        changed = {}
+        seen = set()
+        for file_path in file_paths:
+            key = str(file_path)
+            seen.add(key)
+            stat = file_path.stat()
+            entry = self.entries.get(key)
+            if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                continue
+
+            new_entry = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'sha256': self.file_hash(file_path)
+            }
+            if entry and entry['sha256'] == new_entry['sha256']:
+                # Touched but identical content, just refresh the stat info
+                self.entries[key] = new_entry
+                continue
+            changed[key] = new_entry
+
+        recorded = self.entries if only is None else [key for key in only if key in self.entries]
+        deleted = [key for key in recorded if key not in seen]
+        return changed, deleted
+
+    def apply(self, changed: Dict[str, dict], deleted: List[str]) -> None:
+        """Record a merged delta"""
+        self.entries.update(changed)
+        for key in deleted:
+            self.entries.pop(key, None)
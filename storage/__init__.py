@@ -0,0 +1,28 @@
+# storage/__init__.py
+from pathlib import Path
+from .base_storage import BaseStorage, CATEGORY_COLUMNS, MASTER_COLUMNS, concat_master, conform_master
+from .json_storage import JsonStorage
+
+STORAGE_BACKENDS = {'json': JsonStorage}
+
+try:
+    from .parquet_storage import ParquetStorage
+    from .arrow_storage import ArrowStorage
+    STORAGE_BACKENDS['parquet'] = ParquetStorage
+    STORAGE_BACKENDS['arrow'] = ArrowStorage
+except ImportError:
+    ParquetStorage = ArrowStorage = None
+
+
+def create_storage(backend: str, base_path: Path) -> BaseStorage:
+    """Master database storage of the given backend inside base_path"""
+    if backend in ('parquet', 'arrow') and ParquetStorage is None:
+        print("pyarrow is not installed, falling back to JSON storage...")
+        backend = 'json'
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unsupported storage backend: {backend}")
+    storage_class = STORAGE_BACKENDS[backend]
+    return storage_class(Path(base_path) / f"master_database{storage_class.suffix}")
+
+__all__ = ['ArrowStorage', 'BaseStorage', 'JsonStorage', 'ParquetStorage', 'CATEGORY_COLUMNS', 'MASTER_COLUMNS',
+           'STORAGE_BACKENDS', 'concat_master', 'conform_master', 'create_storage']
@@ -0,0 +1,43 @@
+# storage/arrow_storage.py
+import os
+import pandas as pd
+import pyarrow as pa
+from .base_storage import conform_master
+from .parquet_storage import MASTER_SCHEMA, ParquetStorage
+
+# Strings as large_string, the layout pandas holds them in, so loading them copies nothing
+ARROW_SCHEMA = pa.schema([
+    field.with_type(pa.large_string()) if field.type == pa.string() else field for field in MASTER_SCHEMA
+])
+
+class ArrowStorage(ParquetStorage):
+    """Master database as an uncompressed Arrow IPC file, memory-mapped read-only.
+
+    A loaded frame references the mapped file instead of holding a parsed
+    copy: text, dates and amounts stay in the page cache, shared by every
+    process reading the same snapshot, and only the categorical codes are
+    private. A save writes a new file and renames it over the old one;
+    frames of the old snapshot keep its pages mapped until they are dropped.
+
+    Windows refuses to replace a file that is mapped, so there the file is
+    read into memory instead, which still skips parsing.
+    """
+    suffix = '.arrow'
+    schema = ARROW_SCHEMA
+    memory_map = os.name != 'nt'
+
+    def load(self) -> pd.DataFrame:
+        # Buffers keep the mapping alive once the file is closed
+        with (pa.memory_map if self.memory_map else pa.OSFile)(str(self.path), 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        return conform_master(table.to_pandas(split_blocks=True))
+
+    def save(self, df: pd.DataFrame) -> pd.DataFrame:
+        table = self._to_table(df)
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = self.path.with_suffix('.tmp')
+        with pa.OSFile(str(tmp_path), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self._replace(tmp_path)
+        return self.load()
@@ -0,0 +1,103 @@
+import os
+from abc import ABC, abstractmethod
+import pandas as pd
+from pathlib import Path
+from typing import Iterable
+
+MASTER_COLUMNS = ['date', 'amount', 'description', 'payee', 'source_file', 'id']
+# Few distinct values repeated over many rows, held as integer codes
+CATEGORY_COLUMNS = ['payee', 'source_file']
+TEXT_COLUMNS = ['description', 'id']
+
+
+def conform_master(df: pd.DataFrame) -> pd.DataFrame:
+    """df in the in-memory master schema, adding any missing master column.
+
+    Columns outside MASTER_COLUMNS are dropped. date is datetime64[ms],
+    amount float64, description and id strings, and payee and source_file
+    categoricals with '' for a missing value. Numeric dates are epoch
+    milliseconds as in the JSON format, other dates are parsed. Columns
+    already of their type are left as they are.
+    """
+    df = df.drop(columns=[col for col in df.columns if col not in MASTER_COLUMNS])
+    for col in MASTER_COLUMNS:
+        if col not in df.columns:
+            df[col] = pd.Series(index=df.index, dtype='float64' if col == 'amount' else 'object')
+
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        epoch_ms = pd.to_numeric(df['date'], errors='coerce')
+        parsed = pd.to_datetime(df['date'].where(epoch_ms.isna()), errors='coerce', format='mixed')
+        df['date'] = parsed.fillna(pd.to_datetime(epoch_ms, unit='ms'))
+    if df['date'].dtype != 'datetime64[ms]':
+        df['date'] = df['date'].astype('datetime64[ms]')
+    if df['amount'].dtype != 'float64':
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').astype('float64')
+    for col in TEXT_COLUMNS:
+        if df[col].dtype != 'str':
+            df[col] = df[col].astype('str')
+    for col in CATEGORY_COLUMNS:
+        values = df[col]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            df[col] = values.fillna('').astype('str').astype('category')
+        elif values.isna().any():
+            if '' not in values.cat.categories:
+                values = values.cat.add_categories([''])
+            df[col] = values.fillna('')
+    return df
+
+
+def concat_master(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Master frames one after another in the master schema.
+
+    Categories are united first, as pandas falls back to plain strings when
+    concatenating categoricals with different categories; frames already
+    holding all of them are not recoded.
+    """
+    frames = [conform_master(df) for df in frames]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    for col in CATEGORY_COLUMNS:
+        categories = pd.Index([], dtype='str').append([df[col].cat.categories for df in frames]).unique()
+        for df in frames:
+            if not df[col].cat.categories.equals(categories):
+                df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+class BaseStorage(ABC):
+    suffix = ''
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @abstractmethod
+    def load(self) -> pd.DataFrame:
+        """The master database in the schema of conform_master"""
+        pass
+
+    @abstractmethod
+    def save(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Persist df and return it the way load() would read it back"""
+        pass
+
+    def _replace(self, tmp_path: Path) -> None:
+        """Move a fully written tmp_path over the master file, durably.
+
+        The file is on disk before the rename and the rename is on disk when
+        this returns, so entry logs folded into the file can be emptied.
+        """
+        fd = os.open(tmp_path, os.O_RDWR)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, self.path)
+        if os.name != 'nt':  # Windows cannot open a directory; NTFS journals the rename
+            fd = os.open(self.path.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
@@ -0,0 +1,20 @@
+# storage/json_storage.py
+import pandas as pd
+from io import StringIO
+from .base_storage import BaseStorage, conform_master
+
+class JsonStorage(BaseStorage):
+    """Master database as an indented JSON array of records"""
+    suffix = '.json'
+
+    def load(self) -> pd.DataFrame:
+        # Keep hex ids that happen to look numeric as strings
+        return conform_master(pd.read_json(self.path, orient='records', dtype={'id': str}))
+
+    def save(self, df: pd.DataFrame) -> pd.DataFrame:
+        content = df.to_json(orient='records', indent=4)
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(content, encoding='utf-8')
+        self._replace(tmp_path)
+        return conform_master(pd.read_json(StringIO(content), orient='records', dtype={'id': str}))
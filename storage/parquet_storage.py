@@ -0,0 +1,60 @@
+# storage/parquet_storage.py
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .base_storage import CATEGORY_COLUMNS, BaseStorage, conform_master
+
+# Typed master columns; payee and source_file repeat heavily and are dictionary-encoded
+MASTER_SCHEMA = pa.schema([
+    ('date', pa.timestamp('ms')),
+    ('amount', pa.float64()),
+    ('description', pa.string()),
+    ('payee', pa.dictionary(pa.int32(), pa.string())),
+    ('source_file', pa.dictionary(pa.int32(), pa.string())),
+    ('id', pa.string())
+])
+
+class ParquetStorage(BaseStorage):
+    """Master database as a columnar Parquet file"""
+    suffix = '.parquet'
+    schema = MASTER_SCHEMA
+
+    def load(self) -> pd.DataFrame:
+        return self._to_pandas(pq.read_table(self.path))
+
+    def save(self, df: pd.DataFrame) -> pd.DataFrame:
+        table = self._to_table(df)
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = self.path.with_suffix('.tmp')
+        pq.write_table(table, tmp_path)
+        self._replace(tmp_path)
+        return self._to_pandas(table)
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        """df as one chunk per column in the storage's schema"""
+        table = pa.Table.from_pandas(self._coerce(df), preserve_index=False)
+        fields = {field.name: field for field in self.schema}
+        schema = pa.schema([fields.get(field.name, field) for field in table.schema])
+        return table.cast(schema).combine_chunks()
+
+    @staticmethod
+    def _to_pandas(table: pa.Table) -> pd.DataFrame:
+        # Dictionary columns come back as categoricals without decoding their values;
+        # Arrow buffers are freed while converting and handed back to the system after
+        df = conform_master(table.to_pandas(split_blocks=True, self_destruct=True))
+        pa.default_memory_pool().release_unused()
+        return df
+
+    @staticmethod
+    def _coerce(df: pd.DataFrame) -> pd.DataFrame:
+        """Bring master columns to types castable to MASTER_SCHEMA.
+
+        Dictionaries hold the values in use in order of first use, so the
+        file depends on the rows alone and not on how categories were added.
+        """
+        df = conform_master(df)
+        for col in CATEGORY_COLUMNS:
+            values = df[col].array
+            codes, used = pd.factorize(values.codes)
+            df[col] = pd.Categorical.from_codes(codes, values.categories[used])
+        return df
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from processors.excel_processor import ExcelCsvProcessor  # noqa: E402
+
+
+def test_csv_columns_are_mapped_by_header(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text(
+        'Date,Description,Payee,Debit Amount,Credit Amount\n'
+        '2018-08-01,Groceries,Corner shop,25.50,0\n'
+        '2018-08-13,Salary,Employer,0,"1,200.00"\n',
+        encoding='utf-8'
+    )
+
+    df = ExcelCsvProcessor().process(path)
+
+    assert df.columns.tolist() == ['date', 'amount', 'description', 'payee']
+    assert df['date'].tolist() == ['2018-08-01', '2018-08-13']
+    assert df['amount'].tolist() == [-25.5, 1200.0]
+    assert df['description'].tolist() == ['Groceries', 'Salary']
+    assert df['payee'].tolist() == ['Corner shop', 'Employer']
+
+
+def test_csv_dates_keep_their_order_across_year_widths(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text('Date,Debit Amount,Credit Amount\n1/8/2018,10,0\n12/8/2018,10,0\n13/08/18,10,0\n',
+                    encoding='utf-8')
+
+    df = ExcelCsvProcessor().process(path)
+
+    assert df['date'].tolist() == ['2018-08-01', '2018-08-12', '2018-08-13']
+
+
+def test_csv_chunk_with_dates_in_another_order_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(ExcelCsvProcessor, 'CHUNK_ROWS', 2)
+    path = tmp_path / 'statement.csv'
+    # The first chunk reads as month first, the second only as day first
+    path.write_text('date,amount\n01/02/2020,1\n03/04/2020,1\n25/04/2020,1\n', encoding='utf-8')
+
+    with pytest.raises(ValueError, match='25/04/2020'):
+        list(ExcelCsvProcessor().iter_chunks(path))
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from storage import STORAGE_BACKENDS  # noqa: E402
+
+
+def master(amounts):
+    return pd.DataFrame({
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(range(len(amounts)), unit='D'),
+        'amount': amounts,
+        'description': [f'purchase {i}' for i in range(len(amounts))],
+        'payee': 'shop',
+        'source_file': 'statement.csv',
+        'id': [f'{i:016x}' for i in range(len(amounts))]
+    })
+
+
+@pytest.mark.parametrize('backend', sorted(STORAGE_BACKENDS))
+def test_save_over_loaded_file(tmp_path, backend):
+    storage_class = STORAGE_BACKENDS[backend]
+    storage = storage_class(tmp_path / f'master_database{storage_class.suffix}')
+    storage.save(master([1.0, 2.0]))
+    loaded = storage.load()
+
+    storage.save(master([3.0, 4.0, 5.0]))
+
+    assert storage.load()['amount'].tolist() == [3.0, 4.0, 5.0]
+    assert loaded['amount'].tolist() == [1.0, 2.0]
+    assert [path.name for path in tmp_path.iterdir()] == [storage.path.name]
+
+
+def test_arrow_save_over_loaded_file_without_mapping(tmp_path, monkeypatch):
+    # As on Windows, where a mapped file cannot be replaced
+    storage_class = STORAGE_BACKENDS['arrow']
+    monkeypatch.setattr(storage_class, 'memory_map', False)
+    storage = storage_class(tmp_path / 'master_database.arrow')
+    storage.save(master([1.0, 2.0]))
+    loaded = storage.load()
+
+    storage.save(master([3.0]))
+
+    assert storage.load()['amount'].tolist() == [3.0]
+    assert loaded['amount'].tolist() == [1.0, 2.0]
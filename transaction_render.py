@@ -0,0 +1,113 @@
+import html
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+DISPLAY_COLUMNS = ['date', 'amount', 'description', 'payee', 'source_file']
+TABLE_ID = 'transactionTable'
+TABLE_CLASSES = 'table table-striped table-hover'
+
+
+def table_columns(df: pd.DataFrame) -> List[str]:
+    """Display columns first, then any other column of df such as the entry id"""
+    return DISPLAY_COLUMNS + [column for column in df.columns if column not in DISPLAY_COLUMNS]
+
+
+def format_dates(values: pd.Series) -> np.ndarray:
+    """YYYY-MM-DD of every value, '' where missing"""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors='coerce')
+    # Transactions share few distinct days, format each once
+    codes, uniques = pd.factorize(values)
+    days = np.datetime_as_string(uniques.to_numpy('datetime64[ns]').astype('datetime64[D]'))
+    return np.append(days.astype(object), '')[codes]
+
+
+def format_amounts(values: pd.Series) -> np.ndarray:
+    """Amounts with two decimals, '' where missing"""
+    amounts = pd.to_numeric(values, errors='coerce').to_numpy('float64', na_value=np.nan)
+    amounts = np.where(np.isfinite(amounts), amounts, np.nan)
+    # Amounts repeat, format each distinct one once exactly as '%.2f' rounds it
+    codes, uniques = pd.factorize(amounts)
+    return np.append(np.char.mod('%.2f', uniques).astype(object), '')[codes]
+
+
+def _distinct(values: pd.Series, format_value) -> np.ndarray:
+    """Format each distinct value once and spread the results over the rows, '' where missing"""
+    codes, uniques = pd.factorize(values)
+    formatted = np.array([format_value(value) for value in uniques] + [''], dtype=object)
+    return formatted[codes]  # Code -1, a missing value, picks the trailing ''
+
+
+def source_links(source_file: str) -> str:
+    """One button per file in a comma-separated source_file value"""
+    return ' '.join(
+        f'<a href="/file/{html.escape(file.strip())}" class="btn btn-sm btn-outline-secondary">'
+        f'{html.escape(Path(file.strip()).name)}</a>'
+        for file in str(source_file).split(', ')
+    )
+
+
+def _text(values: pd.Series) -> np.ndarray:
+    return values.fillna('').astype(str).to_numpy(dtype=object, copy=True)
+
+
+def _escaped(values: pd.Series) -> np.ndarray:
+    """Text with HTML special characters escaped, touching only the values that have any"""
+    text = values.fillna('').astype(str)
+    special = text.str.contains(r'[&<>"\']', regex=True).to_numpy()
+    cells = text.to_numpy(dtype=object, copy=True)
+    cells[special] = [html.escape(value) for value in cells[special]]
+    return cells
+
+
+def render_table(df: pd.DataFrame) -> str:
+    """The rows of df as the transaction table's HTML.
+
+    Dates, amounts and source buttons are formatted column by column rather
+    than row by row; source files repeat across rows, so each distinct value
+    is rendered once.
+    """
+    columns = table_columns(df)
+    cells = []
+    for column in columns:
+        values = df[column] if column in df.columns else pd.Series('', index=df.index, dtype=object)
+        if column == 'date':
+            cells.append(format_dates(values))
+        elif column == 'amount':
+            cells.append(format_amounts(values))
+        elif column == 'source_file':
+            cells.append(_distinct(values, source_links))
+        else:
+            cells.append(_escaped(values))
+
+    row = '<tr>\n      <td>' + '</td>\n      <td>'.join(['{}'] * len(columns)) + '</td>\n    </tr>'
+    rows = map(row.format, *cells)
+    header = ''.join(f'      <th>{html.escape(str(column))}</th>\n' for column in columns)
+    return (
+        f'<table border="1" class="dataframe {TABLE_CLASSES}" id="{TABLE_ID}">\n'
+        f'  <thead>\n    <tr style="text-align: right;">\n{header}    </tr>\n  </thead>\n'
+        f'  <tbody>\n    ' + '\n    '.join(rows) + '\n  </tbody>\n</table>'
+    )
+
+
+def render_rows(df: pd.DataFrame) -> dict:
+    """The rows of df in the compact format the frontend renders itself.
+
+    {'columns': [...], 'rows': [[...], ...]} with dates as YYYY-MM-DD,
+    amounts as numbers and text left unescaped.
+    """
+    columns = table_columns(df)
+    values = []
+    for column in columns:
+        series = df[column] if column in df.columns else pd.Series('', index=df.index, dtype=object)
+        if column == 'date':
+            values.append(format_dates(series))
+        elif column == 'amount':
+            amounts = pd.to_numeric(series, errors='coerce').to_numpy('float64', na_value=np.nan)
+            values.append(np.where(np.isfinite(amounts), amounts.astype(object), None))
+        else:
+            values.append(_text(series))
+    return {'columns': columns, 'rows': list(zip(*(column.tolist() for column in values)))}
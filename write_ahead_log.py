@@ -0,0 +1,477 @@
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from master_merge import MANUAL_SOURCE, IdIndex, new_id
+from storage import CATEGORY_COLUMNS, MASTER_COLUMNS, conform_master
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def normalize_entry(entry_data: dict) -> dict:
+    """Coerce API entry fields to master column types"""
+    entry = {key: value for key, value in entry_data.items() if key != 'id'}
+    if entry.get('date') is not None:
+        date = entry['date']
+        # Numbers are epoch milliseconds, as sent by the frontend
+        entry['date'] = pd.to_datetime(date, unit='ms') if isinstance(date, (int, float)) else pd.to_datetime(date)
+    if entry.get('amount') is not None:
+        entry['amount'] = float(entry['amount'])
+    for key in ('description', 'payee', 'source_file'):
+        if entry.get(key) is not None:
+            entry[key] = str(entry[key])
+    return entry
+
+
+def _check_data(data: dict) -> dict:
+    """data normalized, raising ValueError on an unknown field or a value of the wrong type"""
+    unknown = set(data) - set(MASTER_COLUMNS) - {'id'}
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    try:
+        return normalize_entry(data)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError(f"invalid field value: {e}")
+
+
+def check_record(record: dict) -> None:
+    """Raise ValueError if a log record could not be applied to a master"""
+    if not isinstance(record, dict) or record.get('op') not in ('add', 'update', 'delete'):
+        raise ValueError("op must be add, update or delete")
+    if not isinstance(record.get('id'), str) or not record['id']:
+        raise ValueError(f"{record['op']} needs the id of an entry")
+    if record['op'] != 'delete':
+        if not isinstance(record.get('data'), dict):
+            raise ValueError(f"{record['op']} needs a data object")
+        _check_data(record['data'])
+
+
+def validate_operation(operation: dict) -> dict:
+    """Check one API entry operation against the master schema and return its log record.
+
+    Operations are {'op': 'insert'|'update'|'delete', 'id': ..., 'data': {...}};
+    'add' is accepted for 'insert', which needs a date and an amount and is
+    given a new id. Raises ValueError describing the first problem found.
+    """
+    if not isinstance(operation, dict):
+        raise ValueError("operation must be an object")
+    op = {'add': 'insert'}.get(operation.get('op'), operation.get('op'))
+    if op not in ('insert', 'update', 'delete'):
+        raise ValueError("op must be insert, update or delete")
+
+    entry_id = operation.get('id')
+    if op == 'insert':
+        entry_id = new_id()
+    elif not isinstance(entry_id, str) or not entry_id:
+        raise ValueError(f"{op} needs the id of an entry")
+    if op == 'delete':
+        return {'op': 'delete', 'id': entry_id}
+
+    data = operation.get('data')
+    if not isinstance(data, dict) or not data:
+        raise ValueError(f"{op} needs a data object")
+    if op == 'insert' and (data.get('date') is None or data.get('amount') is None):
+        raise ValueError("insert needs a date and an amount")
+    entry = _check_data(data)
+    if entry.get('date') is not None and pd.isna(entry['date']):
+        raise ValueError("invalid date")
+    if entry.get('amount') is not None and not math.isfinite(entry['amount']):
+        raise ValueError("amount must be a finite number")
+    return {'op': 'add' if op == 'insert' else 'update', 'id': entry_id,
+            'data': {key: value for key, value in data.items() if key != 'id'}}
+
+
+class EntryOverlay:
+    """Entry changes applied over a master frame without copying it.
+
+    changes maps the id of every changed entry to its row, or None once
+    deleted, in order of first change. An entry with a row in the frame
+    replaces it in place and the others are appended, so fold() lays the
+    rows out as applying the records to the frame one write after another
+    would. An overlay is never modified, apply() returns a new one: a write
+    costs the size of the changes rather than of the master.
+    """
+
+    def __init__(self, changes: Dict[str, Optional[dict]] = None, base_rows: Dict[str, int] = None):
+        self.changes = changes or {}
+        self.base_rows = base_rows or {}  # Frame row of each changed entry that has one
+        self.deleted = np.sort(np.array([row for entry_id, row in self.base_rows.items()
+                                         if self.changes[entry_id] is None], dtype=np.intp))
+        self.appended = {entry_id: n for n, entry_id in enumerate(
+            entry_id for entry_id, row in self.changes.items() if row is not None and entry_id not in self.base_rows
+        )}  # Id -> place among the rows appended after the frame's
+
+    def apply(self, frame: pd.DataFrame, ids: IdIndex, records: List[dict]) -> Tuple['EntryOverlay', List[bool]]:
+        """The overlay with records applied over frame, whose IdIndex is ids, and whether each changed something"""
+        changes, base_rows = dict(self.changes), dict(self.base_rows)
+        deleted = set()  # Entries deleted by these records, not added back by them
+        applied = []
+        positions = ids.positions([record['id'] for record in records]) if records else []
+        for record, position in zip(records, positions):
+            entry_id = record['id']
+            if entry_id in changes:
+                current = changes[entry_id]
+            else:
+                current = frame.iloc[position].to_dict() if position >= 0 else None
+
+            if record['op'] == 'add' and current is None and entry_id not in deleted:
+                row = {
+                    'description': '', 'payee': '', 'source_file': MANUAL_SOURCE,
+                    **normalize_entry(record['data']), 'id': entry_id
+                }
+            elif record['op'] == 'update' and current is not None:
+                row = {**current, **normalize_entry(record['data']), 'id': entry_id}
+            elif record['op'] == 'delete' and current is not None:
+                row = None
+                deleted.add(entry_id)
+            else:
+                applied.append(False)
+                continue
+            for column in CATEGORY_COLUMNS:
+                if row is not None and column in row and pd.isna(row[column]):
+                    row[column] = ''  # Categorical values are '' when missing
+            changes[entry_id] = row
+            if position >= 0:
+                base_rows[entry_id] = int(position)
+            applied.append(True)
+        if not any(applied):
+            return self, applied
+        return EntryOverlay(changes, base_rows), applied
+
+    def size(self, frame: pd.DataFrame) -> int:
+        """Rows of the folded frame"""
+        return len(frame) - len(self.deleted) + len(self.appended)
+
+    def positions(self, frame: pd.DataFrame, ids: IdIndex, entry_ids: Iterable[str]) -> np.ndarray:
+        """Rows of the given ids in the folded frame, -1 where an id is unknown"""
+        positions = ids.positions(entry_ids)
+        if not self.changes:
+            return positions
+        folded = np.where(positions >= 0, positions - np.searchsorted(self.deleted, positions), -1)
+        if not isinstance(entry_ids, pd.Series):
+            entry_ids = pd.Series([str(entry_id) for entry_id in entry_ids], dtype=object)
+        for at in np.flatnonzero(entry_ids.isin(list(self.changes)).to_numpy(dtype=bool)):
+            entry_id = entry_ids.iloc[at]
+            if self.changes[entry_id] is None:
+                folded[at] = -1
+            elif entry_id in self.base_rows:
+                row = self.base_rows[entry_id]
+                folded[at] = row - np.searchsorted(self.deleted, row)
+            else:
+                folded[at] = len(frame) - len(self.deleted) + self.appended[entry_id]
+        return folded
+
+    def rows(self, frame: pd.DataFrame, ids: IdIndex, entry_ids: Iterable[str]) -> pd.DataFrame:
+        """Current rows of the given ids that exist, in their order and the master schema"""
+        entry_ids = [str(entry_id) for entry_id in entry_ids]
+        positions = ids.positions(entry_ids)
+        unchanged = np.array([entry_id not in self.changes for entry_id in entry_ids], dtype=bool) & (positions >= 0)
+        base_rows = iter(frame.iloc[positions[unchanged]].to_dict('records'))
+        rows = []
+        for entry_id, position in zip(entry_ids, positions):
+            if entry_id in self.changes:
+                if self.changes[entry_id] is not None:
+                    rows.append(self.changes[entry_id])
+            elif position >= 0:
+                rows.append(next(base_rows))
+        return conform_master(pd.DataFrame(rows, columns=MASTER_COLUMNS))
+
+    def fold(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """frame with the changes applied, in the master schema"""
+        if not self.changes:
+            return frame
+        frame = frame.copy()
+        for column in CATEGORY_COLUMNS:
+            if column not in frame.columns or not isinstance(frame[column].dtype, pd.CategoricalDtype):
+                continue
+            # New values become categories before they are written
+            rows = [row for row in self.changes.values() if row is not None and column in row]
+            values = list(dict.fromkeys(row[column] for row in rows))
+            categories = frame[column].cat.categories
+            new = [value for value, position in zip(values, categories.get_indexer(values)) if position < 0]
+            if new:
+                frame[column] = frame[column].cat.add_categories(pd.Index(new, dtype=categories.dtype))
+        for entry_id, position in self.base_rows.items():
+            row = self.changes[entry_id]
+            if row is None:
+                continue
+            for key, value in row.items():
+                if key in frame.columns:
+                    frame.iat[position, frame.columns.get_loc(key)] = value
+
+        if len(self.deleted):
+            keep = np.ones(len(frame), dtype=bool)
+            keep[self.deleted] = False
+            frame = frame[keep]
+        if self.appended:
+            # New rows take the frame's types, its categories already hold their values
+            added = [self.changes[entry_id] for entry_id in self.appended]
+            columns = list(dict.fromkeys(key for row in added for key in row))
+            added = pd.DataFrame({
+                column: pd.Series([row.get(column) for row in added],
+                                  dtype=frame[column].dtype if column in frame.columns else None)
+                for column in columns
+            })
+            return conform_master(pd.concat([frame, added], ignore_index=True))
+        return frame.reset_index(drop=True)
+
+
+def apply_records(frame: pd.DataFrame, records: List[dict], ids: IdIndex = None) -> Tuple[pd.DataFrame, List[bool]]:
+    """Apply logged entry mutations to a master frame.
+
+    Records are {'op': 'add'|'update'|'delete', 'id': ..., 'data': {...}}.
+    Applying a record twice has no further effect, so a log can safely be
+    replayed over a master that already contains part of it. ids is the
+    frame's IdIndex, built here if not given. Returns the new frame, in the
+    master schema, and for each record whether it changed something.
+    """
+    if ids is None:
+        ids = IdIndex(frame['id'] if 'id' in frame.columns else pd.Series(dtype=object))
+    overlay, applied = EntryOverlay().apply(frame, ids, records)
+    return overlay.fold(frame), applied
+
+
+class WriteAheadLog:
+    """Append-only logs of entry mutations with group commit.
+
+    append() queues records and returns their sequence number; wait() blocks
+    until they are on disk. A committer thread writes everything queued within
+    commit_window seconds with a single fsync, so concurrent writers share the
+    cost of one flush.
+
+    Every process sharing a lake appends to a log of its own, named after
+    path and locked for as long as the process runs. records() replays the
+    logs of all processes, and signature() changes whenever another process
+    logs something. Logs are only emptied inside checkpoint(), which holds
+    the other processes' commits back while a master holding every logged
+    record is saved; a log found at path itself, written before logs were
+    per process, is replayed like the others.
+    """
+
+    def __init__(self, path: Path, commit_window: float = 0.0):
+        self.path = Path(path)
+        self.own_path = self.path.with_name(f'{self.path.stem}.{os.getpid()}-{uuid.uuid4().hex[:8]}{self.path.suffix}')
+        self.commit_window = commit_window
+        self._cond = threading.Condition()
+        self._pending: List[str] = []
+        self._last_seq = 0
+        self._processed_seq = 0  # Last sequence whose commit finished, durable or not
+        self._failed: List[Tuple[int, int]] = []  # Sequence ranges whose commit failed
+        self._write_lock = threading.Lock()  # Held while a batch is on its way to disk
+        self._checkpoint_lock = threading.RLock()
+        self._checkpoint_depth = 0
+        self._listing = (None, [])  # (directory mtime, log paths) of the last listing
+        self.commits = 0  # fsync calls, for group-commit batch statistics
+        self._fd = os.open(self.own_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        _flock(self._fd, 'exclusive')  # Tells checkpoints of other processes this one is alive
+        # Commits hold the lock file shared and checkpoints exclusive, each through a descriptor of its own
+        lock_path = self.path.with_suffix('.lock')
+        self._commit_lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._checkpoint_lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.records_since_checkpoint = len(self.records())
+
+        threading.Thread(target=self._commit_loop, name='wal-committer', daemon=True).start()
+
+    def _logs(self) -> List[Path]:
+        """Logs of every process, this one's included, the one at path first"""
+        try:
+            mtime = self.path.parent.stat().st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if self._listing[0] != mtime:
+            paths = sorted(self.path.parent.glob(f'{self.path.stem}.*{self.path.suffix}'))
+            self._listing = (mtime, ([self.path] if self.path.exists() else []) + paths)
+        return self._listing[1]
+
+    def signature(self) -> Tuple[Tuple[str, int], ...]:
+        """(name, size) of the logs of other processes"""
+        signature = []
+        for path in self._logs():
+            if path != self.own_path:
+                try:
+                    signature.append((path.name, path.stat().st_size))
+                except FileNotFoundError:
+                    pass
+        return tuple(signature)
+
+    def records(self) -> List[dict]:
+        """Records of every log in replay order, this process's still queued ones last.
+
+        A torn last line from a crash is skipped.
+        """
+        with self._write_lock:  # Every record is either on disk or still queued
+            lines = [line for path in self._logs() for line in _read_lines(path)]
+            with self._cond:
+                lines.extend(self._pending)
+        return _parse_lines(lines)
+
+    def records_after(self, seen: Optional[Tuple[Tuple[str, int], ...]]) -> List[dict]:
+        """Records other processes logged past the sizes of their logs in seen, a signature().
+
+        With seen None, every record of other processes.
+        """
+        seen = dict(seen or ())
+        lines = []
+        for path in self._logs():
+            if path != self.own_path:
+                lines.extend(_read_lines(path, seen.get(path.name, 0)))
+        return _parse_lines(lines)
+
+    def append(self, records: List[dict]) -> int:
+        """Queue records for the next commit and return the sequence to wait for"""
+        with self._cond:
+            self._pending.extend(json.dumps(record) + '\n' for record in records)
+            self._last_seq += len(records)
+            self.records_since_checkpoint += len(records)
+            self._cond.notify_all()
+            return self._last_seq
+
+    def wait(self, seq: int) -> None:
+        """Block until every record up to seq is durable"""
+        with self._cond:
+            while self._processed_seq < seq:
+                self._cond.wait()
+            if any(first <= seq <= last for first, last in self._failed):
+                raise OSError(f"Write-ahead log commit failed for record {seq}")
+
+    @contextmanager
+    def checkpoint(self) -> Iterator[None]:
+        """Hold every process's log still while a master holding their records is saved.
+
+        Waits for this process's queued records to reach the disk, then keeps
+        other processes from committing until the block ends. Nests.
+        """
+        with self._checkpoint_lock:
+            self._checkpoint_depth += 1
+            try:
+                if self._checkpoint_depth == 1:
+                    with self._cond:
+                        while self._pending or self._processed_seq < self._last_seq:
+                            self._cond.wait()
+                    _flock(self._checkpoint_lock_fd, 'exclusive')
+                try:
+                    yield
+                finally:
+                    if self._checkpoint_depth == 1:
+                        _flock(self._checkpoint_lock_fd, 'unlock')
+            finally:
+                self._checkpoint_depth -= 1
+
+    def truncate(self) -> None:
+        """Empty every log once its records are folded into the master file.
+
+        Only within checkpoint(). Logs of processes that are gone are deleted.
+        Without file locks, as on Windows, other processes may be committing
+        to their logs, so only this process's log is emptied and the one at
+        path deleted; the others keep being replayed.
+        """
+        with self._checkpoint_lock:
+            assert self._checkpoint_depth, "truncate() outside checkpoint()"
+            for path in self._logs():
+                if path == self.own_path:
+                    os.ftruncate(self._fd, 0)
+                    continue
+                if path == self.path:
+                    path.unlink(missing_ok=True)
+                    continue
+                if fcntl is None:
+                    continue
+                try:
+                    fd = os.open(path, os.O_WRONLY)
+                except FileNotFoundError:
+                    continue
+                try:
+                    if _flock(fd, 'exclusive', blocking=False):
+                        os.unlink(path)
+                    else:
+                        os.ftruncate(fd, 0)
+                finally:
+                    os.close(fd)
+            self.records_since_checkpoint = 0
+
+    def _commit_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let concurrent writers join this commit
+            time.sleep(self.commit_window)
+
+            with self._write_lock:
+                with self._cond:
+                    batch, self._pending = self._pending, []
+                    first, seq = self._processed_seq + 1, self._last_seq
+
+                # Writers keep queueing while this batch is flushed; checkpoint()
+                # waits for it through _processed_seq
+                try:
+                    data = memoryview(''.join(batch).encode('utf-8'))
+                    _flock(self._commit_lock_fd, 'shared')
+                    try:
+                        while data:
+                            data = data[os.write(self._fd, data):]
+                        os.fsync(self._fd)
+                    finally:
+                        _flock(self._commit_lock_fd, 'unlock')
+                    self.commits += 1
+                except OSError as e:
+                    print(f"Error committing write-ahead log: {e}")
+                    self._failed.append((first, seq))
+
+            with self._cond:
+                self._processed_seq = seq
+                self._cond.notify_all()
+
+
+def _flock(fd: int, mode: str, blocking: bool = True) -> bool:
+    """Lock or unlock a whole file, returning whether it was done.
+
+    A non-blocking lock held elsewhere is not taken. Without fcntl, as on
+    Windows, nothing is locked and False is returned.
+    """
+    if fcntl is None:
+        return False
+    operation = {'shared': fcntl.LOCK_SH, 'exclusive': fcntl.LOCK_EX, 'unlock': fcntl.LOCK_UN}[mode]
+    try:
+        fcntl.flock(fd, operation if blocking else operation | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _read_lines(path: Path, start: int = 0) -> List[str]:
+    """Lines of a log that end past byte start, all of them if it is shorter than that.
+
+    A line start falls in, such as one still being written when its log's
+    size was taken, is included whole.
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return []
+    if start > len(data):
+        start = 0
+    start = data.rfind(b'\n', 0, start) + 1  # Back to the start of its line
+    return [line.decode('utf-8', errors='replace') for line in data[start:].splitlines(keepends=True)]
+
+
+def _parse_lines(lines: List[str]) -> List[dict]:
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            print("Skipping unreadable write-ahead log record")
+    return records